@@ -0,0 +1,287 @@
+# pylint: disable=E1101
+"""Times the stages of a conversion for mmCIF, MTZ and CNS input.
+
+Each stage (import, SfCorrect.handle_standard, export to each format, CheckSfFile.sf_stat)
+is timed on the test fixtures and on synthetic files scaled from them.  Results are
+written as JSON so that they can be compared release over release:
+
+    python benchmarks/run_benchmarks.py --nref native 1M --json bench.json
+    python benchmarks/run_benchmarks.py --nref native 1M --baseline bench.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import gemmi
+import numpy as np
+
+from sf_convert import __version__
+from sf_convert.export_dir.export_cif import ExportCif
+from sf_convert.export_dir.export_cns import ExportCns
+from sf_convert.export_dir.export_mtz import ExportMtz
+from sf_convert.import_dir.import_cif import ImportCif
+from sf_convert.import_dir.import_cns import ImportCns
+from sf_convert.import_dir.import_mtz import ImportMtz
+from sf_convert.sffile.get_items_pdb import ProteinDataBank
+from sf_convert.utils.CheckSfFile import CheckSfFile
+from sf_convert.utils.MtzUtils import clear_mtz_cache
+from sf_convert.utils.pinfo_file import PStreamLogger
+from sf_convert.utils.sf_correct import SfCorrect
+
+from synthetic import FIXTURES, MODELS, synthetic_file
+
+FORMATS = ["mmcif", "mtz", "cns"]
+
+STAGES = ["import", "handle_standard", "export_mmcif", "export_cns", "export_mtz", "sf_stat"]
+
+# Version of the layout of the JSON output
+SCHEMA_VERSION = 1
+
+
+def parse_nref(value):
+    """
+    Parses a number of reflections.
+
+    Args:
+        value (str): "native" (the size of the fixture), or a count with an optional k/M suffix (i.e. "1M").
+
+    Returns:
+        int: The number of reflections, or None for the fixture as is.
+    """
+    if value.lower() == "native":
+        return None
+    scale = {"k": 1000, "m": 1000000}.get(value[-1].lower(), 1)
+    digits = value[:-1] if scale > 1 else value
+    try:
+        nref = int(float(digits) * scale)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid number of reflections: {value}") from None
+    if nref <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid number of reflections: {value}")
+    return nref
+
+
+def import_file(fmt, path, logger, pdb_data):
+    """
+    Imports a file as sf_convert does.
+
+    Args:
+        fmt (str): The input format.
+        path (str): The file.
+        logger (PStreamLogger): The logger.
+        pdb_data (dict): Items from the model file (as with -pdb).
+
+    Returns:
+        StructureFactorFile: The imported data.
+    """
+    sfc = SfCorrect(logger, True)
+    if fmt == "mmcif":
+        importer = ImportCif(logger)
+    elif fmt == "mtz":
+        importer = ImportMtz(logger)
+    else:
+        importer = ImportCns(logger)
+        importer.set_free(None)
+    importer.import_files([path])
+    sffile = importer.get_sf()
+
+    if fmt == "mtz":
+        sfc.correct_cell_precision(sffile)
+    elif fmt == "cns":
+        if pdb_data.get("CELL"):
+            sfc.set_cell(sffile, pdb_data["CELL"])
+        if pdb_data.get("SYMM"):
+            sfc.set_space_group_if_missing(sffile, "xxxx", pdb_data["SYMM"])
+        sfc.ensure_catkeys(sffile, "xxxx")
+        sfc.reorder_sf_file(sffile)
+    return sffile
+
+
+def run_pipeline(fmt, path, pdb_data, workdir):
+    """
+    Runs and times each stage once.  A stage that fails is reported, and the next stages still run.
+
+    Args:
+        fmt (str): The input format.
+        path (str): The input file.
+        pdb_data (dict): Items from the model file (as with -pdb).
+        workdir (str): Directory for the output files.
+
+    Returns:
+        tuple: (dict stage to elapsed seconds, dict stage to error message of the stages that failed)
+    """
+    logger = PStreamLogger()
+    times = {}
+    errors = {}
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        ret = None
+        try:
+            ret = func(*args)
+        except Exception as exc:  # pylint: disable=broad-except
+            errors[stage] = f"{type(exc).__name__}: {exc}"
+        times[stage] = time.perf_counter() - start
+        return ret
+
+    sffile = timed("import", import_file, fmt, path, logger, pdb_data)
+    if sffile is None:
+        return times, errors
+
+    sfc = SfCorrect(logger, True)
+    timed("handle_standard", sfc.handle_standard, sffile, sfc.get_pdbid(sffile))
+
+    for out_fmt, exporter in [("mmcif", ExportCif(True)), ("cns", ExportCns(logger)), ("mtz", ExportMtz(logger))]:
+        exporter.set_sf(sffile)
+        timed(f"export_{out_fmt}", exporter.write_file, os.path.join(workdir, f"out.{out_fmt}"))
+
+    checksf = CheckSfFile(sffile, logger)
+    timed("sf_stat", checksf.sf_stat, path, os.path.join(workdir, "SF_4_validate.cif"))
+
+    return times, errors
+
+
+def run_benchmark(fmt, nref, repeat, workdir, src=None):
+    """
+    Times the stages for one input.
+
+    Args:
+        fmt (str): The input format.
+        nref (int): The number of reflections, None for the fixture as is.
+        repeat (int): The number of runs.
+        workdir (str): Directory for generated and output files.
+        src (str, optional): The fixture. Defaults to the fixture of the format.
+
+    Returns:
+        dict: The result for the input.
+    """
+    src = src if src else FIXTURES[fmt]
+    path = src if nref is None else synthetic_file(fmt, nref, workdir, src)
+    pdb_data = ProteinDataBank().extract_attributes_from_cif(MODELS[fmt]) if fmt in MODELS else {}
+
+    runs = []
+    # The conversion prints a lot - only keep the timings
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            # Each run parses the MTZ file again - not from the cache of the previous run
+            clear_mtz_cache()
+            runs.append(run_pipeline(fmt, path, pdb_data, workdir))
+
+    stages = {}
+    for stage in STAGES:
+        times = [run[0][stage] for run in runs if stage in run[0]]
+        error = next((run[1][stage] for run in runs if stage in run[1]), None)
+        if error is not None or not times:
+            stages[stage] = {"best": None, "median": None, "times": times, "error": error}
+        else:
+            stages[stage] = {"best": min(times), "median": statistics.median(times), "times": times}
+
+    return {
+        "format": fmt,
+        "fixture": os.path.basename(src),
+        "nref": nref if nref is not None else "native",
+        "size": os.path.getsize(path),
+        "stages": stages,
+        "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def format_seconds(seconds):
+    """Formats a time for the summary - failed stages have no time"""
+    return "failed" if seconds is None else f"{seconds:.3f}"
+
+
+def environment():
+    """Returns the versions the results depend on"""
+    return {
+        "sf_convert": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "gemmi": gemmi.__version__,
+        "platform": platform.platform(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare_results(results, baseline):
+    """
+    Compares results with a previous run.
+
+    Args:
+        results (list): The results of this run.
+        baseline (list): The results of a previous run.
+
+    Returns:
+        list: (format, nref, stage, baseline seconds, seconds, ratio) for inputs and stages in both.
+    """
+    previous = {(res["format"], res["nref"]): res["stages"] for res in baseline}
+    rows = []
+    for res in results:
+        old = previous.get((res["format"], res["nref"]))
+        if old is None:
+            continue
+        for stage, timing in res["stages"].items():
+            if timing["best"] is not None and old.get(stage, {}).get("best") is not None:
+                before = old[stage]["best"]
+                rows.append((res["format"], res["nref"], stage, before, timing["best"], timing["best"] / before if before > 0 else float("inf")))
+    return rows
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks the sf_convert conversion stages")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS, help="Input formats to benchmark")
+    parser.add_argument("--nref", nargs="+", type=parse_nref, default=[None], help="Numbers of reflections - 'native' or a count such as 1M, 10M")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of runs of each input (best and median are reported)")
+    parser.add_argument("--workdir", type=str, default=None, help="Directory for generated files - kept and reused if given")
+    parser.add_argument("--json", type=str, default=None, help="File to write the results to (default standard output)")
+    parser.add_argument("--baseline", type=str, default=None, help="Results of a previous run to compare with")
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+
+    workdir = args.workdir if args.workdir else tempfile.mkdtemp(prefix="sf_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        results = []
+        for fmt in args.formats:
+            for nref in args.nref:
+                res = run_benchmark(fmt, nref, max(args.repeat, 1), workdir)
+                results.append(res)
+                summary = "  ".join(f"{stage}={format_seconds(res['stages'][stage]['best'])}" for stage in STAGES)
+                sys.stderr.write(f"{fmt:6s} {str(res['nref']):>10s}  {summary}\n")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"schema": SCHEMA_VERSION, "environment": environment(), "repeat": max(args.repeat, 1), "results": results}
+
+    if args.json:
+        with open(args.json, "w") as fout:
+            json.dump(report, fout, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, "r") as fin:
+            baseline = json.load(fin)
+        for fmt, nref, stage, before, after, ratio in compare_results(results, baseline["results"]):
+            sys.stderr.write(f"{fmt:6s} {str(nref):>10s} {stage:16s} {before:9.3f} -> {after:9.3f}  x{ratio:.2f}\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
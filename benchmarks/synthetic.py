@@ -0,0 +1,199 @@
+# pylint: disable=E1101
+"""Synthetic structure factor files of a given size, scaled from the test fixtures.
+
+The reflection data of a fixture is repeated (cycling over its rows) until the requested
+number of reflections is reached.  Miller indices are regenerated so that they stay unique
+and in the usual sorted order; all other columns keep the values of the fixture, so the mix
+of missing values, free set flags, etc is the same as in the original file.
+"""
+
+import os
+import re
+
+import gemmi
+import numpy as np
+
+from mmcif.api.PdbxContainers import DataContainer
+from mmcif.io.IoAdapterCore import IoAdapterCore
+from sf_convert.sffile.sf_file import StructureFactorFile
+
+# Number of reflections formatted per write
+CHUNK_SIZE = 100000
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "data")
+
+# Default fixture for each input format
+FIXTURES = {
+    "mmcif": os.path.join(FIXTURE_DIR, "cif_files", "1o08-sf.cif"),
+    "mtz": os.path.join(FIXTURE_DIR, "mtz_files", "7yra.mtz"),
+    "cns": os.path.join(FIXTURE_DIR, "cif_files", "5pny-sf.CNS"),
+}
+
+# Model supplying the cell and space group of fixtures without them (as -pdb does)
+MODELS = {
+    "cns": os.path.join(FIXTURE_DIR, "cif_files", "5pny.cif"),
+}
+
+
+def generate_indices(nref):
+    """
+    Generates unique Miller indices, sorted by h, k then l.
+
+    Args:
+        nref (int): The number of reflections.
+
+    Returns:
+        tuple: (h, k, l) numpy.ndarray int64.  h >= 0, k and l centered on 0.
+    """
+    return _indices(np.arange(nref, dtype=np.int64), _side(nref))
+
+
+def _side(nref):
+    """Returns the edge of the smallest cube of indices holding nref reflections"""
+    side = max(int(round(nref ** (1.0 / 3.0))), 1)
+    while side**3 < nref:
+        side += 1
+    return side
+
+
+def _indices(idx, side):
+    """Returns the Miller indices of reflections idx in a cube of edge side"""
+    half = side // 2
+    return idx // (side * side), (idx // side) % side - half, idx % side - half
+
+
+def scale_mmcif(src, dest, nref):
+    """
+    Writes a PDBx/mmCIF structure factor file with nref reflections in the first data block.
+
+    Args:
+        src (str): The fixture.
+        dest (str): The file to write.
+        nref (int): The number of reflections.
+
+    Returns:
+        int: The number of reflections written.
+    """
+    sffile = StructureFactorFile()
+    sffile.read_file(src)
+    block = sffile.get_block_by_index(0)
+    refln = block.getObj("refln")
+
+    # Everything but the reflections is written as is
+    header = DataContainer(block.getName())
+    for catname in block.getObjNameList():
+        if catname != "refln":
+            header.append(block.getObj(catname))
+    IoAdapterCore().writeFile(dest, [header])
+
+    attrs = refln.getAttributeList()
+    nsrc = refln.getRowCount()
+    columns = [np.array(refln.getColumn(idx), dtype=object) for idx in range(len(attrs))]
+    hkl_pos = [attrs.index(attr) for attr in ["index_h", "index_k", "index_l"]]
+
+    side = _side(nref)
+    with open(dest, "a") as fout:
+        fout.write("#\nloop_\n")
+        fout.write("".join(f"_refln.{attr}\n" for attr in attrs))
+        for start in range(0, nref, CHUNK_SIZE):
+            idx = np.arange(start, min(start + CHUNK_SIZE, nref), dtype=np.int64)
+            rows = idx % nsrc
+            chunk = [col[rows] for col in columns]
+            for pos, ind in zip(hkl_pos, _indices(idx, side)):
+                chunk[pos] = ind
+            fout.write("".join(" ".join(row) + "\n" for row in zip(*[map(str, col.tolist()) for col in chunk])))
+        fout.write("#\n")
+
+    return nref
+
+
+def scale_mtz(src, dest, nref):
+    """
+    Writes an MTZ file with nref reflections.
+
+    Args:
+        src (str): The fixture.
+        dest (str): The file to write.
+        nref (int): The number of reflections.
+
+    Returns:
+        int: The number of reflections written.
+    """
+    mtz = gemmi.read_mtz_file(src)
+    data = np.array(mtz, copy=True)
+    rows = np.arange(nref, dtype=np.int64) % data.shape[0]
+    scaled = data[rows]
+    for pos, ind in enumerate(generate_indices(nref)):
+        scaled[:, pos] = ind
+
+    mtz.set_data(scaled)
+    mtz.write_to_file(dest)
+    return nref
+
+
+def scale_cns(src, dest, nref):
+    """
+    Writes a CNS/XPLOR reflection file with nref reflections.
+
+    Records (which may span lines) are copied from the fixture with new indices.
+
+    Args:
+        src (str): The fixture.
+        dest (str): The file to write.
+        nref (int): The number of reflections.
+
+    Returns:
+        int: The number of reflections written.
+    """
+    with open(src, "r") as fin:
+        text = fin.read()
+
+    # Header, then records starting with INDE
+    parts = re.split(r"(?i)\bINDE\w*\s", text)
+    header = re.sub(r"(?i)(NREF\w*\s*=\s*)\d+", lambda m: m.group(1) + str(nref), parts[0])
+    records = []
+    for part in parts[1:]:
+        # Drop the indices of the fixture
+        words = part.split(None, 3)
+        records.append((words[3].rstrip() if len(words) > 3 else "") + "\n")
+    records = np.array(records, dtype=object)
+    nsrc = len(records)
+
+    side = _side(nref)
+    with open(dest, "w") as fout:
+        fout.write(header)
+        for start in range(0, nref, CHUNK_SIZE):
+            idx = np.arange(start, min(start + CHUNK_SIZE, nref), dtype=np.int64)
+            h, k, l = _indices(idx, side)  # noqa: E741
+            fout.write("".join(map(" INDE {} {} {} {}".format, h.tolist(), k.tolist(), l.tolist(), records[idx % nsrc].tolist())))
+
+    return nref
+
+
+SCALERS = {"mmcif": scale_mmcif, "mtz": scale_mtz, "cns": scale_cns}
+
+# Extension of the generated files
+EXTENSIONS = {"mmcif": "cif", "mtz": "mtz", "cns": "cns"}
+
+
+def synthetic_file(fmt, nref, workdir, src=None):
+    """
+    Returns a file of a given format and size, generating it if not already in workdir.
+
+    Args:
+        fmt (str): The format ("mmcif", "mtz" or "cns").
+        nref (int): The number of reflections.
+        workdir (str): The directory holding generated files.
+        src (str, optional): The fixture to scale. Defaults to FIXTURES[fmt].
+
+    Returns:
+        str: The path of the file.
+    """
+    src = src if src else FIXTURES[fmt]
+    base = os.path.splitext(os.path.basename(src))[0]
+    dest = os.path.join(workdir, f"{base}_{nref}.{EXTENSIONS[fmt]}")
+    if not os.path.exists(dest):
+        tmp = dest + ".part"
+        SCALERS[fmt](src, tmp, nref)
+        os.replace(tmp, dest)
+    return dest
@@ -1,10 +1,57 @@
 """Script to provide utilities support sftool-server."""
 
 import argparse
+import concurrent.futures
 import os
 import json
+import time
 
-from sf_convert.sffile.guess_sf_format import guess_sf_format
+from sf_convert.sffile.guess_sf_format import sniff_sf_format
+
+
+def checkfmt(sf, confidence=False, timing=False):
+    """
+    Checks the format of one file.
+
+    Args:
+        sf (str): The structure factor file.
+        confidence (bool, optional): Adds the confidence of the format.
+        timing (bool, optional): Adds the seconds taken.
+
+    Returns:
+        list: The file, its format and the optional fields.
+    """
+    start = time.perf_counter()
+    if os.path.isfile(sf):
+        res, score = sniff_sf_format(sf)
+    else:
+        res, score = "Could not open file", 0.0
+
+    result = [sf, res]
+    if confidence:
+        result.append(round(score, 3))
+    if timing:
+        result.append(round(time.perf_counter() - start, 6))
+    return result
+
+
+def positive_int(value):
+    """
+    Argument type for a count of at least one.
+
+    Args:
+        value (str): The argument.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not a positive integer.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
 
 
 def checkfmts(args):
@@ -13,17 +60,21 @@ def checkfmts(args):
     out_json = args.json or not args.text
     out_text = args.text
 
-    result = []
-    for sf in args.sf:
-        if os.path.isfile(sf):
-            res = guess_sf_format(sf)
-        else:
-            res = "Could not open file"
-        result.append([sf, res])
+    def check(sf):
+        return checkfmt(sf, args.confidence, args.timing)
+
+    # Mostly waiting on files - threads are enough
+    nworkers = min(args.nproc, len(args.sf)) if args.nproc is not None else None
+    if nworkers == 1 or len(args.sf) == 1:
+        result = [check(sf) for sf in args.sf]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=nworkers) as executor:
+            # Results in the order of the files
+            result = list(executor.map(check, args.sf))
 
     if out_text:
         for line in result:
-            print(line[0], line[1])
+            print(*line)
     if out_json:
         print(json.dumps(result))
 
@@ -52,6 +103,14 @@ def create_parser():
     group_fmt.add_argument('--text', action='store_true',
                            help="Output text format")
 
+    parser_fmt.add_argument('--confidence', action='store_true',
+                            help="Also output the confidence (0 to 1) of each format")
+
+    parser_fmt.add_argument('--timing', action='store_true',
+                            help="Also output the seconds taken for each file")
+    parser_fmt.add_argument('--nproc', type=positive_int, default=None,
+                            help="Number of files checked at once (default depends on the number of CPUs)")
+
     parser_fmt.set_defaults(func=checkfmts)
 
     return parser
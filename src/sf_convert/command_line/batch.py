@@ -0,0 +1,245 @@
+"""Script to run many sf_convert conversions in a pool of processes.
+
+Invoked:
+        sf_convert_batch -manifest jobs.json -nproc 8 -outdir batch_out
+
+The manifest is a JSON list of jobs (or an object with "jobs" and "defaults"), or a CSV file
+with a header row.  The keys of a job are the sf_convert options without the dash:
+
+        [{"id": "1abc", "sf": ["r1abcsf.mtz"], "o": "mmcif", "pdb": "1abc.cif", "freer": 1}, ...]
+
+In a CSV file several "sf" files are separated by spaces.  Relative paths are relative to the
+directory of the manifest.  Each job runs in its own directory (outdir/id), which receives the
+sf_information.cif, SF_4_validate.cif, diagnostics and console output of the conversion.
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import traceback
+
+from sf_convert.command_line.main import main as sf_convert_main
+from sf_convert.utils.MtzUtils import clear_mtz_cache
+
+# Manifest keys that are sf_convert options
+OPTIONS = ["i", "o", "sf", "out", "label", "pdb", "pdb_id", "freer", "wave", "diags", "detail", "valid", "profile", "pstats"]
+
+# Options naming files - made absolute as jobs run in their own directory
+PATH_OPTIONS = ["sf", "out", "pdb", "diags", "profile", "pstats"]
+
+# Files written in the directory of each job
+LOG_NAME = "sf_convert.log"
+DIAGS_NAME = "diags.txt"
+
+
+def load_manifest(path):
+    """
+    Reads the jobs of a manifest.
+
+    Args:
+        path (str): The JSON or CSV (.csv extension) manifest.
+
+    Returns:
+        list: A dictionary of options per job.
+
+    Raises:
+        ValueError: If the manifest is not a list of jobs.
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, "r", newline="") as fin:
+            entries = []
+            for row in csv.DictReader(fin):
+                entry = {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                if "sf" in entry:
+                    entry["sf"] = entry["sf"].split()
+                if "valid" in entry:
+                    entry["valid"] = entry["valid"].lower() in ["1", "true", "yes", "y"]
+                entries.append(entry)
+        return entries
+
+    with open(path, "r") as fin:
+        data = json.load(fin)
+
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults", {})
+        data = data.get("jobs")
+    if not isinstance(data, list) or not all(isinstance(entry, dict) for entry in data):
+        raise ValueError(f"Manifest {path} is not a list of jobs")
+
+    return [{**defaults, **entry} for entry in data]
+
+
+def build_jobs(entries, basedir, outdir):
+    """
+    Turns manifest entries into sf_convert command lines.
+
+    Args:
+        entries (list): The options of each job.
+        basedir (str): Directory relative paths are relative to.
+        outdir (str): Directory holding the directory of each job.
+
+    Returns:
+        list: Jobs - dictionaries with the index, id, argv and workdir of the job.
+    """
+    jobs = []
+    seen = set()
+    for index, entry in enumerate(entries):
+        entry = dict(entry)
+        if isinstance(entry.get("sf"), str):
+            entry["sf"] = [entry["sf"]]
+
+        for key in PATH_OPTIONS:
+            if key == "sf" and entry.get("sf"):
+                entry["sf"] = [os.path.join(basedir, sf) for sf in entry["sf"]]
+            elif key != "sf" and entry.get(key):
+                entry[key] = os.path.join(basedir, entry[key])
+
+        # Directory names must be unique and safe
+        jobid = str(entry.get("id") or f"{index:05d}_{os.path.basename(entry['sf'][0]) if entry.get('sf') else 'nosf'}")
+        jobid = re.sub(r"[^\w.+-]", "_", jobid).lstrip(".") or f"{index:05d}"
+        if jobid in seen:
+            jobid = f"{jobid}_{index:05d}"
+        seen.add(jobid)
+        workdir = os.path.abspath(os.path.join(outdir, jobid))
+
+        # Outputs go to the job directory unless given
+        if not entry.get("out") and entry.get("sf") and entry.get("o"):
+            entry["out"] = os.path.join(workdir, f"{os.path.basename(entry['sf'][0])}.{entry['o']}")
+        if not entry.get("diags"):
+            entry["diags"] = os.path.join(workdir, DIAGS_NAME)
+
+        argv = []
+        for key in OPTIONS:
+            value = entry.get(key)
+            if value is None or value is False or value == "":
+                continue
+            if key == "sf":
+                argv += ["-sf"] + list(value)
+            elif key == "valid":
+                argv.append("-valid")
+            else:
+                argv += [f"-{key}", str(value)]
+
+        jobs.append({"index": index, "id": jobid, "argv": argv, "workdir": workdir, "output": entry.get("out")})
+
+    return jobs
+
+
+def run_job(job, logger=None):
+    """
+    Runs one conversion in the directory of the job.  Console output goes to a log file in that directory.
+
+    Args:
+        job (dict): The job, from build_jobs().
+        logger (PInfoBase, optional): Collects the errors and information of the conversion. Defaults to a new logger per job.
+
+    Returns:
+        dict: The result - id, status ("ok" or "failed"), exit code, elapsed time, directory and output file.
+    """
+    os.makedirs(job["workdir"], exist_ok=True)
+    cwd = os.getcwd()
+    exit_code = 0
+    start = time.perf_counter()
+
+    with open(os.path.join(job["workdir"], LOG_NAME), "w") as flog, contextlib.redirect_stdout(flog), contextlib.redirect_stderr(flog):
+        try:
+            # sf_information.cif and SF_4_validate.cif are written in the current directory
+            os.chdir(job["workdir"])
+            sf_convert_main(job["argv"], logger)
+        except SystemExit as exc:
+            exit_code = exc.code if isinstance(exc.code, int) else 0 if exc.code is None else 1
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            os.chdir(cwd)
+            # Parsed MTZ files are not kept from one job to the next in a pool worker
+            clear_mtz_cache()
+
+    return {
+        "index": job["index"],
+        "id": job["id"],
+        "status": "ok" if exit_code == 0 else "failed",
+        "exit_code": exit_code,
+        "elapsed": time.perf_counter() - start,
+        "workdir": job["workdir"],
+        "output": job["output"],
+    }
+
+
+def run_batch(jobs, nproc, maxtasks=None, callback=None):
+    """
+    Runs jobs in a pool of processes.
+
+    Args:
+        jobs (list): The jobs, from build_jobs().
+        nproc (int): The number of processes.  1 runs the jobs in this process.
+        maxtasks (int, optional): Jobs run by a process before it is replaced. Defaults to no limit.
+        callback (callable, optional): Called with the result of each job as it completes.
+
+    Returns:
+        list: The results, in the order of the jobs.
+    """
+    results = []
+    if nproc <= 1 or len(jobs) <= 1:
+        completed = map(run_job, jobs)
+        for res in completed:
+            results.append(res)
+            if callback:
+                callback(res)
+    else:
+        with multiprocessing.Pool(processes=min(nproc, len(jobs)), maxtasksperchild=maxtasks) as pool:
+            for res in pool.imap_unordered(run_job, jobs):
+                results.append(res)
+                if callback:
+                    callback(res)
+
+    return sorted(results, key=lambda res: res["index"])
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="Runs sf_convert on the files of a manifest in parallel")
+    parser.add_argument("-manifest", type=str, required=True, help="JSON or CSV file listing the conversions")
+    parser.add_argument("-nproc", type=int, default=os.cpu_count() or 1, help="Number of processes (default number of CPUs)")
+    parser.add_argument("-outdir", type=str, default="sf_convert_batch", help="Directory for the files of each job")
+    parser.add_argument("-report", type=str, default=None, help="JSON summary of the jobs (default outdir/batch_report.json)")
+    parser.add_argument("-maxtasks", type=int, default=None, help="Jobs run by a process before it is replaced")
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+
+    try:
+        entries = load_manifest(args.manifest)
+    except (OSError, ValueError) as exc:
+        print(f"Error: cannot read manifest {args.manifest}: {exc}")
+        return 2
+
+    jobs = build_jobs(entries, os.path.dirname(os.path.abspath(args.manifest)), args.outdir)
+    os.makedirs(args.outdir, exist_ok=True)
+
+    def progress(res):
+        print(f"{res['status']:6s} {res['id']} ({res['elapsed']:.1f}s)", flush=True)
+
+    start = time.perf_counter()
+    results = run_batch(jobs, args.nproc, args.maxtasks, progress)
+    nfailed = sum(1 for res in results if res["status"] != "ok")
+
+    report = args.report if args.report else os.path.join(args.outdir, "batch_report.json")
+    with open(report, "w") as fout:
+        json.dump({"manifest": os.path.abspath(args.manifest), "jobs": len(results), "failed": nfailed, "elapsed": time.perf_counter() - start, "results": results}, fout, indent=2)
+
+    print(f"Completed {len(results)} conversions, {nfailed} failed.  Report in {report}")
+    return 0 if nfailed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,8 +20,6 @@ import argparse
 import os
 import sys
 
-from sf_convert.utils.GenMtzHtml import GenMtzHtml
-
 
 def main():
     parser = argparse.ArgumentParser(description="Generates HTML forms for use in manually providing input for SF conversion")
@@ -62,6 +60,9 @@ def main():
     }
 
     if args.mtz_man_html:
+        # gemmi is only loaded once the arguments are checked
+        from sf_convert.utils.GenMtzHtml import GenMtzHtml
+
         gmh = GenMtzHtml(d)
         gmh.genMtzInfor()
 
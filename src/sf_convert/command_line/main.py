@@ -4,20 +4,11 @@ import os
 import re
 import sys
 
-from sf_convert.sffile.sf_file import StructureFactorFile
-from sf_convert.sffile.get_items_pdb import ProteinDataBank
-from sf_convert.import_dir.import_mtz import ImportMtz
-from sf_convert.import_dir.import_cif import ImportCif
-from sf_convert.import_dir.import_cns import ImportCns
-from sf_convert.export_dir.export_cns import ExportCns
-from sf_convert.export_dir.export_mtz import ExportMtz
-from sf_convert.export_dir.export_cif import ExportCif
+# Importers, exporters and the checks (and with them gemmi, numpy and mmcif) are imported where
+# used - so that --help and each conversion only load what they need
 from sf_convert.sffile.guess_sf_format import guess_sf_format
-from sf_convert.utils.reformat_sfhead import reformat_sfhead, fix_entry_ids
-from sf_convert.utils.sf_correct import SfCorrect
-from sf_convert.utils.pinfo_file import PStreamLogger
-from sf_convert.utils.CheckSfFile import CheckSfFile
 from sf_convert.utils.version import get_version
+from sf_convert.utils.profiler import PROFILER, profile_paths, stage
 from sf_convert.utils.TextUtils import is_cif
 
 VALID_FORMATS = ["CNS", "MTZ", "MMCIF", "CIF"]
@@ -37,15 +28,16 @@ class ImportSf:
         format_in = pdict["inp_format"].lower()
 
         sf = None
-        if format_in in ["mmcif", "cif"]:
-            sf = self.__import_mmcif(pdict)
-        elif format_in == "cns":
-            sf = self.__import_cns(pdict)
-        elif format_in == "mtz":
-            sf = self.__import_mtz(pdict)
-        else:
-            print("Internal error type unknown")
-            sys.exit(1)
+        with stage(f"import_{format_in}"):
+            if format_in in ["mmcif", "cif"]:
+                sf = self.__import_mmcif(pdict)
+            elif format_in == "cns":
+                sf = self.__import_cns(pdict)
+            elif format_in == "mtz":
+                sf = self.__import_mtz(pdict)
+            else:
+                print("Internal error type unknown")
+                sys.exit(1)
 
         return sf
 
@@ -60,8 +52,12 @@ class ImportSf:
         pdb_cell = pdb_data.get("CELL", None)
         pdb_id_cmd = pdict.get("pdb_id", None)
 
+        from sf_convert.import_dir.import_cif import ImportCif
+        from sf_convert.utils.sf_correct import SfCorrect
+
         ic = ImportCif(self.__logger)
-        ic.import_files(sfin)
+        with stage("read"):
+            ic.import_files(sfin)
         sffile = ic.get_sf()
 
         # We apply corrections if cif -> cif conversion, otherwise bring in
@@ -118,6 +114,9 @@ class ImportSf:
         return sffile
 
     def __import_mtz(self, pdict):
+        from sf_convert.import_dir.import_mtz import ImportMtz
+        from sf_convert.utils.sf_correct import SfCorrect
+
         sfin = pdict["sfin"]
         pdb_data = pdict.get("pdb_data", {})
         pdb_id_cmd = pdict.get("pdb_id", None)
@@ -135,7 +134,8 @@ class ImportSf:
         if free:
             converter.set_free(free)
 
-        converter.import_files(sfin)
+        with stage("read"):
+            converter.import_files(sfin)
 
         sffile = converter.get_sf()
 
@@ -160,6 +160,10 @@ class ImportSf:
         return sffile
 
     def __import_cns(self, pdict):
+        from sf_convert.import_dir.import_cns import ImportCns
+        from sf_convert.utils.reformat_sfhead import fix_entry_ids
+        from sf_convert.utils.sf_correct import SfCorrect
+
         sfin = pdict["sfin"]
         pdb_data = pdict.get("pdb_data", {})
         # pdb_wave = pdb_data.get("WAVE", None)
@@ -171,7 +175,8 @@ class ImportSf:
 
         ic = ImportCns(self.__logger)
         ic.set_free(free)
-        ic.import_files(sfin)
+        with stage("read"):
+            ic.import_files(sfin)
         sffile = ic.get_sf()
 
         if pdb_id_cmd:
@@ -216,17 +221,20 @@ class ExportSf:
 
         format_out = pdict["out_format"].lower()
 
-        if format_out in ["mmcif", "cif"]:
-            self.__export_mmcif(sffile, pdict)
-        elif format_out == "cns":
-            self.__export_cns(sffile, pdict)
-        elif format_out == "mtz":
-            self.__export_mtz(sffile, pdict)
-        else:
-            print("Internal error type unknown", format_out)
-            sys.exit(1)
+        with stage(f"export_{format_out}"):
+            if format_out in ["mmcif", "cif"]:
+                self.__export_mmcif(sffile, pdict)
+            elif format_out == "cns":
+                self.__export_cns(sffile, pdict)
+            elif format_out == "mtz":
+                self.__export_mtz(sffile, pdict)
+            else:
+                print("Internal error type unknown", format_out)
+                sys.exit(1)
 
     def __export_mmcif(self, sffile, pdict):
+        from sf_convert.export_dir.export_cif import ExportCif
+
         output = pdict["output"]
 
         ec = ExportCif(self.__legacy)
@@ -234,6 +242,8 @@ class ExportSf:
         ec.write_file(output)
 
     def __export_cns(self, sffile, pdict):
+        from sf_convert.export_dir.export_cns import ExportCns
+
         output = pdict["output"]
 
         CNSexport = ExportCns(self.__logger)
@@ -241,6 +251,8 @@ class ExportSf:
         CNSexport.write_file(output)
 
     def __export_mtz(self, sffile, pdict):
+        from sf_convert.export_dir.export_mtz import ExportMtz
+
         output = pdict["output"]
 
         MTZexport = ExportMtz(self.__logger)
@@ -256,6 +268,8 @@ class SFConvertMain:
 
     def convert(self, pdict):
         """Handles the conversion as needed"""
+        from sf_convert.utils.CheckSfFile import CheckSfFile
+
         impsf = ImportSf(self.__logger)
         sffile = impsf.import_sf(pdict)
 
@@ -318,6 +332,9 @@ class CustomHelpParser(argparse.ArgumentParser):
     -detail  followed by a text (-detail " text " ), give a note to the data set.
     -wave    followed by a wavelength (-wave 0.998). It overwrites the existing one.
     -diags   followed by a log file (-diags file) containing warning/error message.
+    -profile followed by a file (-profile file.json) receiving the time and memory of each step.
+    -pstats  followed by a file (-pstats file.prof) receiving cProfile statistics (see pstats).
+             Both can also be set with the SF_CONVERT_PROFILE and SF_CONVERT_PSTATS variables.
 
         Other not often used options (below) can be added to the argument:
     -valid   check various SF errors, and correct!(sf_convert -valid sffile)
@@ -484,10 +501,11 @@ def handle_pdb_argument(args, pdb, logger):
         FileNotFoundError: If the PDB file does not exist.
     """
     validate_file_exists(args.pdb)
-    if is_cif(args.pdb, logger):
-        return pdb.extract_attributes_from_cif(args.pdb)
-    else:
-        return pdb.extract_attributes_from_pdb(args.pdb)
+    with stage("read_model"):
+        if is_cif(args.pdb, logger):
+            return pdb.extract_attributes_from_cif(args.pdb)
+        else:
+            return pdb.extract_attributes_from_pdb(args.pdb)
 
 
 def handle_label_argument(args):
@@ -549,6 +567,9 @@ def handle_valid_argument(args, logger):
         args: The command line arguments.
         logger: The PInfoLogger object.
     """
+    from sf_convert.sffile.sf_file import StructureFactorFile
+    from sf_convert.utils.CheckSfFile import CheckSfFile
+
     sffile = StructureFactorFile()
     sffile.read_file(args.sf)
     n = sffile.get_number_of_blocks()
@@ -567,6 +588,8 @@ def reformat_sf_header(sffile, pdbid, logger, detail=None):
         logger: The PInfoLogger object.
         detail: Any details
     """
+    from sf_convert.utils.reformat_sfhead import reformat_sfhead
+
     _ = reformat_sfhead(sffile, pdbid, logger, detail)
 
 
@@ -642,12 +665,22 @@ def convert_files(args, input_format, pdb_data, logger):
     return rdict
 
 
-def main():
+def main(argv=None, logger=None):
     """
     The main function that handles the execution of the sf_convert script.
+
+    Args:
+        argv (list, optional): The command line arguments. Defaults to sys.argv.
+        logger (PInfoBase, optional): Collects the errors and information of the conversion. Defaults to a new PStreamLogger.
     """
+    # The profile is written, and profiling stopped, however the conversion ends - also for sys.exit()
+    profile = pstats = None
     try:
-        args = parse_arguments()
+        args = parse_arguments(argv)
+
+        profile, pstats = profile_paths(args.profile, args.pstats)
+        if profile or pstats:
+            PROFILER.enable(cprofile=pstats is not None)
 
         version = get_version()
 
@@ -655,8 +688,12 @@ def main():
         print(f"              {version}")
         print("=======================================================================")
 
+        from sf_convert.sffile.get_items_pdb import ProteinDataBank
+        from sf_convert.utils.pinfo_file import PStreamLogger
+
         pdb = ProteinDataBank()
-        logger = PStreamLogger()
+        if logger is None:
+            logger = PStreamLogger()
 
         input_format = get_input_format(args)
 
@@ -685,22 +722,47 @@ def main():
         print(f"Error: {e}")
         traceback.print_exc()
         sys.exit(2)
+    else:
+        # Write out final files
 
-    # Write out final files
+        outpath = rdict["output"]
+        outformat = rdict["out_format"].lower()
+        print(f"Output File Name = {outpath} : ({outformat} format)")
 
-    outpath = rdict["output"]
-    outformat = rdict["out_format"].lower()
-    print(f"Output File Name = {outpath} : ({outformat} format)")
+        diags = args.diags if args.diags else None
 
-    diags = args.diags if args.diags else None
+        logger.output_reports("sf_information.cif", diags)
+    finally:
+        write_profile(profile, pstats)
 
-    logger.output_reports("sf_information.cif", diags)
 
+def write_profile(profile, pstats):
+    """
+    Writes the time and memory of each step, if asked for.
 
-def parse_arguments() -> argparse.Namespace:
+    Args:
+        profile (str): The JSON report, or None.
+        pstats (str): The cProfile statistics, or None.
+    """
+    if not PROFILER.enabled:
+        return
+
+    PROFILER.disable()
+    if profile:
+        PROFILER.write_report(profile)
+        print(f"Profile written to {profile}")
+    if pstats:
+        PROFILER.dump_stats(pstats)
+        print(f"cProfile statistics written to {pstats}")
+
+
+def parse_arguments(argv=None) -> argparse.Namespace:
     """
     Parses and returns the command line arguments.
 
+    Args:
+        argv (list, optional): The command line arguments. Defaults to sys.argv.
+
     Returns:
         The parsed command line arguments.
     """
@@ -718,8 +780,10 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument("-diags", type=str, help="Log file containing warning/error message")
     parser.add_argument("-detail", type=str, help="Give a note to the data set")
     parser.add_argument("-valid", action="store_true", help="Check various SF errors, and correct!")
+    parser.add_argument("-profile", type=str, help="JSON file receiving the time and memory of each step")
+    parser.add_argument("-pstats", type=str, help="File receiving cProfile statistics")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
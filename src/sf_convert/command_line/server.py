@@ -0,0 +1,360 @@
+"""Persistent sf_convert server for a deposition front end.
+
+Invoked:
+        sf_convert_server -socket /run/sf_convert.sock -workdir /data/sf_jobs
+        sf_convert_server -port 8710 -workdir /data/sf_jobs
+
+The libraries and data tables are loaded once when the server starts.  Each request is then
+served by a forked copy of the server, so requests are isolated from each other and do not pay
+the start up cost.  The API is JSON over HTTP - on a Unix domain socket or on the loopback interface:
+
+        POST /convert  {"sf": [...], "o": "mmcif", ...}   sf_convert options without the dash
+        POST /check    {"sf": "file"}                      as sf_convert -valid
+        POST /guess    {"sf": ["file", ...]}               as sf_convert_util checkfmts
+        GET  /status
+
+/convert and /check return the status, the files written and the error and information
+messages that sf_convert writes to sf_information.cif.  Relative paths are relative to the
+directory the server was started in.
+"""
+
+import argparse
+import contextlib
+import http.client
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from sf_convert.command_line.batch import LOG_NAME, build_jobs, run_job
+from sf_convert.sffile.guess_sf_format import guess_sf_format
+from sf_convert.sffile.sf_file import StructureFactorFile
+from sf_convert.utils.CheckSfFile import CheckSfFile
+from sf_convert.utils.dict_filter import DictFilter
+from sf_convert.utils.pinfo_file import PStreamLogger
+from sf_convert.utils.version import get_version
+
+# Modules used by the conversions - imported before the first request
+PRELOAD_MODULES = [
+    "gemmi",
+    "numpy",
+    "mmcif.api.DataCategory",
+    "mmcif.api.PdbxContainers",
+    "mmcif.io.IoAdapterCore",
+    "sf_convert.command_line.main",
+    "sf_convert.export_dir.export_cif",
+    "sf_convert.export_dir.export_cns",
+    "sf_convert.export_dir.export_mtz",
+    "sf_convert.import_dir.import_cif",
+    "sf_convert.import_dir.import_cns",
+    "sf_convert.import_dir.import_mtz",
+    "sf_convert.utils.SpaceGroup",
+    "sf_convert.utils.sf_correct",
+]
+
+
+def preload():
+    """Imports the conversion modules and loads their data tables, so forked requests share them"""
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+
+    DictFilter().loadDataDictionary()
+
+
+class SfConvertRequestHandler(BaseHTTPRequestHandler):
+    """Serves one request - runs in a forked copy of the server"""
+
+    server_version = "sf_convert_server"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path == "/status":
+            self.__send(200, {"status": "ok", "version": get_version(), "pid": os.getpid()})
+        else:
+            self.__send(404, {"status": "failed", "message": f"Unknown request {self.path}"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        actions = {"/convert": self.server.convert, "/check": self.server.check, "/guess": self.server.guess}
+        action = actions.get(self.path)
+        if action is None:
+            self.__send(404, {"status": "failed", "message": f"Unknown request {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Request is not a JSON object")
+        except ValueError as e:
+            self.__send(400, {"status": "failed", "message": f"Invalid request: {e}"})
+            return
+
+        self.__send(200, action(request))
+
+    def __send(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # No client address on a Unix domain socket
+        return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "local"
+
+
+class SfConvertServerMixIn(socketserver.ForkingMixIn):
+    """Request handling shared by the Unix socket and TCP servers"""
+
+    # Set by setup_work()
+    workdir = None
+    basedir = None
+
+    def setup_work(self, workdir, basedir):
+        """
+        Sets where request files go.
+
+        Args:
+            workdir (str): Directory receiving one directory per request.
+            basedir (str): Directory relative paths in requests are relative to.
+        """
+        self.workdir = workdir
+        self.basedir = basedir
+
+    def __new_job(self, request, prefix):
+        """Creates a job from request options, with a directory of its own"""
+        jobdir = tempfile.mkdtemp(prefix=prefix, dir=self.workdir)
+        entry = dict(request)
+        entry["id"] = os.path.basename(jobdir)
+        return build_jobs([entry], self.basedir, self.workdir)[0]
+
+    @staticmethod
+    def __read_log(job):
+        try:
+            with open(os.path.join(job["workdir"], LOG_NAME), "r") as fin:
+                return fin.read()
+        except OSError:
+            return ""
+
+    def convert(self, request):
+        """
+        Converts a file as sf_convert does.
+
+        Args:
+            request (dict): The sf_convert options, without the dash.
+
+        Returns:
+            dict: Result with the output file, the directory of the request and the sf_information.cif messages.
+        """
+        unknown = set(request) - {"i", "o", "sf", "out", "label", "pdb", "pdb_id", "freer", "wave", "detail"}
+        if unknown:
+            return {"status": "failed", "message": f"Unknown options: {sorted(unknown)}"}
+
+        job = self.__new_job(request, "convert_")
+        logger = PStreamLogger()
+        result = run_job(job, logger)
+        err, info = logger.get_reports()
+
+        return {
+            "status": result["status"],
+            "exit_code": result["exit_code"],
+            "output": result["output"],
+            "out_format": request.get("o"),
+            "workdir": job["workdir"],
+            "sf_information": os.path.join(job["workdir"], "sf_information.cif"),
+            "sf_4_validate": os.path.join(job["workdir"], "SF_4_validate.cif"),
+            "error": err,
+            "information": info,
+            "log": self.__read_log(job),
+        }
+
+    def check(self, request):
+        """
+        Checks a PDBx/mmCIF structure factor file as sf_convert -valid does.
+
+        Args:
+            request (dict): "sf" the file to check.
+
+        Returns:
+            dict: Result with the SF_4_validate.cif file written and the messages of the check.
+        """
+        sf = request.get("sf")
+        if isinstance(sf, list):
+            sf = sf[0] if sf else None
+        if not sf:
+            return {"status": "failed", "message": "No sf file given"}
+
+        job = self.__new_job({"sf": sf}, "check_")
+        logger = PStreamLogger()
+        validate = os.path.join(job["workdir"], "SF_4_validate.cif")
+        status = "ok"
+
+        with open(os.path.join(job["workdir"], LOG_NAME), "w") as flog, contextlib.redirect_stdout(flog), contextlib.redirect_stderr(flog):
+            try:
+                sffile = StructureFactorFile()
+                sffile.read_file(os.path.join(self.basedir, sf))
+                sf_stat = CheckSfFile(sffile, logger)
+                sf_stat.check_sf_all_blocks(sffile.get_number_of_blocks())
+                sf_stat.write_sf_4_validation(validate)
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+                status = "failed"
+
+        err, info = logger.get_reports()
+        return {
+            "status": status,
+            "workdir": job["workdir"],
+            "sf_4_validate": validate if status == "ok" else None,
+            "error": err,
+            "information": info,
+            "log": self.__read_log(job),
+        }
+
+    def guess(self, request):
+        """
+        Guesses the format of files as sf_convert_util checkfmts does.
+
+        Args:
+            request (dict): "sf" the file or list of files.
+
+        Returns:
+            dict: Result with "formats" - [file, format] for each file.
+        """
+        sflist = request.get("sf", [])
+        if isinstance(sflist, str):
+            sflist = [sflist]
+
+        formats = []
+        for sf in sflist:
+            path = os.path.join(self.basedir, sf)
+            formats.append([sf, guess_sf_format(path) if os.path.isfile(path) else "Could not open file"])
+        return {"status": "ok", "formats": formats}
+
+
+class SfConvertUnixServer(SfConvertServerMixIn, socketserver.UnixStreamServer):
+    """Server on a Unix domain socket"""
+
+    # True once this server has bound the socket - only then does it remove it
+    __bound = False
+
+    def server_bind(self):
+        """
+        Binds the socket, replacing a socket left by a server that did not shut down.
+
+        Raises:
+            OSError: If the path exists and is not a socket, or a server is listening on it.
+        """
+        path = self.server_address
+        if os.path.lexists(path):
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise OSError(f"{path} exists and is not a socket")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(path)
+                except ConnectionRefusedError:
+                    os.remove(path)
+                else:
+                    raise OSError(f"A server is already listening on {path}")
+        super().server_bind()
+        self.__bound = True
+
+    def server_close(self):
+        super().server_close()
+        if self.__bound and os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class SfConvertTCPServer(SfConvertServerMixIn, HTTPServer):
+    """Server on the loopback interface"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.__path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.__path)
+
+
+def send_request(address, path, payload=None, timeout=None):
+    """
+    Sends a request to a running server.
+
+    Args:
+        address (str or int): Path of the Unix domain socket, or port on the loopback interface.
+        path (str): The request (i.e. "/convert").
+        payload (dict, optional): The request options. GET if None.
+        timeout (float, optional): Seconds to wait for the reply.
+
+    Returns:
+        tuple: (int, dict) the HTTP status and the reply.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", address, timeout=timeout) if isinstance(address, int) else UnixHTTPConnection(address, timeout=timeout)
+    try:
+        if payload is None:
+            conn.request("GET", path)
+        else:
+            conn.request("POST", path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="Serves sf_convert conversions over a local socket")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-socket", type=str, help="Path of the Unix domain socket to listen on")
+    group.add_argument("-port", type=int, help="Port to listen on (loopback interface only)")
+    parser.add_argument("-workdir", type=str, default=None, help="Directory for the files of each request (default a temporary directory)")
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="sf_convert_server_")
+    os.makedirs(workdir, exist_ok=True)
+
+    preload()
+
+    try:
+        if args.socket:
+            server = SfConvertUnixServer(args.socket, SfConvertRequestHandler)
+        else:
+            server = SfConvertTCPServer(("127.0.0.1", args.port), SfConvertRequestHandler)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    server.setup_work(workdir, os.getcwd())
+
+    def shutdown(signum, frame):  # pylint: disable=unused-argument
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, shutdown)
+
+    print(f"{get_version()} serving on {args.socket if args.socket else args.port}, files in {workdir}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,9 @@
+import numpy as np
+
+# Number of reflections formatted per write to the output file
+WRITE_BATCH_SIZE = 20000
+
+
 class ExportCns:
     def __init__(self, logger, legacy=False):  # pylint: disable=unused-argument
         """
@@ -10,21 +16,11 @@ class ExportCns:
         self.__attr_existence = {}
 
         # Init here
-        self.__status = None
-        self.__Io = None
-        self.__sIo = None
         self.__nref = 0
-        self.__refln_data = None
-        self.__sf_block = None
-
-        # The following use setattr to init - but simplify for pylint - as we declare what we need
-        self.__hla = self.__hlb = self.__hlc = self.__hld = self.__fom = None
-        self.__F_plus = self.__F_minus = self.__sF_plus = self.__sF_minus = None
-        self.__I_plus = self.__I_minus = self.__sI_plus = self.__sI_minus = None
-        self.__Fo_au = self.__sFo_au = None
-        self.__F2c = self.__Ic = self.__Fo = self.__sFo = None
-        self.__Fc_au = self.__F2o = self.__Fc = None
-        self.__H = self.__K = self.__L = None
+        self.__table = None
+        self.__columns = {}  # Variable (i.e. "Fo_au", "Io") -> attribute name in refln
+        self.__values = {}  # Variable -> (bool array of rows with a value, float array with 0 for unset/unparsable)
+        self.__f_i = None
 
         # Define attributes
         self.attributes = {
@@ -68,24 +64,28 @@ class ExportCns:
         """
         Initializes the reflection data from the StructureFactorFile object.
         """
-        self.__sf_block = self.__sf_file.get_block_by_index(0)
-        self.__refln_data = self.__sf_block.getObj("refln")
+        self.__table = self.__sf_file.get_reflection_table("refln", 0)
+        self.__values = {}
+        self.__f_i = None
 
     def __initialize_counts(self):
         """
         Initializes the number of reflections.
         """
-        if self.__refln_data:
-            self.__nref = self.__refln_data.getRowCount()
+        if self.__table:
+            self.__nref = self.__table.get_row_count()
 
     def __check_attributes_exist(self):
         """
-        Checks the existence of specific attributes in the reflection data.
+        Checks the existence of specific attributes in the reflection data, and resolves the column used for each variable.
         """
+        self.__columns = {}
         for attr, value in self.attributes.items():
-            self.__attr_existence[value] = self.__refln_data.hasAttribute(attr)
+            self.__attr_existence[value] = self.__table.has_attribute(attr)
+            if self.__attr_existence[value]:
+                self.__columns[value] = attr
 
-        # Check existence of specific attributes
+        # Check existence of specific attributes - first one present is used
         check_attributes = {
             "Io": ["intensity_meas", "intensity_meas_au", "intensity"],
             "sIo": ["intensity_sigma", "intensity_sigma_au", "intensity_sigm", "intensity_meas_sigma", "intensity_meas_sigma_au"],
@@ -93,79 +93,168 @@ class ExportCns:
         }
 
         for attribute, alternatives in check_attributes.items():
-            self.__attr_existence[attribute] = any(self.__refln_data.hasAttribute(alternative) for alternative in alternatives)
+            present = [alternative for alternative in alternatives if self.__table.has_attribute(alternative)]
+            self.__attr_existence[attribute] = len(present) > 0
+            if present:
+                self.__columns[attribute] = present[0]
 
-    def __initialize_columns_at_index(self, i):
+    def __get_values(self, var):
         """
-        Initializes the columns at a given index.
+        Converts the column of a variable once.
 
         Args:
-            i (int): The index of the columns to initialize.
-        """
-        attL = self.__refln_data.getAttributeList()
-
-        # First row - set attribute for columns that do not exist
-        if i == 0:
-            for attr, var in self.attributes.items():
-                if attr not in attL:
-                    setattr(self, "_ExportCns__" + var, None)
-
-        for attr, var in self.attributes.items():
-            if attr in attL:
-                value = self.__refln_data.getValue(attr, i)
-                setattr(self, "_ExportCns__" + var, value)
+            var (str): The variable (i.e. "Fo_au").
 
-        self.__initialize_Io_at_index(i)
-        self.__initialize_sIo_at_index(i)
-        self.__initialize_status_at_index(i)
-
-    def __initialize_Io_at_index(self, i):
+        Returns:
+            tuple: (numpy.ndarray bool, numpy.ndarray float64).  The rows in which the column has a (non empty) value, and
+                   the values as floats with 0 where unset or not a number.  Absent columns are never set.
+        """
+        if var not in self.__values:
+            attr = self.__columns.get(var)
+            if attr is None:
+                isset = np.zeros(self.__nref, dtype=bool)
+                fvals = np.zeros(self.__nref, dtype=np.float64)
+            else:
+                floats = self.__table.get_float_column(attr)
+                numeric = self.__table.get_numeric_mask(attr)
+                # Numbers are never empty - only check the rest (and NaN, which may be None)
+                isset = numeric.copy()
+                rows = np.flatnonzero(~numeric | np.isnan(floats))
+                if rows.size:
+                    raw = self.__table.get_raw_column(attr)
+                    isset[rows] = [bool(raw[idx]) for idx in rows]
+                fvals = np.where(numeric & isset, floats, 0.0)
+            self.__values[var] = (isset, fvals)
+        return self.__values[var]
+
+    def __first_set(self, variables):
         """
-        Initializes the Io attribute at a given index.
+        Selects per row the value of the first variable that is set.
 
         Args:
-            i (int): The index of the Io attribute to initialize.
+            variables (list): The variables in order of preference.
+
+        Returns:
+            tuple: (numpy.ndarray bool, numpy.ndarray float64) rows with a value and the values (0.0 if none is set).
         """
-        self.__Io = self.__get_first_refln_value(["intensity_meas", "intensity_meas_au", "intensity"], i)
+        conds = [self.__get_values(var)[0] for var in variables]
+        vals = np.select(conds, [self.__get_values(var)[1] for var in variables], 0.0)
+        return np.logical_or.reduce(conds), vals
 
-    def __initialize_sIo_at_index(self, i):
+    def __merge_pair(self, plus, splus, minus, sminus):
         """
-        Initializes the sIo attribute at a given index.
+        Merges Friedel pairs into a single value and sigma.
 
         Args:
-            i (int): The index of the sIo attribute to initialize.
-        """
-        self.__sIo = self.__get_first_refln_value(["intensity_sigma", "intensity_sigma_au", "intensity_sigm", "intensity_meas_sigma", "intensity_meas_sigma_au"], i)
+            plus (str): Variable of the plus value.
+            splus (str): Variable of the plus sigma.
+            minus (str): Variable of the minus value.
+            sminus (str): Variable of the minus sigma.
 
-    def __initialize_status_at_index(self, i):
+        Returns:
+            tuple: (numpy.ndarray, numpy.ndarray) value and sigma.  A single positive value is used as is, otherwise the average.
         """
-        Initializes the status attribute at a given index.
-
-        Args:
-            i (int): The index of the status attribute to initialize.
+        f1 = self.__get_values(plus)[1]
+        sf1 = self.__get_values(splus)[1]
+        f2 = self.__get_values(minus)[1]
+        sf2 = self.__get_values(sminus)[1]
+
+        use_plus = (f1 > 0) & (f2 < 0.0001)
+        use_minus = ~use_plus & (f2 > 0) & (f1 < 0.0001)
+        val = np.select([use_plus, use_minus], [f1, f2], 0.5 * (f1 + f2))
+        sig = np.select([use_plus, use_minus], [sf1, sf2], 0.5 * (sf1 + sf2))
+        return val, sig
+
+    @staticmethod
+    def __sqrt(values):
+        """Square root as i**0.5 in Python - libm pow() is not always rounded as sqrt() is"""
+        return np.array([v**0.5 for v in values.tolist()], dtype=np.float64)
+
+    def __compute_f_i(self):
         """
-        self.__status = self.__get_first_refln_value(["status", "R_free_flag", "statu", "status_au"], i)
+        Derives F, sigma(F), I and sigma(I) for all reflections.
 
-    def __get_first_refln_value(self, attrList, row):
+        Returns:
+            tuple: (f, sigf, i, sigi) numpy.ndarray float64.
         """
-        Gets the first value from a list of attributes in the reflection data.
-
-        Args:
-            attrList (list): The list of attributes to check.
-            row (int): The row index to check.
+        if self.__f_i is not None:
+            return self.__f_i
+
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            has_fo_au = self.__get_values("Fo_au")[0]
+            has_io = self.__get_values("Io")[0]
+            has_f_plus = self.__get_values("F_plus")[0]
+            has_i_plus = self.__get_values("I_plus")[0]
+
+            # sigma
+            si = self.__get_values("sIo")[1].copy()
+            ssf = self.__first_set(["sFo_au", "sFo"])[1]
+
+            # for F
+            f = self.__first_set(["Fo_au", "Fo", "Fc_au", "Fc"])[1]
+            si = np.where(has_io, si, 2 * f * ssf)
+
+            # for I
+            i = self.__first_set(["Io", "F2o", "Ic", "F2c"])[1]
+
+            rows = ~has_fo_au
+            f = np.where(rows, 0.0, f)
+            ssf = np.where(rows, 0.0, ssf)
+            rows &= i > 0.0
+            f[rows] = self.__sqrt(i[rows])
+            ssf[rows] = si[rows] / (2.0 * f[rows])
+
+            # F_plus exist
+            anom = ~(has_fo_au | has_io)
+            rows = has_f_plus & anom
+            fval, fsig = self.__merge_pair("F_plus", "sF_plus", "F_minus", "sF_minus")
+            f = np.where(rows, fval, f)
+            ssf = np.where(rows, fsig, ssf)
+            rows &= ~has_i_plus
+            i = np.where(rows, f * f, i)
+            si = np.where(rows, 2.0 * f * ssf, si)
+
+            # I_plus exist
+            rows = has_i_plus & anom
+            ival, isig = self.__merge_pair("I_plus", "sI_plus", "I_minus", "sI_minus")
+            i = np.where(rows, ival, i)
+            si = np.where(rows, isig, si)
+            rows &= ~has_f_plus & (i >= 0)
+            f[rows] = self.__sqrt(i[rows])
+            ssf[rows] = np.where(f[rows] > 0.0001, si[rows] / (2 * f[rows]), 0.0)
+
+        self.__f_i = (f, ssf, i, si)
+        return self.__f_i
+
+    def __get_indices(self):
+        """
+        Converts the Miller indices to Python integers.
 
         Returns:
-            The first value found in the attribute list, or None if no value is found.
+            tuple: ([h, k, l] numpy.ndarray of int, number of leading reflections with integral indices, ValueError for the first
+                   reflection that is not or None)
         """
-        attL = self.__refln_data.getAttributeList()
-
-        ret = None
-        for att in attrList:
-            if att in attL:
-                ret = self.__refln_data.getValue(att, row)
-                break
-
-        return ret
+        indices = []
+        nvalid = self.__nref
+        error = None
+        for var in ["H", "K", "L"]:
+            raw = self.__table.get_raw_column(self.__columns.get(var, ""))
+            try:
+                vals = list(map(int, raw))
+            except ValueError:
+                vals = None
+            if vals is None:
+                vals = []
+                for row, value in enumerate(raw):
+                    try:
+                        vals.append(int(value))
+                    except ValueError as exc:
+                        if row < nvalid:
+                            nvalid = row
+                            error = exc
+                        vals.append(0)
+            indices.append(np.array(vals, dtype=object))
+        return indices, nvalid, error
 
     def get_F_I(self, j):
         """
@@ -177,112 +266,9 @@ class ExportCns:
         Returns:
             tuple: A tuple containing the values of H, K, L, F, sigma(F), I, sigma(I).
         """
-        self.__initialize_columns_at_index(j)
-
-        # Parse values to integers
-        h = int(self.__H)
-        k = int(self.__K)
-        l = int(self.__L)  # noqa: E741
-
-        # Initialize variables
-        f, ssf, i, si, f1, sf1, f2, sf2 = 0, 0, 0, 0, 0, 0, 0, 0
-
-        # sigma
-        si = self.float_or_zero(self.__sIo) if self.__sIo else 0.0
-        ssf = self.float_or_zero(self.__sFo_au) if self.__sFo_au else self.float_or_zero(self.__sFo) if self.__sFo else 0.0
-
-        # for F
-        f = (
-            self.float_or_zero(self.__Fo_au)
-            if self.__Fo_au
-            else self.float_or_zero(self.__Fo) if self.__Fo else self.float_or_zero(self.__Fc_au) if self.__Fc_au else self.float_or_zero(self.__Fc) if self.__Fc else 0.0
-        )
-
-        if not self.__Io:
-            i = f * f
-            si = 2 * f * ssf
-
-        # for I
-        i = (
-            self.float_or_zero(self.__Io)
-            if self.__Io
-            else self.float_or_zero(self.__F2o) if self.__F2o else self.float_or_zero(self.__Ic) if self.__Ic else self.float_or_zero(self.__F2c) if self.__F2c else 0.0
-        )
-
-        if not self.__Fo_au:
-            if i > 0.0:
-                f = i**0.5
-                ssf = si / (2.0 * f)
-            else:
-                f = 0
-                ssf = 0
-
-        # F_plus exist
-        if self.__F_plus and not (self.__Fo_au or self.__Io):
-            f1 = self.float_or_zero(self.__F_plus)
-            sf1 = self.float_or_zero(self.__sF_plus)
-
-            f2 = self.float_or_zero(self.__F_minus)
-            sf2 = self.float_or_zero(self.__sF_minus)
-
-            if f1 > 0 and f2 < 0.0001:
-                f = f1
-                ssf = sf1
-            elif f2 > 0 and f1 < 0.0001:
-                f = f2
-                ssf = sf2
-            else:
-                f = 0.5 * (f1 + f2)
-                ssf = 0.5 * (sf1 + sf2)
-
-            if not self.__I_plus:
-                i = f * f
-                si = 2.0 * f * ssf
-
-        # I_plus exist
-        if self.__I_plus and not (self.__Fo_au or self.__Io):
-            f1 = self.float_or_zero(self.__I_plus)
-            sf1 = self.float_or_zero(self.__sI_plus)
-
-            f2 = self.float_or_zero(self.__I_minus)
-            sf2 = self.float_or_zero(self.__sI_minus)
-
-            if f1 > 0 and f2 < 0.0001:
-                i = f1
-                si = sf1
-            elif f2 > 0 and f1 < 0.0001:
-                i = f2
-                si = sf2
-            else:
-                i = 0.5 * (f1 + f2)
-                si = 0.5 * (sf1 + sf2)
-
-            if not self.__F_plus:
-                if i >= 0:
-                    f = i**0.5
-                    ssf = si / (2 * f) if f > 0.0001 else 0
-
-        ff = f
-        ii = i
-        sii = si
-        sff = ssf
-        return h, k, l, ff, sff, ii, sii
-
-    def float_or_zero(self, value):
-        """
-        Converts a value to float or returns 0 if it cannot be converted.
-
-        Args:
-            value (str): The value to convert.
-
-        Returns:
-            float: The converted value or 0 if it cannot be converted.
-        """
-        try:
-            float(value)
-            return float(value)
-        except ValueError:
-            return 0
+        h, k, l = [int(self.__table.get_raw_column(self.__columns.get(var, ""))[j]) for var in ["H", "K", "L"]]  # noqa: E741
+        f, ssf, i, si = self.__compute_f_i()
+        return h, k, l, float(f[j]), float(ssf[j]), float(i[j]), float(si[j])
 
     def write_cns_file(self, pathOut):
         """
@@ -295,69 +281,73 @@ class ExportCns:
             output_file.write("DECLare NAME=SIGMA           DOMAin=RECIprocal   TYPE=REAL END\n")
             output_file.write("DECLare NAME=TEST            DOMAin=RECIprocal   TYPE=INTE END\n")
 
+            # The record of one reflection and its columns
+            record = "INDE  {} {} {} FOBS= {:.2f} SIGMA= {:.2f} TEST= {}\n"
+            columns = ["H", "K", "L", "f", "ssf", "flag"]
+
             # Assuming that all the variables here are boolean values
             if self.__attr_existence["Io"] or self.__attr_existence["F2o"]:
                 output_file.write("DECLare NAME=IOBS            DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=SIGI            DOMAin=RECIprocal   TYPE=REAL END\n")
+                record += "IOBS= {:.2f} SIGI= {:.2f}\n"
+                columns.extend(["i", "si"])
 
             if self.__attr_existence["F_plus"] and self.__attr_existence["F_minus"]:
                 output_file.write("DECLare NAME=F+           DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=SIGF+        DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=F-           DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=SIGF-        DOMAin=RECIprocal   TYPE=REAL END\n")
+                record += "F+= {:.2f} SIGF+= {:.2f}\nF-= {:.2f} SIGF-= {:.2f}\n"
+                columns.extend(["F_plus", "sF_plus", "F_minus", "sF_minus"])
 
             elif self.__attr_existence["I_plus"] and self.__attr_existence["I_minus"]:
                 output_file.write("DECLare NAME=I+           DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=SIGI+        DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=I-           DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=SIGI-        DOMAin=RECIprocal   TYPE=REAL END\n")
+                record += "I+= {:.2f} SIGI+= {:.2f}\nI-= {:.2f} SIGI-= {:.2f}\n"
+                columns.extend(["I_plus", "sI_plus", "I_minus", "sI_minus"])
 
             if self.__attr_existence["fom"]:
                 output_file.write("DECLare NAME=FOM   DOMAin=RECIprocal   TYPE=REAL END\n")
+                record += "FOM= {:.2f}\n"
+                columns.append("fom")
 
             if self.__attr_existence["hla"]:
                 output_file.write("DECLare NAME=HLA   DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=HLB   DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=HLC   DOMAin=RECIprocal   TYPE=REAL END\n")
                 output_file.write("DECLare NAME=HLD   DOMAin=RECIprocal   TYPE=REAL END\n")
-
-            # Loop over all the data points
-            for i in range(self.__nref):
-
-                self.__initialize_columns_at_index(i)
-
-                h, k, l, ff, sff, ii, sii = self.get_F_I(i)
-
-                if self.__attr_existence["status"] and self.__status == "x":
-                    continue
-
-                if self.__status:
-                    flag = 1 if (self.__status == "f" or self.__status == "1") else 0
-                else:
-                    flag = 0
-
-                output_file.write("INDE  {} {} {} FOBS= {:.2f} SIGMA= {:.2f} TEST= {}\n".format(h, k, l, ff, sff, flag))
-
-                if self.__attr_existence["Io"] or self.__attr_existence["F2o"]:
-                    output_file.write("IOBS= {:.2f} SIGI= {:.2f}\n".format(ii, sii))
-
-                if self.__attr_existence["F_plus"] and self.__attr_existence["F_minus"]:
-                    output_file.write("F+= {:.2f} SIGF+= {:.2f}\n".format(self.float_or_zero(self.__F_plus), self.float_or_zero(self.__sF_plus)))
-                    output_file.write("F-= {:.2f} SIGF-= {:.2f}\n".format(self.float_or_zero(self.__F_minus), self.float_or_zero(self.__sF_minus)))
-
-                elif self.__attr_existence["I_plus"] and self.__attr_existence["I_minus"]:
-                    output_file.write("I+= {:.2f} SIGI+= {:.2f}\n".format(self.float_or_zero(self.__I_plus), self.float_or_zero(self.__sI_plus)))
-                    output_file.write("I-= {:.2f} SIGI-= {:.2f}\n".format(self.float_or_zero(self.__I_minus), self.float_or_zero(self.__sI_minus)))
-
-                if self.__attr_existence["fom"]:
-                    output_file.write("FOM= {:.2f}\n".format(self.float_or_zero(self.__fom)))
-
-                if self.__attr_existence["hla"]:
-                    output_file.write(
-                        "HLA= {:.2f} HLB= {:.2f} HLC= {:.2f} HLD= {:.2f}\n".format(
-                            self.float_or_zero(self.__hla), self.float_or_zero(self.__hlb), self.float_or_zero(self.__hlc), self.float_or_zero(self.__hld)
-                        )
-                    )
+                record += "HLA= {:.2f} HLB= {:.2f} HLC= {:.2f} HLD= {:.2f}\n"
+                columns.extend(["hla", "hlb", "hlc", "hld"])
+
+            # Convert whole columns
+            (h, k, l), nvalid, error = self.__get_indices()  # noqa: E741
+            f, ssf, i, si = self.__compute_f_i()
+            flag = np.zeros(self.__nref, dtype=np.int64)
+            keep = np.zeros(self.__nref, dtype=bool)
+            keep[:nvalid] = True
+            if self.__attr_existence["status"]:
+                # Reflections flagged as excluded are not written
+                status = self.__columns["status"]
+                flag[self.__table.get_code_mask(status, lambda v: v in ("f", "1"))] = 1
+                keep &= ~self.__table.get_value_mask(status, "x")
+            data = {"H": h, "K": k, "L": l, "f": f, "ssf": ssf, "i": i, "si": si, "flag": flag}
+            columns = [data[name] if name in data else self.__get_values(name)[1] for name in columns]
+
+            # Output stops at the first reflection with bad indices
+            if not keep.all():
+                columns = [col[keep] for col in columns]
+
+            # Format in batches - tolist() gives Python int/float which format as the scalar writer did
+            fmt = record.format
+            nkeep = len(columns[0])
+            for start in range(0, nkeep, WRITE_BATCH_SIZE):
+                batch = [col[start : start + WRITE_BATCH_SIZE].tolist() for col in columns]
+                output_file.write("".join(map(fmt, *batch)))
+
+            if error is not None:
+                raise error
 
     def write_file(self, path_out):
         """
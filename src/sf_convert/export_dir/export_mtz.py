@@ -1,8 +1,4 @@
 # pylint: disable=E1101
-import tempfile
-import os
-
-from sf_convert.sffile.sf_file import StructureFactorFile
 import gemmi
 
 
@@ -55,28 +51,83 @@ class ExportMtz:
 
     def __load_cif(self):
         """
-        Loads the CIF file and returns the column labels.
+        Loads the first data block as a gemmi reflection block and returns the column labels.
+
+        The categories are handed to gemmi in memory, a column at a time, instead of writing the block
+        to a temporary file and parsing it back.  Single row categories become pairs and empty categories
+        are left out, as when the block is written out.
 
         Returns:
             list: The column labels of the CIF file.
         """
-
-        # write out a temporary file with first block
         blk = self.__sf_file.get_block_by_index(0)
-        sftemp = StructureFactorFile()
-        sftemp.add_block(blk)
-        with tempfile.NamedTemporaryFile(prefix="sf_convert", delete=False) as tf:
-            temp_file = tf.name
+        cif_doc = gemmi.cif.Document()  # pylint: disable=no-member
+        gblock = cif_doc.add_new_block(blk.getName())
+
+        for catname in blk.getObjNameList():
+            cObj = blk.getObj(catname)
+            nrows = cObj.getRowCount()
+            if nrows == 0:
+                continue
+            attrs = cObj.getAttributeList()
+            columns = [self.__quote_column(cObj.getColumn(idx)) for idx in range(len(attrs))]
+            if nrows == 1:
+                for attr, column in zip(attrs, columns):
+                    gblock.set_pair(f"_{catname}.{attr}", column[0])
+            else:
+                loop = gblock.init_loop(f"_{catname}.", attrs)
+                loop.set_all_values(columns)
 
-        sftemp.write_file(temp_file)
-
-        cif_doc = gemmi.cif.read(temp_file)  # pylint: disable=no-member
         self.__rblock = gemmi.as_refln_blocks(cif_doc)[0]  # pylint: disable=unsubscriptable-object
 
-        os.remove(temp_file)
-
         return self.__rblock.column_labels()
 
+    @staticmethod
+    def __quote_column(values):
+        """
+        Returns the values of a column as CIF tokens, quoted as the mmCIF writer would.
+
+        Args:
+            values (list): The column values.
+
+        Returns:
+            list: The CIF tokens.
+        """
+        try:
+            joined = "".join(values)
+        except TypeError:
+            # Values set programmatically - written as when saving the file
+            values = ["?" if v is None else str(v) for v in values]
+            joined = "".join(values)
+
+        # Numbers and flags need no quoting
+        if all(values) and not any(ch in joined for ch in "\"'()[]{} \t\r\n#$;_"):
+            return values
+        return [ExportMtz.__quote_value(v) for v in values]
+
+    @staticmethod
+    def __quote_value(value):
+        """
+        Quotes a single value where the mmCIF writer would.  Quoted numbers are not numbers to gemmi.
+
+        Args:
+            value (str): The value.
+
+        Returns:
+            str: The CIF token.
+        """
+        if not value:
+            return "?"
+        if "\n" in value:
+            return ";" + value + "\n;"
+        if any(ch in value for ch in "\"'()[]{} \t\r") or value[0] in "#$;_" or value.lower().startswith(("data_", "loop_", "save_", "stop_", "global_")):
+            if "'" not in value:
+                return "'" + value + "'"
+            if '"' not in value:
+                return '"' + value + '"'
+            return ";" + value + "\n;"
+        return value
+
     def __determine_mappings(self):
         """
         Determines the mappings between column labels and MTZ specifications.
@@ -1,10 +1,14 @@
+import itertools
 import os
 
-from collections import defaultdict
+import numpy as np
 from mmcif.api.DataCategory import DataCategory
 from mmcif.api.PdbxContainers import DataContainer
 from sf_convert.sffile.sf_file import StructureFactorFile as SFFile
 
+# Header statements that may also appear between records - never a continuation of a record
+HEADER_KEYWORDS = ("NREF", "ANOM", "DECL", "GROU", "OBJE", "END")
+
 
 class ImportCns:
 
@@ -48,6 +52,351 @@ class ImportCns:
         self.__free = free
 
 
+class CnsReflectionReader:
+    """
+    Streaming reader of the reflections of a CNS/XPLOR file.
+
+    A record starts with INDE h k l followed by NAME= value pairs, which may continue on the following
+    lines.  The file is read in blocks of lines.  A block of one line records with the same names is
+    tokenized with a single split and sliced into columns; other blocks are read record by record.
+    Values are gathered a chunk at a time into typed arrays.
+
+    Args:
+        free_value (int, optional): The TEST/FREE value of the free set. Defaults to 1.
+        chunk_size (int, optional): The number of records gathered before conversion to arrays.
+    """
+
+    def __init__(self, free_value=1, chunk_size=100000):
+        self.__free_value = free_value
+        self.__chunk_size = chunk_size
+        self.__nref = 0
+        self.__hkl = []  # Chunks of (n, 3) indices
+        self.__status = []  # Chunks of status codes, 0 = missing, 1 = o, 2 = f
+        self.__have_status = False
+        self.__columns = {}  # name -> [chunks of float values, chunks of present masks, {row: non numeric value}]
+        self.__record = None  # Tokens of the record being read
+        # The chunk being read
+        self.__chunk_rows = 0
+        self.__chunk_hkl = []  # Segments of (n, 3) indices
+        self.__record_hkl = []  # Indices of records read one by one, not yet in a segment
+        self.__chunk_parts = {}  # name -> [(rows, values)]
+        self.__chunk_groups = {}  # names of records read one by one -> ([rows], [values])
+        self.__last_names = None
+        self.__last_group = None
+
+    def read_file(self, file_path):
+        """
+        Reads the reflections of a file.
+
+        Args:
+            file_path (str): The path to the CNS file.
+        """
+        with open(file_path, "r") as fin:
+            while True:
+                lines = list(itertools.islice(fin, self.__chunk_size))
+                if not lines:
+                    break
+                self.__read_lines(lines)
+        if self.__record:
+            self.__add_record(self.__record)
+            self.__record = None
+        self.__flush()
+
+    def __read_lines(self, lines):
+        """
+        Reads a block of lines.
+
+        Args:
+            lines (list): The lines.
+        """
+        # Header lines, and continuation of the last record, precede the first record
+        start = 0
+        while start < len(lines):
+            words = lines[start].split()
+            if words and words[0] == "INDE":
+                break
+            self.__read_words(words)
+            start += 1
+
+        if start < len(lines) and not self.__read_uniform(lines[start:]):
+            for line in lines[start:]:
+                self.__read_words(line.split())
+
+    def __read_words(self, words):
+        """
+        Reads the tokens of a line.
+
+        Args:
+            words (list): The tokens.
+        """
+        if not words:
+            return
+        if words[0][:4].upper() == "INDE":
+            if self.__record:
+                self.__add_record(self.__record)
+            self.__record = words
+        elif self.__record and self.__is_continuation(words):
+            # Continuation of the record
+            self.__record.extend(words)
+
+    @staticmethod
+    def __is_continuation(words):
+        """
+        Checks that a line continues a record - it starts with NAME= (or NAME=value), not a header statement or comment.
+        A complex value is two numbers following its name.
+
+        Args:
+            words (list): The tokens of the line.
+
+        Returns:
+            bool: True if the line continues the record.
+        """
+        name, equals, _ = words[0].partition("=")
+        return bool(equals) and bool(name) and not name.startswith("{") and name[:4].upper() not in HEADER_KEYWORDS
+
+    def __read_uniform(self, lines):
+        """
+        Reads a block of one line records, all with the same names.
+
+        Args:
+            lines (list): The lines, the first starting with INDE.
+
+        Returns:
+            bool: False if the block is not uniform - nothing is read.
+        """
+        nrec = len(lines)
+        tokens = "".join(lines).split()
+        width = len(tokens) // nrec
+        if nrec < 2 or width < 4 or width % 2 or width * nrec != len(tokens):
+            return False
+        if tokens.count("INDE") != nrec or tokens[::width].count("INDE") != nrec:
+            return False
+        for col in range(4, width, 2):
+            if not tokens[col].endswith("=") or tokens[col::width].count(tokens[col]) != nrec:
+                return False
+        try:
+            hkl = np.array([tokens[1::width], tokens[2::width], tokens[3::width]], dtype=object).astype(np.int64).T
+        except (ValueError, OverflowError):
+            return False
+        if np.abs(hkl).max() > np.iinfo(np.int32).max:
+            return False
+
+        # The last record may continue in the next block
+        if self.__record:
+            self.__add_record(self.__record)
+        self.__record = tokens[(nrec - 1) * width :]
+        nrec -= 1
+
+        self.__start_segment()
+        rows = np.arange(self.__chunk_rows, self.__chunk_rows + nrec)
+        self.__chunk_hkl.append(hkl[:nrec].astype(np.int32))
+        for col in range(4, width, 2):
+            values = tokens[col + 1 :: width][:nrec]
+            self.__chunk_parts.setdefault(tokens[col][:-1], []).append((rows, values))
+        self.__chunk_rows += nrec
+        if self.__chunk_rows >= self.__chunk_size:
+            self.__flush()
+        return True
+
+    def __add_record(self, words):
+        """
+        Adds a reflection record.
+
+        Args:
+            words (list): The tokens of the record, starting with INDE h k l.
+        """
+        if len(words) < 4:
+            return
+        try:
+            hkl = (int(words[1]), int(words[2]), int(words[3]))
+        except ValueError:
+            return
+
+        # Usual layout is NAME= value NAME= value ...
+        names = words[4::2]
+        values = words[5::2]
+        if names != self.__last_names:
+            if len(names) != len(values) or not all(name.endswith("=") for name in names):
+                names, values = self.__split_pairs(words[4:])
+            self.__last_names = names
+            self.__last_group = self.__chunk_groups.setdefault(tuple(names), ([], []))
+
+        rows, group_values = self.__last_group
+        rows.append(self.__chunk_rows)
+        group_values.append(values)
+        self.__record_hkl.append(hkl)
+        self.__chunk_rows += 1
+        if self.__chunk_rows >= self.__chunk_size:
+            self.__flush()
+
+    @staticmethod
+    def __split_pairs(words):
+        """
+        Splits tokens into names and values.  Names end with "=", or are given as NAME=value.
+
+        Args:
+            words (list): The tokens following h k l.
+
+        Returns:
+            tuple: The list of names (with "=") and the list of values.
+        """
+        names = []
+        values = []
+        key = None
+        for word in words:
+            if key is None:
+                if word.endswith("="):
+                    key = word
+                    continue
+                if "=" not in word:
+                    continue
+                key, word = word.split("=", 1)
+                key += "="
+            names.append(key)
+            values.append(word)
+            key = None
+        return names, values
+
+    def __start_segment(self):
+        """Moves the records read one by one into the chunk, to keep the order of rows"""
+        if self.__record_hkl:
+            try:
+                self.__chunk_hkl.append(np.array(self.__record_hkl, dtype=np.int32).reshape(-1, 3))
+            except OverflowError:
+                self.__chunk_hkl.append(np.array(self.__record_hkl, dtype=object).reshape(-1, 3))
+            self.__record_hkl = []
+
+        for names, (rows, values) in self.__chunk_groups.items():
+            rows = np.array(rows, dtype=np.intp)
+            for name, tokens in zip(names, zip(*values)):
+                self.__chunk_parts.setdefault(name[:-1], []).append((rows, tokens))
+        self.__chunk_groups = {}
+        self.__last_names = None
+        self.__last_group = None
+
+    def __flush(self):
+        """Converts the chunk being read to arrays"""
+        self.__start_segment()
+        nrows = self.__chunk_rows
+        if nrows == 0:
+            return
+
+        self.__hkl.append(np.concatenate(self.__chunk_hkl))
+
+        # TEST takes precedence over FREE
+        status = np.zeros(nrows, dtype=np.uint8)
+        for name in ("FREE", "TEST"):
+            for rows, tokens in self.__chunk_parts.pop(name, []):
+                self.__have_status = True
+                status[rows] = self.__status_codes(tokens)
+        self.__status.append(status)
+
+        for name, parts in self.__chunk_parts.items():
+            if name not in self.__columns:
+                # Column first seen in this chunk - earlier rows are missing
+                self.__columns[name] = [[np.zeros(self.__nref, dtype=np.float64)], [np.zeros(self.__nref, dtype=bool)], {}]
+            values = np.zeros(nrows, dtype=np.float64)
+            present = np.zeros(nrows, dtype=bool)
+            for rows, tokens in parts:
+                try:
+                    values[rows] = np.array(tokens, dtype=object).astype(np.float64)
+                except ValueError:
+                    text = self.__columns[name][2]
+                    for row, token in zip(rows.tolist(), tokens):
+                        try:
+                            values[row] = float(token)
+                        except ValueError:
+                            text[self.__nref + row] = token
+                present[rows] = True
+            self.__columns[name][0].append(values)
+            self.__columns[name][1].append(present)
+
+        for name, column in self.__columns.items():
+            if name not in self.__chunk_parts:
+                column[0].append(np.zeros(nrows, dtype=np.float64))
+                column[1].append(np.zeros(nrows, dtype=bool))
+
+        self.__nref += nrows
+        self.__chunk_rows = 0
+        self.__chunk_hkl = []
+        self.__chunk_parts = {}
+
+    def __status_codes(self, tokens):
+        """
+        Returns the status codes of TEST/FREE flags.
+
+        Args:
+            tokens (list): The flags.
+
+        Returns:
+            numpy.ndarray: 2 for the free set, 1 for other integers and 0 otherwise.
+        """
+        try:
+            flags = np.array(tokens, dtype=object).astype(np.int64)
+            return np.where(flags == self.__free_value, 2, 1).astype(np.uint8)
+        except (ValueError, OverflowError):
+            codes = np.zeros(len(tokens), dtype=np.uint8)
+            for idx, token in enumerate(tokens):
+                try:
+                    codes[idx] = 2 if int(token) == self.__free_value else 1
+                except ValueError:
+                    pass
+            return codes
+
+    def get_number_of_reflections(self):
+        """Returns the number of reflections read"""
+        return self.__nref
+
+    def get_indices(self):
+        """
+        Returns the Miller indices.
+
+        Returns:
+            numpy.ndarray: The (n, 3) indices.
+        """
+        if not self.__hkl:
+            return np.zeros((0, 3), dtype=np.int32)
+        return np.concatenate(self.__hkl)
+
+    def get_column_names(self):
+        """Returns the names of the columns, in order of first appearance.  TEST/FREE are returned as status."""
+        return list(self.__columns.keys())
+
+    def has_status(self):
+        """Returns True if TEST or FREE flags were read"""
+        return self.__have_status
+
+    def get_status(self):
+        """
+        Returns the status of the reflections.
+
+        Returns:
+            list: "o", "f" or "?" where the flag is missing or not an integer.
+        """
+        codes = np.concatenate(self.__status) if self.__status else np.zeros(0, dtype=np.uint8)
+        return np.array(["?", "o", "f"], dtype=object)[codes].tolist()
+
+    def get_column(self, name):
+        """
+        Returns the values of a column.
+
+        Args:
+            name (str): The name of the column.
+
+        Returns:
+            list: Floats, the text of non numeric values, or "?" where the value is missing.
+        """
+        chunks, present, text = self.__columns[name]
+        values = np.concatenate(chunks).tolist()
+        present = np.concatenate(present)
+        if not present.all():
+            for row in np.flatnonzero(~present).tolist():
+                values[row] = "?"
+        for row, token in text.items():
+            values[row] = token
+        return values
+
+
 class CNSToCifConverter:
     """
     A class for converting CNS files to CIF format.
@@ -67,10 +416,8 @@ class CNSToCifConverter:
             self.__FREERV = FREERV
         self.__pdb_id = pdb_id
         self.__file_path = file_path
-        self.__h_values = []
-        self.__k_values = []
-        self.__l_values = []
-        self.__values = defaultdict(list)
+        self.__reader = None
+        self.__values = {}
         self.__curContainer = DataContainer(self.__pdb_id)
         self.__pinfo_value = 0
         self.__logger = logger
@@ -85,59 +432,6 @@ class CNSToCifConverter:
         self.__sffile.add_block(self.__curContainer)
         self.__sffile.correct_block_names(self.__pdb_id)
 
-    def __process_line(self, line):
-        """
-        Process a line from the CNS file.
-
-        Args:
-            line (str): The line to process.
-        """
-        words = line.split()
-        if len(words) < 4:
-            return
-        try:
-            h = int(words[1])
-            k = int(words[2])
-            l = int(words[3])  # noqa: E741
-        except ValueError:
-            return
-        self.__h_values.append(h)
-        self.__k_values.append(k)
-        self.__l_values.append(l)
-        current_key = None
-        for word in words[4:]:
-            if current_key is None and word.endswith("="):
-                current_key = word[:-1]
-            elif current_key is not None:
-                try:
-                    self.__values[current_key].append(float(word))
-                except ValueError:
-                    self.__values[current_key].append(word)
-                current_key = None
-
-    def __process_status_line(self, line):
-        """
-        Process a status line from the CNS file.
-
-        Args:
-            line (str): The status line to process.
-        """
-        if "INDE" in line:
-            ffg = 0
-            if "TEST" in line or "FREE" in line:
-                if "TEST=" in line:
-                    ffg = int(line.split("TEST=")[1].split()[0])
-                elif "TEST" in line:
-                    ffg = int(line.split("TEST")[1].split()[0])
-                elif "FREE=" in line:
-                    ffg = int(line.split("FREE=")[1].split()[0])
-                elif "FREE " in line:
-                    ffg = int(line.split("FREE ")[1].split()[0])
-                if self.__FREERV:
-                    self.__values["status"].append("f" if ffg == int(self.__FREERV) else "o")
-                else:
-                    self.__values["status"].append("f" if ffg == 1 else "o")
-
     def __rename_keys_complete(self):
         """
         Rename the keys in the values dictionary.
@@ -164,20 +458,20 @@ class CNSToCifConverter:
             "HLC": "pdbx_HLC",
             "HLD": "pdbx_HLD",
         }
-        new_values = defaultdict(list)
-        for key in self.__values:
+        new_values = {}
+        for key in self.__reader.get_column_names():
             new_key = rename_dict.get(key, key)
-            new_values[new_key] = self.__values[key]
+            new_values[new_key] = self.__reader.get_column(key)
+        if self.__reader.has_status():
+            new_values["status"] = self.__reader.get_status()
         return new_values
 
     def process_file(self):
         """
         Process the CNS file.
         """
-        with open(self.__file_path, "r") as file:
-            for line in file:
-                self.__process_line(line)
-                self.__process_status_line(line)
+        self.__reader = CnsReflectionReader(self.__FREERV if self.__FREERV else 1)
+        self.__reader.read_file(self.__file_path)
 
     def rename_keys(self):
         """
@@ -221,14 +515,6 @@ class CNSToCifConverter:
         eCat.append(["1"])
         self.__curContainer.append(eCat)
 
-        fCat = DataCategory("refln")
-        fCat.appendAttribute("crystal_id")
-        fCat.appendAttribute("wavelength_id")
-        fCat.appendAttribute("scale_group_code")
-        fCat.appendAttribute("index_h")
-        fCat.appendAttribute("index_k")
-        fCat.appendAttribute("index_l")
-
         # Preference order.... status F_meas_au F_meas_sigma_au, pdbx_HL_A, ....
         pref = [
             "status",
@@ -258,13 +544,11 @@ class CNSToCifConverter:
         for key in cur_key.keys():
             ordered_keys.append(key)
 
-        for key in ordered_keys:
-            fCat.appendAttribute(key)
-        for i in range(len(self.__h_values)):
-            values_to_append = (1, 1, 1, self.__h_values[i], self.__k_values[i], self.__l_values[i])
-            for key in ordered_keys:
-                values_to_append += (self.__values[key][i],)
-            fCat.append(values_to_append)
+        attributes = ["crystal_id", "wavelength_id", "scale_group_code", "index_h", "index_k", "index_l"] + ordered_keys
+        ones = [1] * self.__reader.get_number_of_reflections()
+        hkl = self.__reader.get_indices().T.tolist()
+        rows = list(zip(ones, ones, ones, *hkl, *[self.__values[key] for key in ordered_keys]))
+        fCat = DataCategory("refln", attributes, rows, copyInputData=False)
         self.__curContainer.append(fCat)
 
     def get_sf(self):
@@ -2,8 +2,9 @@
 import gemmi
 import os
 from mmcif.api.DataCategory import DataCategory
-import tempfile
+from mmcif.api.PdbxContainers import DataContainer
 from sf_convert.sffile.sf_file import StructureFactorFile as SFFile
+from sf_convert.utils.MtzUtils import read_mtz_file
 
 
 class ImportMtz:
@@ -236,17 +237,63 @@ class MtzToCifConverter:
         Returns:
             str: The CIF document.
         """
-        mtz = gemmi.read_mtz_file(self.mtz_file_path)
+        mtz = read_mtz_file(self.mtz_file_path)
         return self.mtz2cif.write_cif_to_string(mtz)
 
-    def __read_cif_file(self, cif_file):
+    def __read_cif_string(self, cif_doc):
         """
-        Reads the CIF file.
+        Reads the CIF document produced by gemmi straight into data blocks.
+
+        The text is tokenized once in memory by gemmi - there is no temporary file and no second parse by the mmCIF reader.
+        Categories, attributes and values are the same as reading the document from a file.
+
+        Args:
+            cif_doc (str): The CIF document.
+        """
+        doc = gemmi.cif.read_string(cif_doc)
+        for gblock in doc:
+            container = DataContainer(gblock.name)
+            # Key-value categories are gathered in order of first appearance
+            pairs = {}
+            for item in gblock:
+                if item.pair is not None:
+                    tag, value = item.pair
+                    catname, attr = tag[1:].split(".", 1)
+                    if catname not in pairs:
+                        pairs[catname] = DataCategory(catname)
+                        pairs[catname].append([])
+                        container.append(pairs[catname])
+                    cObj = pairs[catname]
+                    cObj.appendAttribute(attr)
+                    cObj.data[0].append(self.__unquote(value))
+                elif item.loop is not None:
+                    loop = item.loop
+                    catname = loop.tags[0][1:].split(".", 1)[0]
+                    attrs = [tag[1:].split(".", 1)[1] for tag in loop.tags]
+                    values = loop.values
+                    # Numbers and status flags are never quoted - only unquote when needed
+                    joined = "".join(values)
+                    if "'" in joined or '"' in joined or ";" in joined:
+                        values = [self.__unquote(v) for v in values]
+                    width = loop.width()
+                    rows = [values[i : i + width] for i in range(0, len(values), width)]
+                    container.append(DataCategory(catname, attrs, rows, copyInputData=False))
+            self.sffile.add_block(container)
+
+    @staticmethod
+    def __unquote(value):
+        """
+        Strips CIF quoting from a raw value, leaving "?" and "." as is.
 
         Args:
-            cif_file (str): The path to the CIF file.
+            value (str): The raw value.
+
+        Returns:
+            str: The value.
         """
-        self.sffile.read_file(cif_file)
+        if value[:1] in ("'", '"', ";"):
+            return gemmi.cif.as_string(value)
+        return value
 
     def __add_category(self, categories):
         """
@@ -463,7 +510,7 @@ class MtzToCifConverter:
         Returns:
             list: The list of MTZ columns with custom entries.
         """
-        mtz = gemmi.read_mtz_file(mtz_file)
+        mtz = read_mtz_file(mtz_file)
         labels_list = [(column.type, column.label) for column in mtz.columns]
         results = self.__generate_full_labels_for_list(labels_list)
         filtered_results = [(type_, label, full_label) for label, type_, full_label in results if full_label != "Unknown Label"]
@@ -471,11 +518,8 @@ class MtzToCifConverter:
 
     def convert(self):
         """
-        Converts the MTZ file to CIF format and writes it to the output file.
+        Converts the MTZ file to CIF format and reads it into the structure factor file.
         """
-        with tempfile.NamedTemporaryFile(prefix="sf_convert", delete=False) as tf:
-            temp_file = tf.name
-
         # If -label option is given, the speci_file_content is set.
         if len(self.__spec_file_content) == 0:
             spec_lines_result = self.__get_mtz_columns_with_custom_entries(self.mtz_file_path)
@@ -483,10 +527,7 @@ class MtzToCifConverter:
 
         self.set_spec()
         cif_doc = self.convert_mtz_to_cif()
-        with open(temp_file, "w") as f:
-            f.write(cif_doc)
-        self.__read_cif_file(temp_file)
-        os.remove(temp_file)
+        self.__read_cif_string(cif_doc)
         self.__add_category(self.__categories)
 
         self.__fix_attributes()
@@ -1,130 +1,187 @@
-def guess_sf_format(inpfile: str) -> str:
-    """
-    Guesses the format of a structure factor file based on its content.
+import codecs
 
-    Args:
-        inpfile (str): The path to the input file.
+# Characters examined before deciding - if no format is found the rest of the file is read, a block at a time
+PREFIX_SIZE = 1 << 16
 
-    Returns:
-        str: The guessed format of the structure factor file, or None if the format is not recognized.
-    """
-    try:
-        with open(inpfile, "r", encoding="utf-8") as file:
-            lines = file.readlines()
-
-        # Check CIF
-        for line in lines:
-            if line.strip().startswith("_reflns."):
-                return "CIF"
-
-        # Check mmCIF
-        for line in lines:
-            if line.strip().startswith("_refln."):
-                return "mmCIF"
-
-        # Check CNS
-        n3 = m1 = m2 = mm1 = 0
-        for line in lines:
-            line = line.strip()
-            if line.startswith("INDE") or (line.startswith("DECLare") and "RECIproca" in line[20:]):
-                if "FOBS=" in line or "FO=" in line or " F_" in line or "F=" in line:
-                    m1 += 1
-                if "IOBS=" in line or "IO=" in line or "I=" in line:
-                    m2 += 1
-                if " FOBS " in line:
-                    mm1 += 1
-                n3 += 1
-                if n3 > 300:
-                    break
-            elif "FOBS=" in line or "FO=" in line or "F=" in line:
-                n3 += 1
-                m1 += 1
-                if m1 > 300:
-                    break
-            elif "IOBS=" in line or " IO=" in line or " I=" in line:
-                n3 += 1
-                m2 += 1
-                if m2 > 300:
-                    break
+# Formats in the order they are preferred when several match
+FORMATS = ["CIF", "mmCIF", "CNS", "TNT", "XSCALE", "DTREK", "SCALEPACK", "SHELX", "SAINT"]
 
-        if n3 >= 50 and mm1 < 10:
-            return "CNS"
+# Matching lines at which a format is certain - where the checks stop looking
+CERTAIN = {"CIF": 1, "mmCIF": 1, "CNS": 300, "TNT": 200, "XSCALE": 5, "DTREK": 6, "SCALEPACK": 3, "SHELX": 200, "SAINT": 200}
 
-        # Check TNT
-        n4 = 0
-        for line in lines:
-            if line.strip().startswith("HKL"):
-                n4 += 1
-                if n4 > 200:
-                    break
-        if n4 >= 100:
-            return "TNT"
-
-        # Check XSCALE
-        n5 = 0
-        for line in lines:
-            if line.strip().startswith(("!SPACE_GROUP_NUMBER=", "!UNIT_CELL_CONSTANTS=", "!ITEM_H=", "!ITEM_K=", "!ITEM_L=")):
-                n5 += 1
-                if n5 > 4:
-                    return "XSCALE"
-
-        # Check DTREK
-        n6 = 0
-        for line in lines:
-            line = line.strip()
-            if (
-                line.startswith("CRYSTAL_MOSAICITY=")
-                or line.startswith("CRYSTAL_SPACEGROUP=")
-                or line.startswith("CRYSTAL_UNIT_CELL=")
-                or line.startswith("nH")
-                or line.startswith("nK")
-                or line.startswith("nL")
-            ):
-                n6 += 1
-                if n6 > 5:
-                    return "DTREK"
+NOT_RECOGNIZED = "Format not recognized"
 
-        # Check SCALEPACK
-        n7 = 0
-        for i, line in enumerate(lines):
+XSCALE_TAGS = ("!SPACE_GROUP_NUMBER=", "!UNIT_CELL_CONSTANTS=", "!ITEM_H=", "!ITEM_K=", "!ITEM_L=")
+DTREK_TAGS = ("CRYSTAL_MOSAICITY=", "CRYSTAL_SPACEGROUP=", "CRYSTAL_UNIT_CELL=", "nH", "nK", "nL")
+
+
+class _FormatCounts:
+    """Counts the lines matching each format as the file is read"""
+
+    def __init__(self):
+        self.__counts = dict.fromkeys(FORMATS, 0)
+        # CNS counts
+        self.__m1 = self.__m2 = self.__mm1 = 0
+        self.__cns_done = False
+        self.__scalepack_done = False
+
+    def add_line(self, i, line):
+        """
+        Counts one line.
+
+        Args:
+            i (int): The line number, from 0.
+            line (str): The line, with its end of line.
+        """
+        counts = self.__counts
+        sline = line.strip()
+
+        if sline.startswith("_reflns."):
+            counts["CIF"] += 1
+        elif sline.startswith("_refln."):
+            counts["mmCIF"] += 1
+
+        if not self.__cns_done:
+            self.__add_cns(sline)
+
+        if sline.startswith("HKL") and counts["TNT"] <= 200:
+            counts["TNT"] += 1
+        if sline.startswith(XSCALE_TAGS):
+            counts["XSCALE"] += 1
+        if sline.startswith(DTREK_TAGS):
+            counts["DTREK"] += 1
+
+        if not self.__scalepack_done:
             strs = line.split()
-            if len(strs) == 0:
-                # Scalepack file has no empty lines
-                break
-            if (
+            # Scalepack file has no empty lines - and only the first three lines can match
+            self.__scalepack_done = len(strs) == 0 or i >= 2
+            if strs and (
                 (i == 0 and strs[0] == "1" and len(strs) == 1)
                 or (i == 1 and (strs[0] == "-985" or strs[0] == "-987") and len(strs) == 1)
                 or (i == 2 and "." in strs[0] and len(line) > 60)
                 and len(strs) == 6
             ):
-                n7 += 1
-                if n7 >= 3:
-                    return "SCALEPACK"
-
-        # Check SHELX
-        n8 = 0
-        for line in lines:
-            if len(line) > 50 and len(line.strip()) == 32:
-                n8 += 1
-            if n8 >= 200:
-                return "SHELX"
-
-        # Check SAINT
-        n9 = 0
-        for i, line in enumerate(lines):
-            if i > 50 and len(line.strip()) > 150:
-                n9 += 1
-                if n9 >= 200:
-                    return "SAINT"
-
-    except UnicodeDecodeError:
+                counts["SCALEPACK"] += 1
+
+        if len(line) > 50 and len(sline) == 32:
+            counts["SHELX"] += 1
+        if i > 50 and len(sline) > 150:
+            counts["SAINT"] += 1
+
+    def __add_cns(self, line):
+        """Counts CNS records - stops once there are enough"""
+        if line.startswith("INDE") or (line.startswith("DECLare") and "RECIproca" in line[20:]):
+            if "FOBS=" in line or "FO=" in line or " F_" in line or "F=" in line:
+                self.__m1 += 1
+            if "IOBS=" in line or "IO=" in line or "I=" in line:
+                self.__m2 += 1
+            if " FOBS " in line:
+                self.__mm1 += 1
+            self.__counts["CNS"] += 1
+            self.__cns_done = self.__counts["CNS"] > 300
+        elif "FOBS=" in line or "FO=" in line or "F=" in line:
+            self.__counts["CNS"] += 1
+            self.__m1 += 1
+            self.__cns_done = self.__m1 > 300
+        elif "IOBS=" in line or " IO=" in line or " I=" in line:
+            self.__counts["CNS"] += 1
+            self.__m2 += 1
+            self.__cns_done = self.__m2 > 300
+
+    def certain(self):
+        """Returns True if the preferred format is found, so that nothing later in the file can change the result"""
+        return self.__counts["CIF"] > 0
+
+    def best(self):
+        """
+        Returns the preferred format matched so far.
+
+        Returns:
+            tuple: (str, float) the format and the confidence, or None if no format matches.
+        """
+        counts = self.__counts
+        matched = {
+            "CIF": counts["CIF"] > 0,
+            "mmCIF": counts["mmCIF"] > 0,
+            "CNS": counts["CNS"] >= 50 and self.__mm1 < 10,
+            "TNT": counts["TNT"] >= 100,
+            "XSCALE": counts["XSCALE"] > 4,
+            "DTREK": counts["DTREK"] > 5,
+            "SCALEPACK": counts["SCALEPACK"] >= 3,
+            "SHELX": counts["SHELX"] >= 200,
+            "SAINT": counts["SAINT"] >= 200,
+        }
+        for fmt in FORMATS:
+            if matched[fmt]:
+                return fmt, min(counts[fmt] / CERTAIN[fmt], 1.0)
+        return None
+
+
+def sniff_sf_format(inpfile: str, prefix_size: int = PREFIX_SIZE) -> tuple:
+    """
+    Guesses the format of a structure factor file, reading as little of it as possible.
+
+    MTZ files are recognized by their first bytes.  Text files are read a line at a time and checked for
+    all formats at once; the preferred format matched in the first prefix_size characters is returned.
+    Only if nothing matches is the rest of the file read, prefix_size characters at a time.
+
+    Args:
+        inpfile (str): The path to the input file.
+        prefix_size (int, optional): Characters to read before deciding. Defaults to PREFIX_SIZE.
+
+    Returns:
+        tuple: (str, float) the format, or "Format not recognized", and the confidence - from 0 to 1,
+        the share of the matching lines needed to be certain.
+    """
+    with open(inpfile, "rb") as file:
+        magic = file.read(3)
+        if magic == b"MTZ":
+            return "MTZ", 1.0
+
+        file.seek(0)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        counts = _FormatCounts()
+        limit = prefix_size
+        nread = 0
+        i = 0
         try:
-            with open(inpfile, "rb") as file:
-                first_three_bytes = file.read(3)
+            for raw in file:
+                text = decoder.decode(raw)
+                if "\r" in text:
+                    # Universal newlines, as when reading in text mode
+                    text = text.replace("\r\n", "\n").replace("\r", "\n")
+                    for line in text.split("\n")[:-1]:
+                        counts.add_line(i, line + "\n")
+                        i += 1
+                    if not text.endswith("\n"):
+                        counts.add_line(i, text[text.rfind("\n") + 1 :])
+                        i += 1
+                else:
+                    counts.add_line(i, text)
+                    i += 1
+                if counts.certain():
+                    break
+                nread += len(text)
+                if nread >= limit:
+                    if counts.best() is not None:
+                        break
+                    limit += prefix_size
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return NOT_RECOGNIZED, 0.0
+
+    best = counts.best()
+    return best if best is not None else (NOT_RECOGNIZED, 0.0)
+
+
+def guess_sf_format(inpfile: str) -> str:
+    """
+    Guesses the format of a structure factor file based on its content.
 
-            if first_three_bytes == b"MTZ":
-                return "MTZ"
-        except Exception as _e:  # noqa: F841
-            pass
+    Args:
+        inpfile (str): The path to the input file.
 
-    return "Format not recognized"
+    Returns:
+        str: The guessed format of the structure factor file, or "Format not recognized".
+    """
+    return sniff_sf_format(inpfile)[0]
@@ -0,0 +1,389 @@
+import numpy as np
+
+# Values that mean "no data" in a PDBx/mmCIF reflection loop
+MISSING_VALUES = ("?", ".")
+
+
+def parse_float_column(values):
+    """
+    Converts a column of mmCIF values into a float64 array.
+
+    Args:
+        values (list): The column values (usually strings).
+
+    Returns:
+        tuple: (numpy.ndarray float64 values, numpy.ndarray bool parsed).  Values that float() cannot parse ("?", ".",
+               "****", ...) are NaN and not parsed.  A literal "nan" is parsed.
+    """
+    nval = len(values)
+    column = np.array(values, dtype=object).reshape(nval)
+    missing = np.zeros(nval, dtype=bool)
+    for marker in MISSING_VALUES:
+        missing |= column == marker
+    if missing.any():
+        column[missing] = "nan"
+    try:
+        return column.astype(np.float64), ~missing
+    except (ValueError, TypeError):
+        pass
+
+    # Garbage (i.e. "****") in the column - convert one at a time
+    arr = np.full(nval, np.nan, dtype=np.float64)
+    parsed = np.zeros(nval, dtype=bool)
+    for idx, v in enumerate(values):
+        try:
+            arr[idx] = float(v)
+            parsed[idx] = True
+        except (ValueError, TypeError):
+            pass
+    return arr, parsed
+
+
+def to_float_array(values):
+    """
+    Converts a column of mmCIF values into a float64 array.
+
+    Args:
+        values (list): The column values (usually strings).
+
+    Returns:
+        numpy.ndarray: The converted values.  "?", "." and anything that does not parse as a float become NaN.
+    """
+    return parse_float_column(values)[0]
+
+
+def to_index_array(values):
+    """
+    Converts a column of Miller indices to an int32 array.
+
+    Args:
+        values (list): The column values (usually strings).
+
+    Returns:
+        tuple: (numpy.ndarray int32 values, numpy.ndarray bool valid).  Rows that are not integral are 0 and not valid.
+    """
+    nval = len(values)
+    try:
+        arr = np.array(values, dtype=np.int64)
+        valid = np.ones(nval, dtype=bool)
+    except (ValueError, TypeError, OverflowError):
+        arr = np.zeros(nval, dtype=np.int64)
+        valid = np.zeros(nval, dtype=bool)
+        for idx, v in enumerate(values):
+            try:
+                ival = int(v)
+            except (ValueError, TypeError):
+                continue
+            # Clip in Python - values that do not fit in int64 are obviously wrong indices anyway
+            arr[idx] = max(min(ival, 2**31 - 1), -(2**31 - 1))
+            valid[idx] = True
+
+    # Symmetric range so that abs() cannot overflow
+    iinfo = np.iinfo(np.int32)
+    return np.clip(arr, -iinfo.max, iinfo.max).astype(np.int32), valid
+
+
+# Bits per index in a packed H,K,L key - indices from -2**20 to 2**20 - 1
+HKL_KEY_BITS = 21
+
+
+def pack_hkl(h, k, l):  # noqa: E741
+    """
+    Packs Miller indices into one int64 key per reflection.  Keys sort as (h, k, l) do.
+
+    Args:
+        h (numpy.ndarray): The h indices.
+        k (numpy.ndarray): The k indices.
+        l (numpy.ndarray): The l indices.
+
+    Returns:
+        numpy.ndarray: int64 keys, or None if an index does not fit in HKL_KEY_BITS bits.
+    """
+    offset = 1 << (HKL_KEY_BITS - 1)
+    keys = np.zeros(len(h), dtype=np.int64)
+    for ind in (h, k, l):
+        ind = ind.astype(np.int64) + offset
+        if ind.size and (ind.min() < 0 or ind.max() >= 2 * offset):
+            return None
+        keys <<= HKL_KEY_BITS
+        keys |= ind
+    return keys
+
+
+def find_duplicate_rows(h, k, l):  # noqa: E741
+    """
+    Finds reflections with the same indices as an earlier reflection.
+
+    Args:
+        h (numpy.ndarray): The h indices.
+        k (numpy.ndarray): The k indices.
+        l (numpy.ndarray): The l indices.
+
+    Returns:
+        numpy.ndarray: The rows (int64, ascending) that repeat the indices of an earlier row.  The first row with
+                       given indices is not included.
+    """
+    keys = pack_hkl(h, k, l)
+    # Stable sorts - in a group of equal indices the first row comes first
+    if keys is not None:
+        order = np.argsort(keys, kind="stable")
+        skeys = keys[order]
+        same = skeys[1:] == skeys[:-1]
+    else:
+        order = np.lexsort((l, k, h))
+        same = np.ones(max(len(order) - 1, 0), dtype=bool)
+        for ind in (h, k, l):
+            sind = ind[order]
+            same &= sind[1:] == sind[:-1]
+    return np.sort(order[1:][same]).astype(np.int64)
+
+
+class ReflnTable:
+    """Typed, columnar view of a reflection category (refln or diffrn_refln).
+
+    Columns are converted from the category strings on first use and kept with
+    the table.  The table does not track edits to the category - the owner
+    (StructureFactorFile) discards it when the category changes.
+    """
+
+    def __init__(self, cObj):
+        """
+        Initializes the table for a category.
+
+        Args:
+            cObj (DataCategory): The reflection category.
+        """
+        self.__cObj = cObj
+        self.__signature = self.category_signature(cObj)
+        self.__raw = {}
+        self.__floats = {}
+        self.__codes = {}
+        self.__indices = None
+        self.__resolution = {}
+
+    @staticmethod
+    def category_signature(cObj):
+        """
+        Returns a cheap signature of the structure of a category.
+
+        Args:
+            cObj (DataCategory): The category.
+
+        Returns:
+            tuple: Signature that changes when rows or attributes are replaced, added or removed.
+        """
+        return (id(cObj), id(cObj.data), cObj.getRowCount(), tuple(cObj.getAttributeList()))
+
+    def is_current(self, cObj):
+        """
+        Checks if the table still describes a category.
+
+        Args:
+            cObj (DataCategory): The category.
+
+        Returns:
+            bool: True if cObj is the category this table was built from and its structure is unchanged.
+        """
+        return cObj is self.__cObj and self.category_signature(cObj) == self.__signature
+
+    def get_category_name(self):
+        """Returns the name of the category"""
+        return self.__cObj.getName()
+
+    def get_row_count(self):
+        """Returns the number of rows"""
+        return self.__signature[2]
+
+    def get_attribute_list(self):
+        """Returns the attributes in the category"""
+        return list(self.__signature[3])
+
+    def has_attribute(self, attr):
+        """Returns True if attr is in the category"""
+        return attr in self.__signature[3]
+
+    def get_raw_column(self, attr):
+        """
+        Returns the values of a column as stored in the category.
+
+        Args:
+            attr (str): The attribute name.
+
+        Returns:
+            list: The column values (shared - do not modify), or None if the attribute is not present.
+        """
+        if not self.has_attribute(attr):
+            return None
+        if attr not in self.__raw:
+            self.__raw[attr] = self.__cObj.getColumn(self.__cObj.getIndex(attr))
+        return self.__raw[attr]
+
+    def get_float_column(self, attr):
+        """
+        Returns a column as float64.
+
+        Args:
+            attr (str): The attribute name.
+
+        Returns:
+            numpy.ndarray: The values with NaN for "?", "." and unparsable data, or None if the attribute is not present.
+        """
+        parsed = self.__parse_floats(attr)
+        return None if parsed is None else parsed[0]
+
+    def get_numeric_mask(self, attr):
+        """
+        Returns the rows in which a column holds a number (float() would succeed).
+
+        Args:
+            attr (str): The attribute name.
+
+        Returns:
+            numpy.ndarray: bool array, or None if the attribute is not present.
+        """
+        parsed = self.__parse_floats(attr)
+        return None if parsed is None else parsed[1]
+
+    def __parse_floats(self, attr):
+        if attr not in self.__floats:
+            raw = self.get_raw_column(attr)
+            if raw is None:
+                return None
+            self.__floats[attr] = parse_float_column(raw)
+        return self.__floats[attr]
+
+    def get_indices(self):
+        """
+        Returns the Miller indices.
+
+        Returns:
+            tuple: (h, k, l, valid) int32 arrays and a bool array that is False for rows with non integral indices,
+                   or None if an index is missing from the category.
+        """
+        if self.__indices is None:
+            if not (self.has_attribute("index_h") and self.has_attribute("index_k") and self.has_attribute("index_l")):
+                return None
+
+            h, hvalid = to_index_array(self.get_raw_column("index_h"))
+            k, kvalid = to_index_array(self.get_raw_column("index_k"))
+            l, lvalid = to_index_array(self.get_raw_column("index_l"))  # noqa: E741
+            self.__indices = (h, k, l, hvalid & kvalid & lvalid)
+        return self.__indices
+
+    def get_duplicate_rows(self):
+        """
+        Finds reflections with the same indices as an earlier reflection.
+
+        Indices are compared as numbers.  Rows with non integral indices are compared as they are written.
+
+        Returns:
+            numpy.ndarray: The rows (ascending) that repeat the indices of an earlier row, or None if an index is
+                           missing from the category.
+        """
+        indices = self.get_indices()
+        if indices is None:
+            return None
+        h, k, l, valid = indices  # noqa: E741
+
+        if valid.all():
+            return find_duplicate_rows(h, k, l)
+
+        rows = np.flatnonzero(valid)
+        dups = [rows[find_duplicate_rows(h[rows], k[rows], l[rows])]]
+
+        # Few rows, if any - compare the strings
+        seen = set()
+        columns = [self.get_raw_column(attr) for attr in ("index_h", "index_k", "index_l")]
+        invalid = []
+        for idx in np.flatnonzero(~valid).tolist():
+            key = (columns[0][idx], columns[1][idx], columns[2][idx])
+            if key in seen:
+                invalid.append(idx)
+            else:
+                seen.add(key)
+        dups.append(np.array(invalid, dtype=np.int64))
+        return np.sort(np.concatenate(dups))
+
+    def get_resolution(self, metric):
+        """
+        Returns the resolution of the reflections.
+
+        Args:
+            metric (ReciprocalMetric): The reciprocal metric of the cell.
+
+        Returns:
+            numpy.ndarray: The resolution (0 for rows with non integral indices), or None if an index is missing.
+        """
+        key = metric.get_key()
+        if key not in self.__resolution:
+            indices = self.get_indices()
+            if indices is None:
+                return None
+            h, k, l, valid = indices  # noqa: E741
+            resol = metric.get_resolution(h, k, l)
+            resol[~valid] = 0.0
+            self.__resolution[key] = resol
+        return self.__resolution[key]
+
+    def get_code_column(self, attr="status"):
+        """
+        Returns a compact encoding of a column with few distinct values (such as status).
+
+        Args:
+            attr (str): The attribute name.
+
+        Returns:
+            tuple: (codes, labels) where labels[codes[i]] is the value of row i, or None if the attribute is not present.
+        """
+        if attr not in self.__codes:
+            raw = self.get_raw_column(attr)
+            if raw is None:
+                return None
+            lookup = {}
+            codes = np.fromiter((lookup.setdefault(v, len(lookup)) for v in raw), dtype=np.int32, count=len(raw))
+            dtype = np.uint8 if len(lookup) <= 256 else np.uint16 if len(lookup) <= 65536 else np.int32
+            self.__codes[attr] = (codes.astype(dtype), list(lookup.keys()))
+        return self.__codes[attr]
+
+    def get_code_mask(self, attr, test):
+        """
+        Selects rows based on the value of a coded column.
+
+        Args:
+            attr (str): The attribute name.
+            test (callable): Called once per distinct value - returns True to select rows with that value.
+
+        Returns:
+            numpy.ndarray: bool array of selected rows, or None if the attribute is not present.
+        """
+        coded = self.get_code_column(attr)
+        if coded is None:
+            return None
+        codes, labels = coded
+        selected = [idx for idx, label in enumerate(labels) if test(label)]
+        return np.isin(codes, selected)
+
+    def get_value_mask(self, attr, value):
+        """
+        Selects rows in which a column is exactly a given value (i.e. "?").
+
+        Args:
+            attr (str): The attribute name.
+            value (str): The value to match.
+
+        Returns:
+            numpy.ndarray: bool array of matching rows, or None if the attribute is not present.
+        """
+        if attr in self.__codes or value not in MISSING_VALUES:
+            return self.get_code_mask(attr, lambda v: v == value)
+
+        # Missing markers can only be in rows that are not numbers - avoid coding a column of floats
+        numeric = self.get_numeric_mask(attr)
+        if numeric is None:
+            return None
+        mask = np.zeros(numeric.size, dtype=bool)
+        rows = np.flatnonzero(~numeric)
+        if rows.size:
+            raw = self.get_raw_column(attr)
+            mask[rows] = [raw[idx] == value for idx in rows]
+        return mask
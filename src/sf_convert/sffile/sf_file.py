@@ -3,9 +3,9 @@ import traceback
 import re
 
 from mmcif.io.IoAdapterCore import IoAdapterCore
-from mmcif.api.PdbxContainers import DataContainer
 from mmcif.api.DataCategory import DataCategory
-from sf_convert.utils.CifUtils import reorderCategoryAttr
+from sf_convert.utils.CifUtils import permuteCategoryAttr
+from sf_convert.sffile.refln_table import ReflnTable
 
 
 class StructureFactorFile:
@@ -16,6 +16,7 @@ class StructureFactorFile:
         self.__data_blocks = []  # Contains the data blocks in the file
         self.__file_io = IoAdapterCore()  # Handles file input/output
         self.__default_block_index = 0  # The index of the default data block
+        self.__refln_tables = {}  # Columnar views of reflection categories, id(category) -> ReflnTable
 
     def read_file(self, filename):
         """
@@ -31,6 +32,7 @@ class StructureFactorFile:
             self.__data_blocks = self.__file_io.readFile(filename)
         except Exception as e:
             raise RuntimeError(f"Failed to read file {filename}") from e
+        self.invalidate_reflection_tables()
 
     def get_block_by_index(self, block_index):
         """
@@ -252,6 +254,7 @@ class StructureFactorFile:
                 seen.add(row_tuple)
                 new_data.append(row)
         category.data = new_data
+        self.invalidate_reflection_tables(category)
         final_row_count = category.getRowCount()
 
         return initial_row_count != final_row_count
@@ -293,69 +296,112 @@ class StructureFactorFile:
                 row[index] = new_value
                 num_replaced += 1
 
+        if num_replaced > 0:
+            self.invalidate_reflection_tables(category)
+
         return num_replaced
 
+    def get_reflection_table(self, category_name="refln", block_index=None):
+        """
+        Gets a columnar (NumPy) view of a reflection category.
+
+        The view is cached and rebuilt when the rows or attributes of the category are
+        replaced.  Code that edits values in place without going through this class
+        must call invalidate_reflection_tables().
+
+        Args:
+            category_name (str, optional): The name of the category. Defaults to "refln".
+            block_index (int, optional): The index of the data block. Defaults to the default block.
+
+        Returns:
+            ReflnTable: The table, or None if the category or data block does not exist.
+        """
+        if block_index is None:
+            block_index = self.__default_block_index
+        if not 0 <= block_index < len(self.__data_blocks):
+            return None
+
+        category = self.__data_blocks[block_index].getObj(category_name)
+        if category is None:
+            return None
+
+        table = self.__refln_tables.get(id(category))
+        if table is None or not table.is_current(category):
+            table = ReflnTable(category)
+            self.__refln_tables[id(category)] = table
+        return table
+
+    def invalidate_reflection_tables(self, category=None):
+        """
+        Discards cached reflection tables.
+
+        Args:
+            category (DataCategory, optional): Only discard the table for this category. Defaults to all.
+        """
+        if category is None:
+            self.__refln_tables = {}
+        else:
+            self.__refln_tables.pop(id(category), None)
+
     def reorder_category_attributes(self, category_name, new_order, block_name=None):
         """
-        Reorders the attributes of a category.
+        Reorders the attributes of a category, in place.
 
         Args:
             category_name (str): The name of the category.
             new_order (list): The new order of attribute names.
             block_name (str, optional): The name of the data block. Defaults to None.
+
+        Returns:
+            bool: True if the order changed.
         """
         # Get the category object
         category = self.get_category_object(category_name, block_name)
+        if category is None:
+            return False
 
-        # Reorder the category's attributes
-        reordered_category = reorderCategoryAttr(category, new_order)
-
-        # Replace the existing category with the reordered one
-        _, block = self.get_block_by_name(block_name)
-        block.replace(reordered_category)
+        # Permute the columns of the existing rows
+        changed = permuteCategoryAttr(category, new_order)
+        if changed:
+            self.invalidate_reflection_tables(category)
+        return changed
 
     def reorder_categories_in_block(self, new_order, block_name=None):
         """
-        Reorders the categories in a data block.
+        Reorders the categories in a data block, in place.
+
+        Categories out of place are removed and appended again - the block and its categories are kept.
 
         Args:
-            new_order (list): The new order of category names.
+            new_order (list): The new order of category names.  Categories not listed follow, in their current order.
             block_name (str, optional): The name of the data block. Defaults to None.
+
+        Returns:
+            bool: True if the order changed.
         """
         # Get the block
         if block_name is None:
             block = self.__data_blocks[self.__default_block_index]
         else:
-            block_index, block = self.get_block_by_name(block_name)
+            _, block = self.get_block_by_name(block_name)
             if block is None:
                 print(f"Block {block_name} does not exist.")
-                return
-
-        # Create a new block with the same name and type
-        new_block = DataContainer(block.getName())
-        new_block.setType(block.getType())
-
-        # Copy properties from the old block to the new one
-        for prop_name in block.getPropCatalog():
-            new_block.setProp(prop_name, block.getProp(prop_name))
-
-        # Add categories to the new block in the desired order
-        for category_name in new_order:
-            category = block.getObj(category_name)
-            if category is not None:
-                new_block.append(category)
+                return False
 
-        # Add any remaining categories that were not in new_order
-        for category_name in block.getObjNameList():
-            if category_name not in new_order:
-                category = block.getObj(category_name)
-                new_block.append(category)
+        names = block.getObjNameList()
+        ordered = [name for name in dict.fromkeys(new_order) if block.exists(name)]
+        used = set(ordered)
+        ordered.extend(name for name in names if name not in used)
+        if ordered == names:
+            return False
 
-        # Replace the original block with the new one
-        if block_name is None:
-            self.__data_blocks[self.__default_block_index] = new_block
-        else:
-            self.__data_blocks[block_index] = new_block
+        # Categories before the first one out of place stay where they are
+        start = next(idx for idx, (name, current) in enumerate(zip(ordered, names)) if name != current)
+        for name in ordered[start:]:
+            cObj = block.getObj(name)
+            block.remove(name)
+            block.append(cObj)
+        return True
 
     def generate_expected_block_name(self, pdbid, block):
         """
@@ -474,3 +520,4 @@ class StructureFactorFile:
     def remove_block(self, blkid):
         """Removes block blkid from indices"""
         del self.__data_blocks[blkid]
+        self.invalidate_reflection_tables()
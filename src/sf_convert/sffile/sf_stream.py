@@ -0,0 +1,225 @@
+# Streaming reader for mmCIF structure factor files.
+#
+# IoAdapterCore.readFile() builds every reflection row as a Python list before anything can
+# be done with the file.  iter_sf_file() instead hands out the reflection loops a chunk of rows
+# at a time, as ReflnTable (typed, columnar) views, so that memory stays bounded by the chunk
+# size and checks can run while the rest of the file is read.  The other categories of a block
+# are parsed with the mmcif reader once the block ends.
+
+import io
+import re
+
+from mmcif.api.DataCategory import DataCategory
+from mmcif.io.PdbxReader import PdbxReader
+from sf_convert.sffile.refln_table import ReflnTable
+
+# Rows per chunk of a streamed loop
+CHUNK_ROWS = 1 << 16
+
+# Loops handed out in chunks - everything else is read as usual
+STREAMED_CATEGORIES = ("refln", "diffrn_refln")
+
+# Words that end a loop
+RESERVED = ("data_", "loop_", "save_", "global_", "stop_")
+
+# A quoted value ends at a quote followed by white space
+TOKEN = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(#.*)|(\S+)""")
+
+
+def split_values(line):
+    """
+    Splits a line of loop data into values.
+
+    Args:
+        line (str): The line.
+
+    Returns:
+        list: The values, without quotes.  A comment ends the line.
+    """
+    if "'" not in line and '"' not in line and "#" not in line:
+        return line.split()
+
+    values = []
+    for single, double, comment, bare in TOKEN.findall(line):
+        if comment:
+            break
+        values.append(bare or single or double)
+    return values
+
+
+def _starts_loop_end(line):
+    """Returns True if a line of a loop starts with a tag or reserved word, ending the loop"""
+    word = line.lstrip()[:7].lower()
+    return word.startswith("_") or word.startswith(RESERVED)
+
+
+class _LoopReader:
+    """Collects the values of a streamed loop into chunks of rows"""
+
+    def __init__(self, category, attributes, chunk_rows):
+        self.__category = category
+        self.__attributes = attributes
+        self.__chunk_rows = chunk_rows
+        self.__rows = []
+        self.__row = []
+        self.__nrow = 0
+
+    @property
+    def category(self):
+        return self.__category
+
+    def add_values(self, values):
+        """
+        Adds values, in file order.
+
+        Returns:
+            bool: True if a chunk is full.
+        """
+        row = self.__row
+        natt = len(self.__attributes)
+        for value in values:
+            row.append(value)
+            if len(row) == natt:
+                self.__rows.append(row)
+                row = []
+        self.__row = row
+        return len(self.__rows) >= self.__chunk_rows
+
+    def take_chunk(self):
+        """
+        Returns the complete rows read so far.
+
+        Returns:
+            tuple: (int, ReflnTable) the index of the first row in the loop and the rows, or None if there are none.
+        """
+        if not self.__rows:
+            return None
+        first = self.__nrow
+        rows = self.__rows
+        self.__rows = []
+        self.__nrow += len(rows)
+        return first, ReflnTable(DataCategory(self.__category, list(self.__attributes), rows, copyInputData=False))
+
+    def incomplete(self):
+        """Returns the number of values left over at the end of the loop"""
+        return len(self.__row)
+
+
+def _parse_header(lines):
+    """Parses the categories of a block that are not streamed"""
+    containers = []
+    PdbxReader(io.StringIO("".join(lines))).read(containers)
+    return containers[0] if containers else None
+
+
+def iter_sf_file(filename, chunk_rows=CHUNK_ROWS, categories=STREAMED_CATEGORIES):
+    """
+    Reads an mmCIF structure factor file, handing out the reflection loops in chunks.
+
+    Yields, in file order:
+        ("chunk", block name, first row, ReflnTable) for each chunk of a streamed loop, as soon as it is read.
+        ("block", DataContainer) at the end of each block, with its other categories.
+
+    Args:
+        filename (str): The path to the file.
+        chunk_rows (int, optional): Rows per chunk. Defaults to CHUNK_ROWS.
+        categories (tuple, optional): The loops to stream. Defaults to STREAMED_CATEGORIES.
+
+    Raises:
+        ValueError: If a streamed loop does not hold a whole number of rows.
+    """
+    header = []
+    block_name = None
+    loop = None
+    pending = None
+    text_field = False
+
+    def end_loop():
+        if loop.incomplete():
+            raise ValueError(f"Loop {loop.category} in block {block_name} has {loop.incomplete()} values left over")
+        return loop.take_chunk()
+
+    def end_block():
+        block = _parse_header(header) if header else None
+        if block is not None:
+            yield ("block", block)
+
+    with open(filename, "r") as fin:
+        for line in fin:
+            if pending is not None:
+                # Loop header - streamed or not is decided on the first tag
+                lines, category, attributes = pending
+                stripped = line.strip()
+                if stripped.startswith("_"):
+                    tcategory, _, attribute = stripped.split()[0][1:].partition(".")
+                    if category is None and tcategory not in categories:
+                        header.extend(lines)
+                        pending = None
+                    elif category is None or tcategory == category:
+                        lines.append(line)
+                        pending = (lines, tcategory, attributes + [attribute])
+                        continue
+                    else:
+                        # Streamed loop without rows
+                        pending = None
+                elif not stripped or stripped.startswith("#"):
+                    lines.append(line)
+                    continue
+                elif category is not None and not _starts_loop_end(line):
+                    loop = _LoopReader(category, attributes, chunk_rows)
+                    pending = None
+                else:
+                    if category is None:
+                        header.extend(lines)
+                    pending = None
+
+            if loop is not None:
+                full = False
+                if line.startswith(";"):
+                    # Text field - one value
+                    value = [line[1:].rstrip("\r\n")]
+                    for tline in fin:
+                        if tline.startswith(";"):
+                            break
+                        value.append(tline.rstrip("\r\n"))
+                    full = loop.add_values(["\n".join(value).strip("\n")])
+                elif _starts_loop_end(line):
+                    chunk = end_loop()
+                    if chunk is not None:
+                        yield ("chunk", block_name, chunk[0], chunk[1])
+                    loop = None
+                else:
+                    full = loop.add_values(split_values(line))
+
+                if full:
+                    first, table = loop.take_chunk()
+                    yield ("chunk", block_name, first, table)
+                if loop is not None:
+                    continue
+
+            if text_field:
+                header.append(line)
+                text_field = not line.startswith(";")
+                continue
+            if line.startswith(";"):
+                header.append(line)
+                text_field = True
+                continue
+
+            word = line.lstrip()[:5].lower()
+            if word == "data_":
+                yield from end_block()
+                block_name = line.strip()[5:]
+                header = [line]
+            elif word == "loop_" and line.strip().lower() == "loop_":
+                pending = ([line], None, [])
+            else:
+                header.append(line)
+
+    if loop is not None:
+        chunk = end_loop()
+        if chunk is not None:
+            yield ("chunk", block_name, chunk[0], chunk[1])
+    elif pending is not None and pending[1] is None:
+        header.extend(pending[0])
+    yield from end_block()
@@ -1,6 +1,11 @@
 import math
 
+import numpy as np
+
 from sf_convert.utils.SpaceGroup import SpaceGroup
+from sf_convert.utils.profiler import profiled
+from sf_convert.utils.reciprocal_metric import ReciprocalMetric, reciprocal_cell
+from sf_convert.utils.refln_stats import ReflnStats, RESOH
 from mmcif.api.DataCategory import DataCategory
 from mmcif.api.PdbxContainers import DataContainer
 from mmcif.io.IoAdapterCore import IoAdapterCore
@@ -40,6 +45,7 @@ class CheckSfFile:
         self.__unmerge_i = self.__unmerge_si = []
         self.__pdbcell = None
         self.__pdbsymm = None
+        self.__column_attrs = {}  # Column (i.e. "Io") -> attribute name in refln or diffrn_refln
 
     def set_pdb_cell(self, cell):
         """Sets the cell to the list cell [a, b, c, alpha, beta, gamma] from the coordinate file"""
@@ -74,6 +80,7 @@ class CheckSfFile:
         self.__phase_c = self.__phase_o = self.__fom = []
         self.__dH = self.__dK = self.__dL = []
         self.__unmerge_i = self.__unmerge_si = []
+        self.__column_attrs = {}
         self.__initialize_refln_data()
         self.__initialize_diffrn_refln_data()
         self.__initialize_counts()
@@ -159,8 +166,8 @@ class CheckSfFile:
 
         for attr, var in attributes.items():
             if self.__refln_data and self.__refln_data.hasAttribute(attr):
-                setattr(self, var, self.__refln_data.getColumn(self.__refln_data.getIndex(attr)))
                 setattr(self, "_CheckSfFile__" + var, self.__refln_data.getColumn(self.__refln_data.getIndex(attr)))
+                self.__column_attrs[var] = attr
 
             else:
                 setattr(self, "_CheckSfFile__" + var, None)
@@ -170,6 +177,7 @@ class CheckSfFile:
         for attr, var in diffrn_attributes.items():
             if self.__diffrn_refln_data and self.__diffrn_refln_data.hasAttribute(attr):
                 setattr(self, "_CheckSfFile__" + var, self.__diffrn_refln_data.getColumn(self.__diffrn_refln_data.getIndex(attr)))
+                self.__column_attrs[var] = attr
             else:
                 setattr(self, "_CheckSfFile__" + var, None)
 
@@ -190,6 +198,7 @@ class CheckSfFile:
         # Check if attribute "intensity_meas" is present
         if self.__refln_data and self.__refln_data.hasAttribute("intensity_meas"):
             self.__Io = self.__refln_data.getColumn(self.__refln_data.getIndex("intensity_meas"))
+            self.__column_attrs["Io"] = "intensity_meas"
         else:
             self.__Io = None
 
@@ -200,6 +209,7 @@ class CheckSfFile:
 
             # If attribute "intensity_meas_au" is present and was successfully set to self.__Io, change the token
             if self.__Io:
+                self.__column_attrs["Io"] = "intensity_meas_au"
                 self.__cif_token_change("intensity_meas_au", "intensity_meas")
 
         # If self.__Io is still None, check for attribute "intensity"
@@ -209,6 +219,7 @@ class CheckSfFile:
 
             # If attribute "intensity" is present and was successfully set to self.__Io, change the token
             if self.__Io:
+                self.__column_attrs["Io"] = "intensity"
                 self.__cif_token_change("intensity", "intensity_meas")
 
     def __initialize_sIo(self):
@@ -224,6 +235,7 @@ class CheckSfFile:
         # Check if attribute "intensity_sigma" is present
         if self.__refln_data and self.__refln_data.hasAttribute("intensity_sigma"):
             self.__sIo = self.__refln_data.getColumn(self.__refln_data.getIndex("intensity_sigma"))
+            self.__column_attrs["sIo"] = "intensity_sigma"
         else:
             self.__sIo = None
 
@@ -234,6 +246,7 @@ class CheckSfFile:
 
             # If attribute "intensity_sigma_au" is present and was successfully set to self.__sIo, change the token
             if self.__sIo:
+                self.__column_attrs["sIo"] = "intensity_sigma_au"
                 self.__cif_token_change("intensity_sigma_au", "intensity_sigma")
 
         # If self.__sIo is still None, check for attribute "intensity_sigm"
@@ -243,6 +256,7 @@ class CheckSfFile:
 
             # If attribute "intensity_sigm" is present and was successfully set to self.__sIo, change the token
             if self.__sIo:
+                self.__column_attrs["sIo"] = "intensity_sigm"
                 self.__cif_token_change("intensity_sigm", "intensity_sigma")
 
         # If self.__sIo is still None, check for attribute "intensity_meas_sigma"
@@ -252,6 +266,7 @@ class CheckSfFile:
 
             # If attribute "intensity_meas_sigma" is present and was successfully set to self.__sIo, change the token
             if self.__sIo:
+                self.__column_attrs["sIo"] = "intensity_meas_sigma"
                 self.__cif_token_change("intensity_meas_sigma", "intensity_sigma")
 
         # If self.__sIo is still None, check for attribute "intensity_meas_sigma_au"
@@ -261,6 +276,7 @@ class CheckSfFile:
 
             # If attribute "intensity_meas_sigma_au" is present and was successfully set to self.__sIo, change the token
             if self.__sIo:
+                self.__column_attrs["sIo"] = "intensity_meas_sigma_au"
                 self.__cif_token_change("intensity_meas_sigma_au", "intensity_sigma")
 
     def __initialize_status(self):
@@ -276,21 +292,15 @@ class CheckSfFile:
         if self.__refln_data is None:
             return
 
-        self.__status = self.__refln_data.getColumn(self.__refln_data.getIndex("status"))
-        if not self.__status:
-            self.__status = self.__refln_data.getColumn(self.__refln_data.getIndex("R_free_flag"))
+        for attr in ["status", "R_free_flag", "statu", "status_au"]:
+            # Note: getIndex() is -1 for a missing attribute - so the last column is used (legacy behaviour)
+            idx = self.__refln_data.getIndex(attr)
+            self.__status = self.__refln_data.getColumn(idx)
             if self.__status:
-                self.__cif_token_change("R_free_flag", "status")
-
-            if not self.__status:
-                self.__status = self.__refln_data.getColumn(self.__refln_data.getIndex("statu"))
-                if self.__status:
-                    self.__cif_token_change("statu", "status")
-
-                if not self.__status:
-                    self.__status = self.__refln_data.getColumn(self.__refln_data.getIndex("status_au"))
-                    if self.__status:
-                        self.__cif_token_change("status_au", "status")
+                self.__column_attrs["status"] = self.__refln_data.getAttributeList()[idx]
+                if attr != "status":
+                    self.__cif_token_change(attr, "status")
+                break
 
     def __calc_cell_and_recip(self, override=False):
         """
@@ -317,62 +327,13 @@ class CheckSfFile:
 
                 cell = [a, b, c, alpha, beta, gamma]
 
-            rcell = [0.0] * 6
-
-            cosa = math.cos(math.radians(cell[3]))
-            cosb = math.cos(math.radians(cell[4]))
-            cosc = math.cos(math.radians(cell[5]))
-            sina = math.sin(math.radians(cell[3]))
-            sinb = math.sin(math.radians(cell[4]))
-            sinc = math.sin(math.radians(cell[5]))
-
-            v = cell[0] * cell[1] * cell[2] * math.sqrt(1.0 - cosa * cosa - cosb * cosb - cosc * cosc + 2.0 * cosa * cosb * cosc)
-
-            rcell[0] = cell[1] * cell[2] * sina / v
-            rcell[1] = cell[0] * cell[2] * sinb / v
-            rcell[2] = cell[0] * cell[1] * sinc / v
-
-            cosast = (cosb * cosc - cosa) / (sinb * sinc)
-            cosbst = (cosa * cosc - cosb) / (sina * sinc)
-            coscst = (cosa * cosb - cosc) / (sina * sinb)
-
-            rcell[3] = math.acos(cosast) / math.radians(1.0)
-            rcell[4] = math.acos(cosbst) / math.radians(1.0)
-            rcell[5] = math.acos(coscst) / math.radians(1.0)
+            rcell = reciprocal_cell(cell)
 
             return rcell, cell
         else:
             self.__logger.pinfo("Warning: No cell data found in the mmCIF file.", self.__pinfo_value)
             return None, None
 
-    def __get_resolution(self, h, k, l, rcell):  # noqa: E741
-        """
-        Calculates the resolution for a given h, k, l and rcell.
-
-        Args:
-            h: The h value.
-            k: The k value.
-            l: The l value.
-            rcell: The reciprocal cell.
-
-        Returns:
-            resol: The resolution.
-        """
-        aa1 = 2 * rcell[0] * rcell[1] * math.cos(math.radians(rcell[5]))
-        aa2 = 2 * rcell[0] * rcell[2] * math.cos(math.radians(rcell[4]))
-        aa3 = 2 * rcell[1] * rcell[2] * math.cos(math.radians(rcell[3]))
-
-        a2 = rcell[0] * rcell[0]
-        b2 = rcell[1] * rcell[1]
-        c2 = rcell[2] * rcell[2]
-
-        dist_sq = h * h * a2 + k * k * b2 + l * l * c2 + h * k * aa1 + h * l * aa2 + k * l * aa3
-        resol = 0
-        if dist_sq > 0.0000001:
-            resol = 1.0 / math.sqrt(dist_sq)
-
-        return resol
-
     def __cif_token_change(self, old_token, new_token):
         """
         Changes the cif token.
@@ -401,21 +362,8 @@ class CheckSfFile:
         self.__logger.pinfo(f"Data_block_id={self.__sf_block.getName()}, block_number={nblock + 1}\n", 0)  # self.__pinfo_value)
         self.__initialize_data()
 
-        temp_nref, nstart, n1, n4, n5, nfpairF, nfpairI, nf_sFo, nf_sIo, key = 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
-        # n2 removed
-        sum_sigii, ii_sigii, ii_sigii_low, nnii, sum_ii, nnii_low, nfp, nfn, nip, nin, n_obs, n_free = 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
-        max_H, min_H, max_K, min_K, max_L, min_L = -500, 500, -500, 500, -500, 500
-        max_F, min_F, max_I, min_I = -500000.0, 500000.0, -5000000.0, 5000000.0
-        max_R, min_R, max_F2, min_F2 = -500.0, 900.0, -500000.0, 500000.0
-        ii_sigii_max = -90000
-        resolution = 0
-        i_over_si, sum_i, sum_si, nf_Io, n6, n7, n8 = 0, 0, 0, 0, 0, 0, 0
-        f_over_sf, sum_f, sum_sf, nf_Fo = 0, 0, 0, 0
-        f2_over_sf2, sum_f2, sum_sf2, nf_F2o = 0, 0, 0, 0
-
+        key = 0
         resol = [100]
-        RESOH = 0.1
-        RESOL = 200
 
         if self.__pdbcell:
             self.__check_cell(self.__sf_block, nblock)
@@ -462,204 +410,25 @@ class CheckSfFile:
         if cell and (cell[0] > 0.01 and cell[1] > 0.01):
             key = 1
 
-        invalid_miller = False
-        for i in range(nstart, self.__nref):  # check data items
-            # pinfo(f"Checking reflection {i} of {self._nref} (data block= {nblock + 1})")
-            try:
-                ah = int(self.__H[i])
-                ak = int(self.__K[i])
-                al = int(self.__L[i])
-            except:  # noqa: E722 pylint: disable=bare-except
-                if not invalid_miller:
-                    # Report once
-                    self.__logger.pinfo(f"Error: Miller indices are not integral ({self.__H[i]}, {self.__K[i]}, {self.__L[i]})", self.__pinfo_value)
-                    invalid_miller = True
-                continue
-
-            min_H = min(min_H, ah)
-            min_K = min(min_K, ak)
-            min_L = min(min_L, al)
-
-            max_H = max(max_H, ah)
-            max_K = max(max_K, ak)
-            max_L = max(max_L, al)
-
-            if not (
-                (self.__Fo_au and self.__Fo_au[i] != "?")
-                or (self.__Io and self.__Io[i] != "?")
-                or (self.__I_plus and self.__I_plus[i] != "?")
-                or (self.__I_minus and self.__I_minus[i] != "?")
-                or (self.__F_plus and self.__F_plus[i] != "?")
-                or (self.__F_minus and self.__F_minus[i] != "?")
-                or (self.__unmerge_i and self.__unmerge_i[i] != "?")
-                or (self.__F2o and self.__F2o[i] != "?")
-                or (self.__Fo and self.__Fo[i] != "?")
-            ):
-                continue
-
-            temp_nref += 1
-            hkl = f"HKL={ah:4d} {ak:4d} {al:4d}"
-
-            if (ah == 0 and ak == 0 and al == 0) or (abs(ah) > 800 or abs(ak) > 800 or abs(al) > 800):
-                n1 += 1
-                if n1 == 1:
-                    self.__logger.pinfo(f"Error: File has wrong indices ({hkl}).", self.__pinfo_value)
-
-            # --------------------------------------------------------------
-            if self.__sFo_au and i > 0 and self.__is_float(self.__sFo_au[i - 1]) and self.__is_float(self.__sFo_au[i]):
-                if float(self.__sFo_au[i - 1]) == float(self.__sFo_au[i]):
-                    nf_sFo += 1
-            if self.__sIo and i > 0 and self.__is_float(self.__sIo[i - 1]) and self.__is_float(self.__sIo[i]):
-                if float(self.__sIo[i - 1]) == float(self.__sIo[i]):
-                    nf_sIo += 1
-
-            # if self.__sFo_au and i > 0 and float(self.__sFo_au[i - 1]) == float(self.__sFo_au[i]):
-            #     nf_sFo += 1
-            # if self.__sIo and i > 0 and float(self.__sIo[i - 1]) == float(self.__sIo[i]):
-            #     nf_sIo += 1
-
-            if self.__F_plus and self.__is_float(self.__F_plus[i]):
-                f = float(self.__F_plus[i])
-                nfpairF += 1
-                if f < 0:
-                    n4 += 1
-                    if n4 == 1:
-                        self.__logger.pinfo(f"Error: File has negative amplitude (F+: {self.__F_plus[i]}) for ({hkl}).", self.__pinfo_value)
-
-            if self.__I_plus and self.__is_float(self.__I_plus[i]):
-                nfpairI += 1
-                f = float(self.__I_plus[i])
-
-            if key > 0:
-                resolution = self.__get_resolution(ah, ak, al, self.__rcell)
-
-                if min_R > resolution:
-                    min_R = resolution
-                    self.__hkl_min = f"{ah: 4d} {ak: 4d} {al: 4d}"
-
-                if max_R < resolution:
-                    max_R = resolution
-                    self.__hkl_max = f"{ah: 4d} {ak: 4d} {al: 4d}"
-
-                val = 0
-                sval = 0
-                if self.__Io and self.__sIo and self.__sIo[i] != "?":
-                    val = self.__float_or_zero(self.__Io[i])
-                    sval = self.__float_or_zero(self.__sIo[i])
-                elif self.__Fo_au and self.__sFo_au and self.__sFo_au[i] != "?":
-                    fval = self.__float_or_zero(self.__Fo_au[i])
-                    val = fval * fval
-                    sval = 2 * fval * self.__float_or_zero(self.__sFo_au[i])
-                elif self.__F2o and self.__sFo and self.__sF2o[i] != "?":
-                    val = self.__float_or_zero(self.__F2o[i])
-                    sval = self.__float_or_zero(self.__sF2o[i])
-                elif self.__Fo and self.__sFo and self.__sFo[i] != "?":
-                    fval = self.__float_or_zero(self.__Fo[i])
-                    val = fval * fval
-                    sval = 2 * fval * self.__float_or_zero(self.__sFo[i])
-
-                if sval > 0:
-                    sum_sigii += sval
-                    sum_ii += val
-                    ratio = val / sval
-                    ii_sigii += ratio
-                    if resolution > 7.0:  # low resolution I/sigI
-                        ii_sigii_low += ratio
-                        nnii_low += 1
-                    if ratio > ii_sigii_max:
-                        ii_sigii_max = ratio
-                    nnii += 1
-
-            if RESOL + 0.01 >= resolution >= RESOH - 0.01:  # for onedep
-                if self.__F_plus and self.__F_plus[i] != "?":
-                    nfp += 1
-                if self.__F_minus and self.__F_minus[i] != "?":
-                    nfn += 1
-                if self.__I_plus and self.__I_plus[i] != "?":
-                    nip += 1
-                if self.__I_minus and self.__I_minus[i] != "?":
-                    nin += 1
-
-                if (
-                    (self.__Fo and self.__Fo[i] != "?")
-                    or (self.__Fo_au and self.__Fo_au[i] != "?")
-                    or (self.__Io and self.__Io[i] != "?")
-                    or (self.__F2o and self.__F2o[i] != "?")
-                    or ((self.__F_plus and self.__F_plus[i] != "?") or (self.__F_minus and self.__F_minus[i] != "?"))
-                    or ((self.__I_plus and self.__I_plus[i] != "?") or (self.__I_minus and self.__I_minus[i] != "?"))
-                ):
-                    if self.__status and self.__status[i] == "o":
-                        n_obs += 1
-                    elif self.__status and "f" in self.__status[i]:
-                        n_free += 1
-
-            if self.__Fo_au:
-                f = self.__float_or_zero(self.__Fo_au[i])
-                if f < 0:
-                    n5 += 1
-                    if n5 == 1:
-                        self.__logger.pinfo(f"Error: File has negative amplitude (Fo: {self.__Fo_au[i]}) for ({hkl}).", self.__pinfo_value)
-
-                if f < min_F:
-                    min_F = f
-                if f > max_F:
-                    max_F = f
-
-                if self.__sFo_au and self.__is_float(self.__sFo_au[i]):
-                    sigf = float(self.__sFo_au[i])
-                    if sigf > 0 and self.__sFo_au[i] != "?":
-                        f_over_sf += f / sigf
-                        sum_f += f
-                        sum_sf += sigf
-                        nf_Fo += 1
-
-            if self.__F2o:
-                f = float(self.__F2o[i])
-                if f < min_F2:
-                    min_F2 = f
-                if f > max_F2:
-                    max_F2 = f
-
-                if self.__sF2o:
-                    sigf = float(self.__sF2o[i])
-                    if sigf > 0 and self.__sF2o[i] != "?":
-                        f2_over_sf2 += f / sigf
-                        sum_f2 += f
-                        sum_sf2 += sigf
-                        nf_F2o += 1
-
-            if self.__Io and self.__is_float(self.__Io[i]):
-                f = float(self.__Io[i])
-                if f < min_I:
-                    min_I = f
-                if f > max_I:
-                    max_I = f
-
-                if self.__sIo:
-                    if self.__is_float(self.__sIo[i]):
-                        sigf = float(self.__sIo[i])
-                    else:
-                        sigf = 0.0
-                    if sigf > 0 and self.__sIo[i] != "?":
-                        i_over_si += f / sigf
-                        sum_i += f
-                        sum_si += sigf
-                        nf_Io += 1
-
-            if self.__fom and self.__is_float(self.__fom[i]) and abs(float(self.__fom[i])) > 1.01:
-                if n6 == 0:
-                    n6 += 1
-                    self.__logger.pinfo(f"Warning: File has wrong values of FOM ({self.__fom[i]}) for ({hkl}).", self.__pinfo_value)
-
-            if self.__phase_c and self.__is_float(self.__phase_c[i]) and abs(float(self.__phase_c[i])) > 361.0:
-                if n7 == 0:
-                    n7 += 1
-                    self.__logger.pinfo(f"Warning: File has wrong values of phase ({self.__phase_c[i]}) for ({hkl}).", self.__pinfo_value)
-
-            if self.__phase_o and self.__is_float(self.__phase_o[i]) and abs(float(self.__phase_o[i])) > 361.0:
-                if n8 == 0:
-                    n8 += 1
-                    self.__logger.pinfo(f"Warning: File has wrong values of phase ({self.__phase_o[i]}) for ({hkl}).", self.__pinfo_value)
+        stats = self.__reflection_stats(nblock, self.__rcell if key > 0 else None)
+        self.__report_reflection_events(stats)
+
+        v = stats.get_values()
+        temp_nref, n1, n4, n5, nfpairF, nfpairI, nf_sFo, nf_sIo = (v[name] for name in ["temp_nref", "n1", "n4", "n5", "nfpairF", "nfpairI", "nf_sFo", "nf_sIo"])
+        sum_sigii, ii_sigii, ii_sigii_low, nnii, sum_ii, nnii_low = (v[name] for name in ["sum_sigii", "ii_sigii", "ii_sigii_low", "nnii", "sum_ii", "nnii_low"])
+        nfp, nfn, nip, nin, n_obs, n_free = (v[name] for name in ["nfp", "nfn", "nip", "nin", "n_obs", "n_free"])
+        max_H, min_H, max_K, min_K, max_L, min_L = (v[name] for name in ["max_H", "min_H", "max_K", "min_K", "max_L", "min_L"])
+        max_F, min_F, max_I, min_I = (v[name] for name in ["max_F", "min_F", "max_I", "min_I"])
+        max_R, min_R, max_F2, min_F2 = (v[name] for name in ["max_R", "min_R", "max_F2", "min_F2"])
+        ii_sigii_max = v["ii_sigii_max"]
+        i_over_si, sum_i, sum_si, nf_Io = (v[name] for name in ["i_over_si", "sum_i", "sum_si", "nf_Io"])
+        f_over_sf, sum_f, sum_sf, nf_Fo = (v[name] for name in ["f_over_sf", "sum_f", "sum_sf", "nf_Fo"])
+        f2_over_sf2, sum_f2, sum_sf2, nf_F2o = (v[name] for name in ["f2_over_sf2", "sum_f2", "sum_sf2", "nf_F2o"])
+
+        if v["hkl_min_row"] is not None:
+            self.__hkl_min = self.__format_hkl(v["hkl_min_row"], "{: 4d} {: 4d} {: 4d}")
+        if v["hkl_max_row"] is not None:
+            self.__hkl_max = self.__format_hkl(v["hkl_max_row"], "{: 4d} {: 4d} {: 4d}")
 
         if n1 > 0:
             self.__logger.pinfo(f"Error: File has ({n1}) reflections with wrong indices.", self.__pinfo_value)
@@ -751,6 +520,66 @@ class CheckSfFile:
 
         return
 
+    def __reflection_stats(self, nblock, rcell):
+        """
+        Computes the reflection statistics of a block.
+
+        Args:
+            nblock: The block number.
+            rcell: The reciprocal cell, or None to skip resolution based statistics.
+
+        Returns:
+            ReflnStats: The statistics.
+        """
+        table = self.__sf_file.get_reflection_table("refln", nblock)
+
+        unmerged = None
+        if self.__unmerge_i:
+            unmerged = (self.__sf_file.get_reflection_table("diffrn_refln", nblock), self.__column_attrs["unmerge_i"])
+
+        stats = ReflnStats(table, self.__column_attrs, unmerged)
+        stats.compute(ReciprocalMetric(rcell) if rcell else None)
+        return stats
+
+    def __format_hkl(self, i, fmt="HKL={:4d} {:4d} {:4d}"):
+        """Formats the Miller indices of reflection i"""
+        return fmt.format(int(self.__H[i]), int(self.__K[i]), int(self.__L[i]))
+
+    def __report_reflection_events(self, stats):
+        """
+        Reports the first reflection with each problem, in file order.
+
+        Args:
+            stats: The ReflnStats of the block.
+
+        Raises:
+            ValueError: For a reflection with F squared but no sigma of F squared, or with values of
+                F squared that are not numbers - the block cannot be checked.
+        """
+        for i, event in stats.get_events():
+            if event == "invalid_miller":
+                self.__logger.pinfo(f"Error: Miller indices are not integral ({self.__H[i]}, {self.__K[i]}, {self.__L[i]})", self.__pinfo_value)
+                continue
+
+            hkl = self.__format_hkl(i)
+            if event == "wrong_indices":
+                self.__logger.pinfo(f"Error: File has wrong indices ({hkl}).", self.__pinfo_value)
+            elif event == "negative_fplus":
+                self.__logger.pinfo(f"Error: File has negative amplitude (F+: {self.__F_plus[i]}) for ({hkl}).", self.__pinfo_value)
+            elif event == "missing_sf2":
+                raise ValueError(f"File has F squared without its sigma for ({hkl}) (data block= {self.__sf_block.getName()}).")
+            elif event == "negative_fo":
+                self.__logger.pinfo(f"Error: File has negative amplitude (Fo: {self.__Fo_au[i]}) for ({hkl}).", self.__pinfo_value)
+            elif event == "bad_f2":
+                values = self.__F2o[i] if self.__sF2o is None else f"{self.__F2o[i]}, {self.__sF2o[i]}"
+                raise ValueError(f"File has values of F squared that are not numbers ({values}) for ({hkl}) (data block= {self.__sf_block.getName()}).")
+            elif event == "bad_fom":
+                self.__logger.pinfo(f"Warning: File has wrong values of FOM ({self.__fom[i]}) for ({hkl}).", self.__pinfo_value)
+            elif event == "bad_phase_c":
+                self.__logger.pinfo(f"Warning: File has wrong values of phase ({self.__phase_c[i]}) for ({hkl}).", self.__pinfo_value)
+            elif event == "bad_phase_o":
+                self.__logger.pinfo(f"Warning: File has wrong values of phase ({self.__phase_o[i]}) for ({hkl}).", self.__pinfo_value)
+
     def __other_to_f(self, i):
         """
         Converts other columns to F and Fs values.
@@ -876,11 +705,24 @@ class CheckSfFile:
 
         self.__sf_block = self.__sf_file.get_block_by_index(nblock)
         self.__initialize_data()
+        self.__write_sf_4_validation(file_path, nblock)
+
+    @profiled("write_sf_4_validation")
+    def __write_sf_4_validation(self, file_path, nblock):
+        """
+        Writes the SF file for validation from the data already initialized for the block.
+
+        Args:
+            file_path: The output file.
+            nblock: The block number.
 
+        Returns:
+            None
+        """
         myDataList = []
         curContainer = DataContainer("cif2cif")
 
-        nf, i, ah, ak, al = 0, 0, 0, 0, 0
+        nf, i = 0, 0
         F, Fs, sig = 0.0, 0.0, 0.01
         resol, i_sigi, af, afs = 0.0, 0.0, 0.0, 0.0
 
@@ -890,6 +732,24 @@ class CheckSfFile:
 
         # If pdb cell provided use it
         rcell, CELL = self.__calc_cell_and_recip(override=True)
+        # Use the arrays of the block - shared with the statistics if already computed
+        rows = range(n)
+        resolution = None
+        valid = [False] * n
+        i_over_si = has_i_over_si = None
+        table = self.__sf_file.get_reflection_table("refln", nblock)
+        if table is not None:
+            if table.get_indices() is not None:
+                valid = table.get_indices()[3]
+                if rcell:
+                    resolution = table.get_resolution(ReciprocalMetric(rcell))
+            if self.__status:
+                rows = np.flatnonzero(table.get_code_mask(self.__column_attrs["status"], lambda s: s in ("o", "f"))).tolist()
+            if self.__Io and self.__sIo:
+                sio = table.get_float_column(self.__column_attrs["sIo"])
+                has_i_over_si = table.get_numeric_mask(self.__column_attrs["Io"]) & table.get_numeric_mask(self.__column_attrs["sIo"]) & (sio > 0)
+                with np.errstate(all="ignore"):
+                    i_over_si = table.get_float_column(self.__column_attrs["Io"]) / sio
 
         # Add spacegroup.  Override with coordinate file if set
         if CELL and CELL[0] > 2 and CELL[4] > 2:
@@ -958,14 +818,9 @@ class CheckSfFile:
         fp = "?"
         sigfp = "?"
 
-        for i in range(n):
-
-            if self.__status:
-                if self.__status[i] != "o" and self.__status[i] != "f":
-                    continue
-                flag = self.__status[i]
-            else:
-                flag = "o"
+        for i in rows:
+            # Only reflections with status "o" or "f"
+            flag = self.__status[i] if self.__status else "o"
 
             if self.__Fo_au:
                 fp = self.__Fo_au[i]
@@ -1001,21 +856,17 @@ class CheckSfFile:
             elif self.__F2o:
                 fp, sigfp = self.__i_to_f(i, self.__F2o[i], self.__sF2o, sig)
 
-            try:
-                ah = int(self.__H[i])
-                ak = int(self.__K[i])
-                al = int(self.__L[i])
-            except:  # noqa: E722 pylint: disable=bare-except
+            if not valid[i]:
                 # Non integral - reported in check - skip
                 continue
-            if rcell:
-                resol = self.__get_resolution(ah, ak, al, rcell)
+            if resolution is not None:
+                resol = float(resolution[i])
             else:
                 resol = 0.00  # This is stupid but what was done -- should not output
 
             i_sigi = 0.0
-            if self.__Io and self.__sIo and self.__is_float(self.__sIo[i]) and self.__is_float(self.__Io[i]) and float(self.__sIo[i]) > 0:
-                i_sigi = float(self.__Io[i]) / float(self.__sIo[i])
+            if has_i_over_si is not None and has_i_over_si[i]:
+                i_sigi = float(i_over_si[i])
             else:
                 af = self.__float_or_zero(fp)
                 afs = self.__float_or_zero(sigfp)
@@ -1050,6 +901,7 @@ class CheckSfFile:
 
         # print("\nNumber of reflections for validation set = %d" % nf)
 
+    @profiled()
     def check_sf_all_blocks(self, n):
         """
         Checks the SF file for all blocks.
@@ -1063,6 +915,7 @@ class CheckSfFile:
         for i in range(n):
             self.__check_sf(i)
 
+    @profiled()
     def sf_stat(self, fname, sf4name=None):
         """Produces statistics"""
 
@@ -1074,7 +927,8 @@ class CheckSfFile:
         for blkid in range(numblocks):
             self.__check_sf(blkid)
             if sf4name and blkid == 0:
-                self.write_sf_4_validation(sf4name, blkid)
+                # The block was just initialized by the check - write from the same data
+                self.__write_sf_4_validation(sf4name, blkid)
 
     def __is_float(self, value):
         try:
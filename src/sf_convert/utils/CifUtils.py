@@ -1,6 +1,17 @@
+import operator
+
 from mmcif.api.DataCategory import DataCategory
 
 
+def _orderedAttributes(attl_in, attrList):
+    """Returns attl_in with the attributes of attrList that are present first, in that order"""
+    present = set(attl_in)
+    newlist = [att for att in dict.fromkeys(attrList) if att in present]
+    used = set(newlist)
+    newlist.extend(att for att in attl_in if att not in used)
+    return newlist
+
+
 def reorderCategoryAttr(cobjIn, attrList=None):
     """
     Returns a new category with the attribute list reordered.
@@ -12,31 +23,120 @@ def reorderCategoryAttr(cobjIn, attrList=None):
     Returns:
         DataCategory: The new category with the reordered attributes.
     """
+    newcat = DataCategory(cobjIn.getName(), cobjIn.getAttributeList(), cobjIn.data, copyInputData=True)
+    permuteCategoryAttr(newcat, attrList)
+    return newcat
+
+
+def permuteCategoryAttr(cobjIn, attrList=None):
+    """
+    Reorders the attributes of a category in place.
+
+    Only the attribute list and the order of the values within each row change - no row is copied.
+
+    Args:
+        cobjIn (DataCategory): The category object.
+        attrList (list, optional): The desired order of attribute names. Attributes not listed follow, in their current order. Defaults to None.
+
+    Returns:
+        bool: True if the order changed.
+    """
     if attrList is None:
         attrList = []
 
-    name_in = cobjIn.getName()
     attl_in = cobjIn.getAttributeList()
+    newlist = _orderedAttributes(attl_in, attrList)
+    if newlist == attl_in:
+        return False
 
-    d_in = []
-    for row in range(cobjIn.getRowCount()):
-        d = cobjIn.getRowAttributeDict(row)
-        d_in.append(d)
+    natt = len(attl_in)
+    position = {att: idx for idx, att in enumerate(attl_in)}
+    getter = operator.itemgetter(*[position[att] for att in newlist])
+    for row in cobjIn.data:
+        if len(row) < natt:
+            # Short rows - missing values are None, as when built from a dictionary
+            row.extend([None] * (natt - len(row)))
+        row[:natt] = getter(row)
 
-    # Create new attribute name list based on what is present.
-    used = {}
-    newlist = []
+    cobjIn.setAttributeNameList(newlist)
+    return True
 
-    for att in attrList:
-        if att in attl_in:
-            newlist.append(att)
-            used[att] = 1
 
-    # Get rest
-    for att in attl_in:
-        if att not in used:
-            newlist.append(att)
+def uniqueRowTuples(cobjIn, attrList):
+    """
+    Returns the distinct combinations of values of attributes, in the order they first appear.
+
+    Args:
+        cobjIn (DataCategory): The input category object.
+        attrList (list): The attribute names.
 
-    newcat = DataCategory(name_in, newlist, d_in, copyInputData=True)
+    Returns:
+        dict: Maps each distinct tuple of values to the first row holding it, or None if an attribute is missing.
+    """
+    indices = [cobjIn.getAttributeIndex(att) for att in attrList]
+    if any(idx < 0 for idx in indices):
+        return None
 
-    return newcat
+    unique = {}
+    for row, key in enumerate(zip(*[cobjIn.getColumn(idx) for idx in indices])):
+        unique.setdefault(key, row)
+    return unique
+
+
+def replaceColumn(cobjIn, attr, values):
+    """
+    Replaces the values of an attribute in place.
+
+    Args:
+        cobjIn (DataCategory): The category object.
+        attr (str): The attribute name.
+        values (list): The new values, one per row.
+
+    Returns:
+        bool: False if the attribute is missing or the number of values is wrong.
+    """
+    idx = cobjIn.getAttributeIndex(attr)
+    if idx < 0 or len(values) != cobjIn.getRowCount():
+        return False
+
+    for row, value in zip(cobjIn.data, values):
+        row[idx] = value
+    return True
+
+
+def updateCategoryRows(cobjIn, newAttrs=None, replacements=None):
+    """
+    Appends attributes and replaces values of a category in one pass over its rows.
+
+    Args:
+        cobjIn (DataCategory): The category object.
+        newAttrs (list, optional): (attribute, value) pairs.  Attributes not in the category are added, with the value in every row.
+        replacements (dict, optional): Attribute to {old value: new value}.  Attributes not in the category are ignored.
+
+    Returns:
+        int: The number of values replaced.
+    """
+    extend = []
+    for att, value in newAttrs or []:
+        if att in cobjIn.getAttributeList():
+            continue
+        natt = cobjIn.getAttributeCount()
+        # Only renames an attribute that differs in case - as appendAttributeExtendRows()
+        cobjIn.appendAttribute(att)
+        if cobjIn.getAttributeCount() > natt:
+            extend.append(value)
+
+    rules = [(cobjIn.getAttributeIndex(att), mapping) for att, mapping in (replacements or {}).items() if att in cobjIn.getAttributeList()]
+    if not extend and not rules:
+        return 0
+
+    num_replaced = 0
+    for row in cobjIn.data:
+        if extend:
+            row.extend(extend)
+        for idx, mapping in rules:
+            value = mapping.get(row[idx])
+            if value is not None:
+                row[idx] = value
+                num_replaced += 1
+    return num_replaced
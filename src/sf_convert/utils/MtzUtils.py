@@ -1,9 +1,44 @@
 # pylint: disable=E1101
+import functools
+import os
+
 import gemmi
 
 import numpy as np
 
 
+def read_mtz_file(fpath):
+    """
+    Reads an MTZ file - each file is parsed only once per process.
+
+    The parsed file is shared by all callers and must not be modified.  A file that has since
+    changed on disk (modification time or size) is read again.
+
+    Args:
+        fpath (str): The path to the MTZ file.
+
+    Returns:
+        gemmi.Mtz: The MTZ file.
+    """
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        # Let gemmi report the error
+        return gemmi.read_mtz_file(fpath)
+    return _read_mtz_file_cached(os.path.abspath(fpath), st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=4)
+def _read_mtz_file_cached(fpath, mtime_ns, size):  # pylint: disable=unused-argument
+    """Reads an MTZ file - modification time and size are part of the cache key"""
+    return gemmi.read_mtz_file(fpath)
+
+
+def clear_mtz_cache():
+    """Forgets the MTZ files parsed so far - i.e. between jobs of a long lived process, or to time parsing again"""
+    _read_mtz_file_cached.cache_clear()
+
+
 class GetMtzInfo:
     """Class to extract information for an MTZ file"""
 
@@ -11,7 +46,7 @@ class GetMtzInfo:
         self.__mtz = None
 
     def readmtz(self, fpath):
-        self.__mtz = gemmi.read_mtz_file(fpath)
+        self.__mtz = read_mtz_file(fpath)
 
     def get_column_data(self):
         """Returns column info for the datasets.  Not H, K, L are daataset_id 1 and not 0"""
@@ -1,52 +1,75 @@
 # Class to convert dictionary to a data file and provide lists of categories
 # and attributes that can be used in files.
 
+import functools
 import os
 import json
 import sys
-
-from mmcif.api.DictionaryApi import DictionaryApi
-from mmcif.io.IoAdapterPy import IoAdapterPy as IoAdapter
+import types
+
+DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "dictdata.json"))
+
+# pdbx_powder_data not in dictionary -- will accept anyways
+CATEGORIES = (
+    "audit",
+    "audit_conform",
+    "cell",
+    "diffrn",
+    "diffrn_measurement",
+    "diffrn_orient_matrix",
+    "diffrn_radiation",
+    "diffrn_radiation_wavelength",
+    "diffrn_refln",
+    "diffrn_reflns",
+    "diffrn_scale_group",
+    "diffrn_standard_refln",
+    "entry",
+    "exptl_crystal",
+    "pdbx_audit_conform",
+    "pdbx_exptl_crystal_cryo_treatment",
+    "pdbx_powder_data",
+    "pdbx_refln_signal_binning",
+    "refine",
+    "refln",
+    "reflns",
+    "reflns_scale",
+    "reflns_shell",
+    "software",
+    "symmetry",
+    "symmetry_equiv",
+)
+
+ALLOWED_CATEGORIES = frozenset(CATEGORIES)
+
+
+@functools.lru_cache(maxsize=None)
+def load_allowed_attributes(path=DATA_PATH):
+    """
+    Reads the attributes allowed in each category.  The file is read once per process.
+
+    Args:
+        path (str, optional): The json file written by createDataDictionary. Defaults to the one in the package.
+
+    Returns:
+        MappingProxyType: Read only mapping of category to a frozenset of attribute names.
+    """
+    with open(path, "r") as fin:
+        data = json.load(fin)
+
+    return types.MappingProxyType({cat: frozenset(attrs) for cat, attrs in data.items() if isinstance(attrs, list)})
 
 
 class DictFilter:
     def __init__(self):
-        self.__dataPath = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "dictdata.json"))
-
-        # pdbx_powder_data not in dictionary -- will accept anyways
-        self.__categories = [
-            "audit",
-            "audit_conform",
-            "cell",
-            "diffrn",
-            "diffrn_measurement",
-            "diffrn_orient_matrix",
-            "diffrn_radiation",
-            "diffrn_radiation_wavelength",
-            "diffrn_refln",
-            "diffrn_reflns",
-            "diffrn_scale_group",
-            "diffrn_standard_refln",
-            "entry",
-            "exptl_crystal",
-            "pdbx_audit_conform",
-            "pdbx_exptl_crystal_cryo_treatment",
-            "pdbx_powder_data",
-            "pdbx_refln_signal_binning",
-            "refine",
-            "refln",
-            "reflns",
-            "reflns_scale",
-            "reflns_shell",
-            "software",
-            "symmetry",
-            "symmetry_equiv",
-        ]
-
+        self.__dataPath = DATA_PATH
+        self.__categories = CATEGORIES
         self.__datadict = None
 
     def createDataDictionary(self, dictPath):
         """Loads dictionary, extracts categories and stores json file"""
+        # Only needed to regenerate dictdata.json - the Python reader pulls in requests
+        from mmcif.api.DictionaryApi import DictionaryApi
+        from mmcif.io.IoAdapterPy import IoAdapterPy as IoAdapter
 
         myIo = IoAdapter(raiseExceptions=True)
         cList = myIo.readFile(inputFilePath=dictPath)
@@ -63,15 +86,20 @@ class DictFilter:
         with open(self.__dataPath, "w") as fout:
             json.dump(data, fout, indent=4)
 
+        # Do not serve the previous contents
+        load_allowed_attributes.cache_clear()
+
     def loadDataDictionary(self):
-        with open(self.__dataPath, "r") as fin:
-            self.__datadict = json.load(fin)
+        """Loads the allowed attributes - shared by all instances in the process"""
+        self.__datadict = load_allowed_attributes(self.__dataPath)
 
     def getAllowedCats(self):
-        return self.__categories
+        return ALLOWED_CATEGORIES
 
     def getAllowedAttrs(self, cat):
-        """Return allowed list.  If not present - all attributes allowed for now"""
+        """Return allowed set.  If not present - all attributes allowed for now"""
+        if self.__datadict is None:
+            self.loadDataDictionary()
         return self.__datadict.get(cat, None)
 
 
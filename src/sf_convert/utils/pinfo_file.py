@@ -56,9 +56,13 @@ class PInfoBase:
 
         self.__output_sf_info(sfinfo)
 
-    def __output_sf_info(self, sfpath):
-        """Outputs sf_info class"""
+    def get_reports(self):
+        """
+        Returns the messages that are written to sf_information.cif.
 
+        Returns:
+            tuple: (str, str) the Warning/Error messages and the information messages, one per line.
+        """
         self._lf1.seek(0)
         self._lf2.seek(0)
 
@@ -67,15 +71,22 @@ class PInfoBase:
             # Leave new lines
             err += ln
 
-        # We expect an 'empty' value returned - legacy code 'cheated'
-        # by two lines with semi colon - but writer simplies to ?
-        # Do not provide data with simply a newline
-
         info = ""
         for ln in self._lf2:
             # Leave new lines
             info += ln
 
+        return err, info
+
+    def __output_sf_info(self, sfpath):
+        """Outputs sf_info class"""
+
+        err, info = self.get_reports()
+
+        # We expect an 'empty' value returned - legacy code 'cheated'
+        # by two lines with semi colon - but writer simplies to ?
+        # Do not provide data with simply a newline
+
         if info == "":
             info = "\n"
 
@@ -0,0 +1,183 @@
+# Opt-in timing of the stages of a conversion.
+#
+# Stages are marked with profiler.stage("name") or the @profiled() decorator, and cost a flag
+# test unless the profiler is enabled (sf_convert -profile, or the SF_CONVERT_PROFILE
+# environment variable).  Stages nest: a stage started inside another is named "outer/inner".
+
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows - peak RSS is reported as None
+    resource = None
+
+# Environment variables enabling the profiler - the value is the file to write
+PROFILE_ENV = "SF_CONVERT_PROFILE"
+PSTATS_ENV = "SF_CONVERT_PSTATS"
+
+
+class Profiler:
+    """Records wall time, CPU time and peak RSS for each stage"""
+
+    def __init__(self):
+        self.__enabled = False
+        self.__records = []
+        self.__stack = []
+        self.__cprofile = None
+        self.__start = None
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    def enable(self, cprofile=False):
+        """
+        Starts recording.  Previous records are discarded.
+
+        Args:
+            cprofile (bool, optional): Also runs cProfile, for dump_stats().
+        """
+        self.__records = []
+        self.__stack = []
+        self.__start = (time.perf_counter(), time.process_time())
+        self.__enabled = True
+        # No statistics from an earlier run are kept
+        if self.__cprofile is not None:
+            self.__cprofile.disable()
+            self.__cprofile = None
+        if cprofile:
+            self.__cprofile = cProfile.Profile()
+            self.__cprofile.enable()
+
+    def disable(self):
+        """Stops recording - the records are kept for report()"""
+        self.__enabled = False
+        if self.__cprofile is not None:
+            self.__cprofile.disable()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Records a stage.
+
+        Args:
+            name (str): The name of the stage.
+
+        Yields:
+            dict: The record of the stage - "wall", "cpu" and peak RSS are set when the stage ends.  None if not enabled.
+        """
+        if not self.__enabled:
+            yield None
+            return
+
+        self.__stack.append(name)
+        record = {"stage": "/".join(self.__stack), "depth": len(self.__stack) - 1}
+        # Stages are listed in the order they start
+        self.__records.append(record)
+        rss = self.__maxrss()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall"] = time.perf_counter() - wall
+            record["cpu"] = time.process_time() - cpu
+            record["maxrss_kb"] = self.__maxrss()
+            record["maxrss_growth_kb"] = None if rss is None else record["maxrss_kb"] - rss
+            self.__stack.pop()
+
+    @staticmethod
+    def __maxrss():
+        """Returns the peak resident set size of the process so far, in kB, or None if it cannot be known"""
+        if resource is None:
+            return None
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def report(self):
+        """
+        Returns the records.
+
+        Returns:
+            dict: The stages, in the order they started, with the totals since enable().
+        """
+        total = {}
+        if self.__start is not None:
+            total = {"wall": time.perf_counter() - self.__start[0], "cpu": time.process_time() - self.__start[1], "maxrss_kb": self.__maxrss()}
+        return {"total": total, "stages": [dict(record) for record in self.__records]}
+
+    def write_report(self, path):
+        """
+        Writes the records as JSON.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, "w") as fout:
+            json.dump(self.report(), fout, indent=2)
+
+    def dump_stats(self, path):
+        """
+        Writes the cProfile statistics, which can be read with pstats.
+
+        Args:
+            path (str): The file to write.
+
+        Returns:
+            bool: False if cProfile was not run.
+        """
+        if self.__cprofile is None:
+            return False
+        self.__cprofile.dump_stats(path)
+        return True
+
+
+# Shared by the modules of the process
+PROFILER = Profiler()
+
+
+def stage(name):
+    """Records a stage with the shared profiler - see Profiler.stage()"""
+    return PROFILER.stage(name)
+
+
+def profiled(name=None):
+    """
+    Decorator recording each call of a function as a stage.
+
+    Args:
+        name (str, optional): The name of the stage. Defaults to the function name, without leading underscores.
+    """
+
+    def decorator(func):
+        stage_name = name if name else func.__name__.lstrip("_")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def profile_paths(report=None, pstats=None):
+    """
+    Returns where to write the profile, from the command line or the environment.
+
+    Args:
+        report (str, optional): The JSON report from the command line.
+        pstats (str, optional): The cProfile statistics from the command line.
+
+    Returns:
+        tuple: (str, str) the report and statistics files, None if not wanted.
+    """
+    return report or os.environ.get(PROFILE_ENV) or None, pstats or os.environ.get(PSTATS_ENV) or None
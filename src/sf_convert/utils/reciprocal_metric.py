@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+
+def reciprocal_cell(cell):
+    """
+    Calculates the reciprocal cell.
+
+    Args:
+        cell (list): The cell [a, b, c, alpha, beta, gamma], angles in degrees.
+
+    Returns:
+        list: The reciprocal cell [a*, b*, c*, alpha*, beta*, gamma*], angles in degrees.
+    """
+    rcell = [0.0] * 6
+
+    cosa = math.cos(math.radians(cell[3]))
+    cosb = math.cos(math.radians(cell[4]))
+    cosc = math.cos(math.radians(cell[5]))
+    sina = math.sin(math.radians(cell[3]))
+    sinb = math.sin(math.radians(cell[4]))
+    sinc = math.sin(math.radians(cell[5]))
+
+    v = cell[0] * cell[1] * cell[2] * math.sqrt(1.0 - cosa * cosa - cosb * cosb - cosc * cosc + 2.0 * cosa * cosb * cosc)
+
+    rcell[0] = cell[1] * cell[2] * sina / v
+    rcell[1] = cell[0] * cell[2] * sinb / v
+    rcell[2] = cell[0] * cell[1] * sinc / v
+
+    cosast = (cosb * cosc - cosa) / (sinb * sinc)
+    cosbst = (cosa * cosc - cosb) / (sina * sinc)
+    coscst = (cosa * cosb - cosc) / (sina * sinb)
+
+    rcell[3] = math.acos(cosast) / math.radians(1.0)
+    rcell[4] = math.acos(cosbst) / math.radians(1.0)
+    rcell[5] = math.acos(coscst) / math.radians(1.0)
+
+    return rcell
+
+
+class ReciprocalMetric:
+    """Reciprocal metric of a unit cell, for d-spacing (resolution) of reflections.
+
+    The metric terms are derived once from the reciprocal cell (as returned by
+    CheckSfFile) and applied to whole arrays of Miller indices.
+    """
+
+    def __init__(self, rcell):
+        """
+        Initializes the metric.
+
+        Args:
+            rcell (list): The reciprocal cell [a*, b*, c*, alpha*, beta*, gamma*], angles in degrees.
+        """
+        self.__rcell = tuple(rcell)
+
+        self.__aa1 = 2 * rcell[0] * rcell[1] * math.cos(math.radians(rcell[5]))
+        self.__aa2 = 2 * rcell[0] * rcell[2] * math.cos(math.radians(rcell[4]))
+        self.__aa3 = 2 * rcell[1] * rcell[2] * math.cos(math.radians(rcell[3]))
+
+        self.__a2 = rcell[0] * rcell[0]
+        self.__b2 = rcell[1] * rcell[1]
+        self.__c2 = rcell[2] * rcell[2]
+
+    def get_key(self):
+        """Returns a hashable key identifying the cell"""
+        return self.__rcell
+
+    def get_resolution(self, h, k, l):  # noqa: E741
+        """
+        Calculates the resolution of reflections.
+
+        Args:
+            h (numpy.ndarray): The h indices.
+            k (numpy.ndarray): The k indices.
+            l (numpy.ndarray): The l indices.
+
+        Returns:
+            numpy.ndarray: The resolution (Angstrom), 0 for the origin.
+        """
+        h = np.asarray(h, dtype=np.float64)
+        k = np.asarray(k, dtype=np.float64)
+        l = np.asarray(l, dtype=np.float64)  # noqa: E741
+
+        # Same order of operations as the scalar calculation - results are bit for bit identical
+        dist_sq = h * h * self.__a2 + k * k * self.__b2 + l * l * self.__c2 + h * k * self.__aa1 + h * l * self.__aa2 + k * l * self.__aa3
+        resol = np.zeros(dist_sq.shape, dtype=np.float64)
+        use = dist_sq > 0.0000001
+        resol[use] = 1.0 / np.sqrt(dist_sq[use])
+        return resol
@@ -0,0 +1,358 @@
+import numpy as np
+
+# Resolution window used for the OneDep counts
+RESOH = 0.1
+RESOL = 200
+
+# Resolution shells for the free set report
+NSHELL = 10
+
+# Order of the once-per-file messages for a single reflection, as reported by CheckSfFile
+EVENT_ORDER = ["invalid_miller", "wrong_indices", "negative_fplus", "missing_sf2", "negative_fo", "bad_f2", "bad_fom", "bad_phase_c", "bad_phase_o"]
+
+
+def sequential_sum(values):
+    """
+    Sums values left to right, exactly as a Python loop would.
+
+    numpy's sum() uses pairwise summation which can change the last bits of the result
+    (and therefore the rounding of reported statistics).
+
+    Args:
+        values (numpy.ndarray): The values.
+
+    Returns:
+        float: The sum, or 0 if there are no values.
+    """
+    if values.size == 0:
+        return 0
+    return float(np.cumsum(values)[-1])
+
+
+def running_min(values, start):
+    """Returns min(start, values) ignoring NaN, like a Python loop of "if v < m: m = v" """
+    values = values[values < start]
+    # First occurrence on ties (0.0 and -0.0)
+    return float(values[np.argmin(values)]) if values.size else start
+
+
+def running_max(values, start):
+    """Returns max(start, values) ignoring NaN, like a Python loop of "if v > m: m = v" """
+    values = values[values > start]
+    return float(values[np.argmax(values)]) if values.size else start
+
+
+def first_row(mask):
+    """Returns the index of the first True in mask, or None"""
+    rows = np.flatnonzero(mask)
+    return int(rows[0]) if rows.size else None
+
+
+def free_fraction_by_shell(resolution, used, free, nshell=NSHELL):
+    """
+    Counts the free set in resolution shells of equal reciprocal volume.
+
+    Args:
+        resolution (numpy.ndarray): The resolution of each reflection, 0 if unknown.
+        used (numpy.ndarray): bool array of the reflections to count.
+        free (numpy.ndarray): bool array of the reflections in the free set.
+        nshell (int, optional): The number of shells. Defaults to NSHELL.
+
+    Returns:
+        list: (d_max, d_min, nref, nfree) from low to high resolution, empty if no reflection has a resolution.
+    """
+    use = used & (resolution > 0)
+    if not use.any():
+        return []
+
+    # Shells of equal width in 1/d^3
+    s3 = 1.0 / resolution[use] ** 3
+    smin, smax = float(s3.min()), float(s3.max())
+    width = (smax - smin) / nshell
+    if width > 0:
+        shell = np.minimum(((s3 - smin) / width).astype(np.int64), nshell - 1)
+    else:
+        shell = np.zeros(s3.size, dtype=np.int64)
+    nref = np.bincount(shell, minlength=nshell)
+    nfree = np.bincount(shell, weights=free[use], minlength=nshell).astype(np.int64)
+
+    shells = []
+    for idx in range(nshell):
+        if width > 0:
+            dmax = (smin + idx * width) ** (-1.0 / 3.0)
+            dmin = (smin + (idx + 1) * width) ** (-1.0 / 3.0)
+        else:
+            dmax = dmin = smin ** (-1.0 / 3.0)
+        shells.append((dmax, dmin, int(nref[idx]), int(nfree[idx])))
+    return shells
+
+
+class ReflnStats:
+    """Whole-block reflection statistics for CheckSfFile.
+
+    The statistics (and the first reflection triggering each warning) are identical
+    to a row by row traversal of the data, but are computed as array reductions.
+    """
+
+    def __init__(self, table, columns, unmerged=None):
+        """
+        Initializes the statistics.
+
+        Args:
+            table (ReflnTable): The refln category.
+            columns (dict): Role (i.e. "Fo_au", "sIo", "status") to attribute name.  Missing roles are not present.
+            unmerged (tuple, optional): (ReflnTable, attribute name) of the unmerged intensities.
+        """
+        self.__table = table
+        self.__columns = columns
+        self.__unmerged = unmerged
+        self.__nref = table.get_row_count()
+        self.__values = {}
+        self.__events = []
+
+    def get_values(self):
+        """Returns the dictionary of statistics"""
+        return self.__values
+
+    def get_events(self):
+        """
+        Returns the reflections triggering a once-per-file message.
+
+        Returns:
+            list: (row, event) sorted in the order the messages should be reported.
+        """
+        return self.__events
+
+    def __present(self, role):
+        return self.__columns.get(role) is not None
+
+    def __floats(self, role):
+        return self.__table.get_float_column(self.__columns[role])
+
+    def __numeric(self, role):
+        return self.__table.get_numeric_mask(self.__columns[role])
+
+    def __float_or_zero(self, role):
+        return np.where(self.__numeric(role), self.__floats(role), 0.0)
+
+    def __known(self, role):
+        """Rows in which the column is present and not "?" ("." counts as a value)"""
+        if not self.__present(role):
+            return np.zeros(self.__nref, dtype=bool)
+        return ~self.__table.get_value_mask(self.__columns[role], "?")
+
+    def __unmerged_known(self):
+        known = np.zeros(self.__nref, dtype=bool)
+        if self.__unmerged is not None:
+            utable, attr = self.__unmerged
+            umask = ~utable.get_value_mask(attr, "?")
+            nrow = min(self.__nref, umask.size)
+            known[:nrow] = umask[:nrow]
+        return known
+
+    def compute(self, metric=None):
+        """
+        Computes the statistics.
+
+        Args:
+            metric (ReciprocalMetric, optional): The reciprocal metric.  Resolution based statistics are skipped if None.
+
+        Returns:
+            dict: The statistics.
+        """
+        v = self.__values
+        events = {}
+
+        indices = self.__table.get_indices()
+        if indices is None:
+            zeros = np.zeros(self.__nref, dtype=np.int32)
+            indices = (zeros, zeros, zeros, np.zeros(self.__nref, dtype=bool))
+        h, k, l, valid = indices  # noqa: E741
+        events["invalid_miller"] = first_row(~valid)
+
+        known = {role: self.__known(role) for role in ["Fo_au", "Io", "I_plus", "I_minus", "F_plus", "F_minus", "F2o", "Fo"]}
+        has_data = np.logical_or.reduce(list(known.values()) + [self.__unmerged_known()])
+
+        # Reflections that are checked further
+        sel = valid & has_data
+
+        v["min_H"] = running_min(h[valid], 500)
+        v["min_K"] = running_min(k[valid], 500)
+        v["min_L"] = running_min(l[valid], 500)
+        v["max_H"] = running_max(h[valid], -500)
+        v["max_K"] = running_max(k[valid], -500)
+        v["max_L"] = running_max(l[valid], -500)
+        for name in ["min_H", "min_K", "min_L", "max_H", "max_K", "max_L"]:
+            v[name] = int(v[name])
+
+        v["temp_nref"] = int(sel.sum())
+
+        wrong = sel & (((h == 0) & (k == 0) & (l == 0)) | (np.abs(h) > 800) | (np.abs(k) > 800) | (np.abs(l) > 800))
+        v["n1"] = int(wrong.sum())
+        events["wrong_indices"] = first_row(wrong)
+
+        # Sigma identical to the previous reflection (in file order)
+        for role, name in [("sFo_au", "nf_sFo"), ("sIo", "nf_sIo")]:
+            v[name] = 0
+            if self.__present(role):
+                sig = self.__floats(role)
+                v[name] = int((sel[1:] & (sig[1:] == sig[:-1])).sum())
+
+        v["n4"] = v["nfpairF"] = v["nfpairI"] = 0
+        if self.__present("F_plus"):
+            fplus = sel & self.__numeric("F_plus")
+            v["nfpairF"] = int(fplus.sum())
+            negative = fplus & (self.__floats("F_plus") < 0)
+            v["n4"] = int(negative.sum())
+            events["negative_fplus"] = first_row(negative)
+        if self.__present("I_plus"):
+            v["nfpairI"] = int((sel & self.__numeric("I_plus")).sum())
+
+        # Python float semantics - inf and nan propagate silently
+        with np.errstate(all="ignore"):
+            self.__resolution_stats(sel, metric, known, events)
+
+            self.__amplitude_stats(sel, events)
+
+            for role, name, limit in [("fom", "bad_fom", 1.01), ("phase_c", "bad_phase_c", 361.0), ("phase_o", "bad_phase_o", 361.0)]:
+                if self.__present(role):
+                    events[name] = first_row(sel & (np.abs(self.__floats(role)) > limit))
+
+        self.__events = sorted((row, EVENT_ORDER.index(name), name) for name, row in events.items() if row is not None)
+        self.__events = [(row, name) for row, _order, name in self.__events]
+        return v
+
+    def __resolution_stats(self, sel, metric, known, events):
+        """Resolution range, <I/sigI> and the counts within the resolution limits"""
+        v = self.__values
+
+        v["min_R"], v["max_R"] = 900.0, -500.0
+        v["hkl_min_row"] = v["hkl_max_row"] = None
+        v["sum_sigii"] = v["sum_ii"] = v["ii_sigii"] = v["ii_sigii_low"] = 0
+        v["nnii"] = v["nnii_low"] = 0
+        v["ii_sigii_max"] = -90000
+
+        resolution = None if metric is None else self.__table.get_resolution(metric)
+        if resolution is None:
+            resolution = np.zeros(self.__nref, dtype=np.float64)
+        else:
+            rows = np.flatnonzero(sel)
+            if rows.size:
+                res = resolution[rows]
+                imin = int(np.argmin(res))
+                imax = int(np.argmax(res))
+                if res[imin] < v["min_R"]:
+                    v["min_R"] = float(res[imin])
+                    v["hkl_min_row"] = int(rows[imin])
+                if res[imax] > v["max_R"]:
+                    v["max_R"] = float(res[imax])
+                    v["hkl_max_row"] = int(rows[imax])
+
+            # I and sigma(I) - from the first source available for the reflection
+            val = np.zeros(self.__nref, dtype=np.float64)
+            sval = np.zeros(self.__nref, dtype=np.float64)
+            todo = sel.copy()
+            for ival, isig, squared in [("Io", "sIo", False), ("Fo_au", "sFo_au", True), ("F2o", "sF2o", False), ("Fo", "sFo", True)]:
+                # Legacy condition tests sigma(F) for the presence of sigma(F^2)
+                needs = "sFo" if ival == "F2o" else isig
+                if not (self.__present(ival) and self.__present(needs)):
+                    continue
+                if not self.__present(isig):
+                    # Reflection needing the missing sigma(F^2) aborts the check
+                    events["missing_sf2"] = first_row(todo)
+                    break
+                use = todo & self.__known(isig)
+                todo &= ~use
+                fval = self.__float_or_zero(ival)[use]
+                fsig = self.__float_or_zero(isig)[use]
+                if squared:
+                    val[use] = fval * fval
+                    sval[use] = 2 * fval * fsig
+                else:
+                    val[use] = fval
+                    sval[use] = fsig
+
+            use = sel & (sval > 0)
+            ratio = val[use] / sval[use]
+            low = resolution[use] > 7.0
+            v["sum_sigii"] = sequential_sum(sval[use])
+            v["sum_ii"] = sequential_sum(val[use])
+            v["ii_sigii"] = sequential_sum(ratio)
+            v["ii_sigii_low"] = sequential_sum(ratio[low])
+            v["nnii"] = int(use.sum())
+            v["nnii_low"] = int(low.sum())
+            v["ii_sigii_max"] = running_max(ratio, -90000)
+
+        # Counts for OneDep
+        inres = sel & (resolution <= RESOL + 0.01) & (resolution >= RESOH - 0.01)
+        for role, name in [("F_plus", "nfp"), ("F_minus", "nfn"), ("I_plus", "nip"), ("I_minus", "nin")]:
+            v[name] = int((inres & known[role]).sum())
+
+        v["n_obs"] = v["n_free"] = 0
+        if self.__present("status"):
+            observed = inres & np.logical_or.reduce(list(known.values()))
+            attr = self.__columns["status"]
+            work = self.__table.get_code_mask(attr, lambda s: s == "o")
+            free = self.__table.get_code_mask(attr, lambda s: s != "o" and isinstance(s, str) and "f" in s)
+            v["n_obs"] = int((observed & work).sum())
+            v["n_free"] = int((observed & free).sum())
+
+    def __amplitude_stats(self, sel, events):
+        """Ranges and <value/sigma> of F, F^2 and I"""
+        v = self.__values
+
+        v["n5"] = 0
+        v["min_F"], v["max_F"] = 500000.0, -500000.0
+        v["f_over_sf"] = v["sum_f"] = v["sum_sf"] = v["nf_Fo"] = 0
+        if self.__present("Fo_au"):
+            fo = self.__float_or_zero("Fo_au")
+            negative = sel & (fo < 0)
+            v["n5"] = int(negative.sum())
+            events["negative_fo"] = first_row(negative)
+            v["min_F"] = running_min(fo[sel], v["min_F"])
+            v["max_F"] = running_max(fo[sel], v["max_F"])
+
+            if self.__present("sFo_au"):
+                sig = self.__floats("sFo_au")
+                use = sel & self.__numeric("sFo_au") & (sig > 0) & self.__known("sFo_au")
+                v["f_over_sf"] = sequential_sum(fo[use] / sig[use])
+                v["sum_f"] = sequential_sum(fo[use])
+                v["sum_sf"] = sequential_sum(sig[use])
+                v["nf_Fo"] = int(use.sum())
+
+        v["min_F2"], v["max_F2"] = 500000.0, -500000.0
+        v["f2_over_sf2"] = v["sum_f2"] = v["sum_sf2"] = v["nf_F2o"] = 0
+        if self.__present("F2o"):
+            # Values that are not numbers abort the check
+            bad = ~self.__numeric("F2o")
+            if self.__present("sF2o"):
+                bad |= ~self.__numeric("sF2o")
+            events["bad_f2"] = first_row(sel & bad)
+
+            f2 = self.__floats("F2o")
+            v["min_F2"] = running_min(f2[sel], v["min_F2"])
+            v["max_F2"] = running_max(f2[sel], v["max_F2"])
+
+            if self.__present("sF2o"):
+                sig = self.__floats("sF2o")
+                use = sel & (sig > 0) & self.__known("sF2o")
+                v["f2_over_sf2"] = sequential_sum(f2[use] / sig[use])
+                v["sum_f2"] = sequential_sum(f2[use])
+                v["sum_sf2"] = sequential_sum(sig[use])
+                v["nf_F2o"] = int(use.sum())
+
+        v["min_I"], v["max_I"] = 5000000.0, -5000000.0
+        v["i_over_si"] = v["sum_i"] = v["sum_si"] = v["nf_Io"] = 0
+        if self.__present("Io"):
+            has_i = sel & self.__numeric("Io")
+            io = self.__floats("Io")
+            v["min_I"] = running_min(io[has_i], v["min_I"])
+            v["max_I"] = running_max(io[has_i], v["max_I"])
+
+            if self.__present("sIo"):
+                sig = self.__float_or_zero("sIo")
+                use = has_i & (sig > 0) & self.__known("sIo")
+                v["i_over_si"] = sequential_sum(io[use] / sig[use])
+                v["sum_i"] = sequential_sum(io[use])
+                v["sum_si"] = sequential_sum(sig[use])
+                v["nf_Io"] = int(use.sum())
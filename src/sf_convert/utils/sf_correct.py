@@ -2,17 +2,39 @@
 
 import math
 
+import numpy as np
+
 from mmcif.api.DataCategory import DataCategory
 from mmcif.api.PdbxContainers import CifName
 
 from sf_convert.utils.reformat_sfhead import reformat_sfhead, reorder_sf_file
+from sf_convert.utils.CifUtils import replaceColumn, uniqueRowTuples, updateCategoryRows
 from sf_convert.utils.dict_filter import DictFilter
+from sf_convert.utils.profiler import profiled, stage
+from sf_convert.utils.reciprocal_metric import ReciprocalMetric, reciprocal_cell
+from sf_convert.utils.refln_stats import free_fraction_by_shell
+
+
+def needs_categories(*cats):
+    """
+    Decorator marking a correction of handle_standard() as having nothing to do unless a block holds one of cats.
+
+    Args:
+        cats (str): The categories the correction looks at.
+    """
+
+    def decorator(func):
+        func.needs_categories = cats
+        return func
+
+    return decorator
 
 
 class SfCorrect:
     def __init__(self, logger, legacy=True):
         self.__legacy = legacy
         self.__logger = logger
+        self.__rule_timings = {}
         self.__stdorder = [
             "crystal_id",
             "wavelength_id",
@@ -163,6 +185,7 @@ class SfCorrect:
                 blk.append(newObj)
                 self.__logger.pinfo(f"Creating {cat} in nblock={idx}", 0)
 
+    @needs_categories("refln")
     def __instantiate_diffrn_rad_wavelength(self, sffile):
         """Instantiate diffrn_radiation_wavelength if needed.  In case wavelength is not set, but needed for dictionary purposes"""
 
@@ -191,6 +214,7 @@ class SfCorrect:
             blk.append(newObj)
             self.__logger.pinfo(f"Creating {cat} in nblock={idx}", 0)
 
+    @needs_categories("diffrn_refln")
     def __instantiate_diffrn_scale_group(self, sffile):
         """Instantiate diffrn_scale_group needed if dirrn_refln.scale_group_code present."""
 
@@ -219,6 +243,7 @@ class SfCorrect:
             blk.append(newObj)
             self.__logger.pinfo(f"Creating {cat} in nblock={idx}", 0)
 
+    @needs_categories("diffrn_refln")
     def __instantiate_diffrn_standard_refln(self, sffile):
         """Instantiate diffrn_standard_refln if diffrrn_refln.standard_code present."""
 
@@ -240,136 +265,147 @@ class SfCorrect:
 
             # We "assume" diffrn_id is in file.  So far good assumption.
 
-            values = self.__getUniqueTuples(cObj, ["standard_code", "diffrn_id"])
-            if not values:
-                # Error already given
+            unique = uniqueRowTuples(cObj, ["standard_code", "diffrn_id"])
+            if unique is None:
+                self.__logger.pinfo("Missing attribute diffrn_id", 0)
+                continue
+            if not unique:
                 continue
 
-            # Assemble data needed - we need Miller index for code
+            # Assemble data needed - we need Miller index for code, from the first reflection of each
             data = []
-            for v in values:
-                sc = v[0]
-                di = v[1]
-
-                for row in range(cObj.getRowCount()):
-                    if cObj.getValue("standard_code", row) == sc and cObj.getValue("diffrn_id", row) == di:
-                        ah = cObj.getValue("index_h", row)
-                        ak = cObj.getValue("index_k", row)
-                        al = cObj.getValue("index_l", row)
-                        data.append([sc, di, ah, ak, al])
-                        break
+            for (sc, di), row in unique.items():
+                ah = cObj.getValue("index_h", row)
+                ak = cObj.getValue("index_k", row)
+                al = cObj.getValue("index_l", row)
+                data.append([sc, di, ah, ak, al])
 
             newObj = DataCategory(cat, ["code", "diffrn_id", "index_h", "index_k", "index_l"], data)
             blk.append(newObj)
             self.__logger.pinfo(f"Creating {cat} in nblock={idx}", 0)
 
+    @profiled()
     def handle_standard(self, sffile, pdbid):
         """Handles standard operations"""
 
         detail = None
 
-        # for idx in range(sffile.get_number_of_blocks()):
-        #     blk = sffile.get_block_by_index(idx)
-        #     print(blk.printIt())
-
-        self.__update_exptl_crystal(sffile)
-
-        if self.__legacy:
-            self.__remove_similar_refln_attr(sffile)
+        # Corrections in order: (name, correction, further arguments, legacy only).  A correction marked with
+        # needs_categories() is skipped unless a block holds one of its categories - others unless there is a block.
+        rules = [
+            ("update_exptl_crystal", self.__update_exptl_crystal, (), False),
+            ("remove_similar_refln_attr", self.__remove_similar_refln_attr, (), True),
+            # Legacy attributes, empty status and pdbx_r_free_flag - one pass over the rows.  pdbx_audit_conform used here
+            ("update_refln_rows", self.__update_refln_rows, (), False),
+            ("update_reflns_scale", self.__update_reflns_scale, (), False),
+            ("remove_categories", self.__remove_categories, (), True),
+            ("cleanup_symmetry", self.__cleanup_symmetry, (), True),
+            ("ensure_catkeys", self.__ensure_catkeys, (pdbid,), False),
+            ("instantiate_exptl_crystal", self.__instantiate_exptl_crystal, (), False),
+            ("instantiate_entry", self.__instantiate_entry, (pdbid,), False),
+            ("cleanup_audit", self._cleanup_audit, (), False),
+            # pdbx_audit_conform will be removed here
+            ("remove_pdbx_audit_conform", self.__remove_pdbx_audit_conform, (), False),
+            # This reorders categories as well
+            ("reformat_sfhead", reformat_sfhead, (pdbid, self.__logger, detail), False),
+            # Remap category names if duplicates from refln to diffrn_refln.
+            ("remap_unmerged", self.remap_unmerged, (), False),
+            # See if diffrn_scale_group is needed if diffrn_refln.scale_group_code present
+            ("instantiate_diffrn_scale_group", self.__instantiate_diffrn_scale_group, (), False),
+            # See if diffrn_standard_refln is needed if diffrrn_refln.standard_code present
+            ("instantiate_diffrn_standard_refln", self.__instantiate_diffrn_standard_refln, (), False),
+            # Reflns names might have been modified
+            ("handle_reflns", self.__handle_reflns, (), False),
+            # Creates diffrn category if need be....
+            ("handle_diffrn", self.__handle_diffrn, (pdbid, detail), False),
+            # Renames diffrn_radiation to diffrn_radiation__wavelength if needed
+            ("rename_diffrn_radiation", self.__rename_diffrn_radiation, (), False),
+            ("instantiate_diffrn_rad_wavelength", self.__instantiate_diffrn_rad_wavelength, (), False),
+            ("correct_block_names", lambda sf, pdb_id: sf.correct_block_names(pdb_id), (pdbid,), False),
+            # Add status column if missing, truncate pdbx_r_free_flag - one pass over the rows
+            ("normalize_status_free", self.__normalize_status_free, (), False),
+            # In case some blocks need updating
+            ("reorder_refln_all", self.__reorder_refln_all, (), False),
+            ("reorder_symmetry", self.__reorder_symmetry, (), False),
+            # Remove improper attributes
+            ("filter_attributes", self.__filter_attributes, (), False),
+            ("reorder_sf_file", self.__reorder_sf_file, (), False),
+        ]
 
-        if self.__legacy:
-            # pdbx_audit_conform used here
-            self.__handle_legacy_attributes(sffile)
+        for name, rule, args, legacy in rules:
+            if legacy and not self.__legacy:
+                continue
 
-        self.__update_reflns_scale(sffile)
+            timing = self.__rule_timings.setdefault(name, {"calls": 0, "skipped": 0, "wall": 0.0})
+            # Might have removed all data if model file uploaded
+            if not self.__has_categories(sffile, getattr(rule, "needs_categories", ())):
+                timing["skipped"] += 1
+                continue
 
-        if self.__legacy:
-            self.__update_pdbx_r_free_flag(sffile)
+            with stage(name) as record:
+                rule(sffile, *args)
+            timing["calls"] += 1
+            if record is not None:
+                timing["wall"] += record["wall"]
 
-        self.__update_status(sffile)
+    def get_rule_timings(self):
+        """
+        Returns the counters of the corrections run by handle_standard.
 
-        if self.__legacy:
-            self.__remove_categories(sffile)
+        Returns:
+            dict: Correction name to {"calls", "skipped", "wall"}, totals over all calls of handle_standard.  The wall
+                time is that recorded by the profiler, so it only adds up while the profiler is enabled.
+        """
+        return {name: dict(timing) for name, timing in self.__rule_timings.items()}
+
+    @staticmethod
+    def __has_categories(sffile, cats):
+        """Returns True if a block holds one of cats - or if there is a block, for no cats"""
+        nblock = sffile.get_number_of_blocks()
+        if not cats:
+            return nblock > 0
+        return any(sffile.get_block_by_index(idx).exists(cat) for idx in range(nblock) for cat in cats)
+
+    @needs_categories("refln")
+    def __update_refln_rows(self, sffile):
+        """Adds in _refln.crystal_id, refln.wavelength_id and refln.scale_group_code if need be (legacy), sets "?"
+        pdbx_r_free_flag to 0 (legacy) and empty status to x - in one pass over the rows.
+
+        Runs before reformat_sfhead, so columns it renames to status or pdbx_r_free_flag are left as they are.
+        """
 
+        replacements = {"status": {"?": "x", ".": "x"}}
         if self.__legacy:
-            self.__cleanup_symmetry(sffile)
-
-        self.__ensure_catkeys(sffile, pdbid)
-
-        self.__instantiate_exptl_crystal(sffile)
-
-        self.__instantiate_entry(sffile, pdbid)
-
-        self._cleanup_audit(sffile)
-
-        # pdbx_audit_conform will be removed here
-        self.__remove_pdbx_audit_conform(sffile)
-
-        if sffile.get_number_of_blocks() == 0:
-            return
-
-        # This reorders categories as well
-        reformat_sfhead(sffile, pdbid, self.__logger, detail)
-
-        # Remap category names if duplicates from refln to diffrn_refln.
-        self.remap_unmerged(sffile)
-
-        # See if diffrn_scale_group is needed if diffrn_refln.scale_group_code present
-        self.__instantiate_diffrn_scale_group(sffile)
-
-        # See if diffrn_standard_refln is needed if diffrrn_refln.standard_code present
-        self.__instantiate_diffrn_standard_refln(sffile)
-
-        # Might have removed all data if model file uploaded
-        if sffile.get_number_of_blocks() == 0:
-            return
-
-        # Reflns names might have been modified
-        self.__handle_reflns(sffile)
-
-        # Creates diffrn category if need be....
-        self.__handle_diffrn(sffile, pdbid, details=detail)
-
-        # Renames diffrn_radiation to diffrn_radiation__wavelength if needed
-        self.__rename_diffrn_radiation(sffile)
-
-        self.__instantiate_diffrn_rad_wavelength(sffile)
-
-        sffile.correct_block_names(pdbid)
-
-        # Add status column if missing
-        self.__instantiate_refln_status(sffile)
-
-        # In case some blocks need updating
-        self.__reorder_refln_all(sffile)
-
-        self.__reorder_symmetry(sffile)
-
-        self.__ensure_pdbx_r_free_flag_int(sffile)
-
-        # Remove improper attributes
-        self.__filter_attributes(sffile)
-
-        self.__reorder_sf_file(sffile)
-
-    def __handle_legacy_attributes(self, sffile):
-        """Adds in _refln.crystal_id, refln.wavelength_id and refln.scale_group_code if need be"""
+            # Old sf_convert used to use atoi(value) -- for "?" this converts to 0.  Luckily appears only for map coefficients
+            replacements["pdbx_r_free_flag"] = {"?": "0"}
 
         for idx in range(sffile.get_number_of_blocks()):
             blk = sffile.get_block_by_index(idx)
 
-            # For new data coming from staraniso, these attributes are not added
-            if "pdbx_audit_conform" in blk.getObjNameList():
-                continue
-
             cObj = blk.getObj("refln")
             if not cObj:
                 continue
 
-            for attr in ["crystal_id", "wavelength_id", "scale_group_code"]:
-                if attr not in cObj.getAttributeList():
-                    cObj.appendAttributeExtendRows(attr, "1")
-
+            newAttrs = []
+            # For new data coming from staraniso, these attributes are not added
+            if self.__legacy and "pdbx_audit_conform" not in blk.getObjNameList():
+                newAttrs = [(attr, "1") for attr in ["crystal_id", "wavelength_id", "scale_group_code"]]
+
+            # Only values in the columns need a look up per row
+            table = sffile.get_reflection_table("refln", idx)
+            present = {}
+            for attr, mapping in replacements.items():
+                if attr in cObj.getAttributeList():
+                    labels = table.get_code_column(attr)[1]
+                    mapping = {old: new for old, new in mapping.items() if old in labels}
+                    if mapping:
+                        present[attr] = mapping
+
+            if newAttrs or present:
+                updateCategoryRows(cObj, newAttrs, present)
+                sffile.invalidate_reflection_tables(cObj)
+
+    @needs_categories("refln")
     def __remove_similar_refln_attr(self, sffile):
         """Remove common "similar" columns"""
 
@@ -393,6 +429,7 @@ class SfCorrect:
                     cObj.removeAttribute(r2[0])
                     cObj.removeAttribute(r2[1])
 
+    @needs_categories("refln")
     def __update_reflns_scale(self, sffile):
         """If reflns_scale missing in datablock add if needed"""
 
@@ -416,38 +453,7 @@ class SfCorrect:
                 newObj = DataCategory(cat, ["group_code"], data)
                 blk.append(newObj)
 
-    def __update_pdbx_r_free_flag(self, sffile):
-        """Old sf_convert used to use atoi(value) -- for "?" this converts to 0.  Luckily appears only for map coefficients"""
-        for idx in range(sffile.get_number_of_blocks()):
-            blk = sffile.get_block_by_index(idx)
-
-            if "refln" not in blk.getObjNameList():
-                continue
-
-            cObj = blk.getObj("refln")
-            if cObj is None:
-                continue  # should never happen
-
-            if "pdbx_r_free_flag" in cObj.getAttributeList():
-                cObj.replaceValue("?", "0", "pdbx_r_free_flag")
-
-    def __update_status(self, sffile):
-        """Old sf_convert used to use assume empty data is x."""
-
-        for idx in range(sffile.get_number_of_blocks()):
-            blk = sffile.get_block_by_index(idx)
-
-            if "refln" not in blk.getObjNameList():
-                continue
-
-            cObj = blk.getObj("refln")
-            if cObj is None:
-                continue  # should never happen
-
-            if "status" in cObj.getAttributeList():
-                cObj.replaceValue("?", "x", "status")
-                cObj.replaceValue(".", "x", "status")
-
+    @needs_categories("space_group", "space_group_symop")
     def __remove_categories(self, sffile):
         """Backwards compatibility - remove some categories"""
 
@@ -459,10 +465,12 @@ class SfCorrect:
                 if cat in blk.getObjNameList():
                     blk.remove(cat)
 
+    @profiled()
     def ensure_catkeys(self, sffile, pdbid):
         """Fix entry_id in categories - public"""
         self.__ensure_catkeys(sffile, pdbid)
 
+    @needs_categories("cell", "symmetry")
     def __ensure_catkeys(self, sffile, pdbid):
         """Sometimes categories come in without the entry_id.  Add"""
 
@@ -479,6 +487,7 @@ class SfCorrect:
                         # entry_id first in category
                         sffile.reorder_category_attributes(cat, ["entry_id"], blk.getName())
 
+    @needs_categories("refln")
     def __instantiate_exptl_crystal(self, sffile):
         """If refln.crystal_id is present, exptl_crystal must be present"""
 
@@ -509,6 +518,7 @@ class SfCorrect:
                 newObj = DataCategory("entry", ["id"], [[pdb_id]])
                 blk.append(newObj)
 
+    @needs_categories("symmetry")
     def __cleanup_symmetry(self, sffile):
         """If symmetry is present, we only allow entry_id and space_group_name_H-M"""
 
@@ -624,6 +634,7 @@ class SfCorrect:
 
             sffile.reorder_category_attributes("diffrn", ["id", "crystal_id", "ambient_temp", "crystal_treatment", "details"], blk.getName())
 
+    @needs_categories("audit")
     def _cleanup_audit(self, sffile):
         """Cleanup audit records that should not be present
 
@@ -656,6 +667,7 @@ class SfCorrect:
 
         return upd
 
+    @needs_categories("pdbx_audit_conform")
     def __remove_pdbx_audit_conform(self, sffile):
         """Remove pdbx_audit_conform from final file
 
@@ -677,6 +689,7 @@ class SfCorrect:
 
                 blk = sffile.get_block_by_index(0)
 
+    @needs_categories("reflns", "diffrn_reflns")
     def __handle_reflns(self, sffile):
         """Handles reflns and diffrn_reflns data
 
@@ -758,10 +771,12 @@ class SfCorrect:
         """Reorders sf_file"""
         reorder_sf_file(sffile)
 
+    @profiled()
     def reorder_sf_file(self, sffile):
         """Reorders sf_file"""
         self.__reorder_sf_file(sffile)
 
+    @needs_categories("exptl_crystal")
     def __update_exptl_crystal(self, sf_file):
         """If exptl_crystal present, remove everything but id
 
@@ -792,6 +807,7 @@ class SfCorrect:
 
         return modified
 
+    @needs_categories("refln")
     def __reorder_refln_all(self, sffile):
         """Reorders refln category for all blocks"""
         for idx in range(sffile.get_number_of_blocks()):
@@ -803,6 +819,7 @@ class SfCorrect:
 
             sffile.reorder_category_attributes("refln", self.__stdorder, blk.getName())
 
+    @needs_categories("symmetry")
     def __reorder_symmetry(self, sffile):
         """Reorders symmetry category for all blocks"""
         for idx in range(sffile.get_number_of_blocks()):
@@ -912,37 +929,26 @@ class SfCorrect:
             for rem in remove:
                 sffile.remove_block(rem)
 
-    def __check_hkl_duplcate(self, blk, blkname):
-        """Provides a count of duplicate HKL.  Report first four, return count"""
-
-        # Note for those who wonder.  Using a dictionary is a little faster than set() and must faster than using a list()
-        ndup = 0
+    @profiled()
+    def __check_hkl_duplcate(self, sffile, block_index, blkname):
+        """Provides a count of duplicate HKL.  Report first five, return count"""
 
-        cObj = blk.getObj("refln")
-        if not cObj:
-            return ndup
+        table = sffile.get_reflection_table("refln", block_index)
+        if table is None:
+            return 0
 
-        alist = cObj.getAttributeList()
-        for attr in ("index_h", "index_k", "index_l"):
-            if attr not in alist:
-                return ndup
+        dups = table.get_duplicate_rows()
+        if dups is None:
+            return 0
 
-        ref = {}
-        for idx in range(cObj.getRowCount()):
-            ah = cObj.getValue("index_h", idx)
-            ak = cObj.getValue("index_k", idx)
-            al = cObj.getValue("index_l", idx)
+        columns = [table.get_raw_column(attr) for attr in ("index_h", "index_k", "index_l")]
+        for idx in dups[:5].tolist():
+            ah, ak, al = (col[idx] for col in columns)
+            self.__logger.pinfo(f"Warning: Duplicated H,K,L ({ah}, {ak}, {al}) (data block={blkname}).", 0)
 
-            key = (ah, ak, al)
-            if key in ref:
-                if ndup <= 4:
-                    self.__logger.pinfo(f"Warning: Duplicated H,K,L ({ah}, {ak}, {al}) (data block={blkname}).", 0)
-                ndup += 1
-            else:
-                ref[key] = True
-
-        return ndup
+        return len(dups)
 
+    @needs_categories("refln")
     def remap_unmerged(self, sffile):
         """Map refln to diffrn_refln"""
 
@@ -950,7 +956,7 @@ class SfCorrect:
             blk = sffile.get_block_by_index(block_index)
             blkname = blk.getName()
 
-            ndup = self.__check_hkl_duplcate(blk, blkname)
+            ndup = self.__check_hkl_duplcate(sffile, block_index, blkname)
 
             cObj = blk.getObj("refln")
             if not cObj:
@@ -1162,71 +1168,7 @@ class SfCorrect:
                     if attr in cObj.getAttributeList():
                         self.__logger.pinfo(f"Warning: Block {blkname} has unwanted CIF item ({chk})", 0)
 
-    def __getUniqueTuples(self, cObj, attL):
-        """Returns unique tuples of attributes"""
-
-        tempD = None
-        for att in attL:
-            idx = cObj.getAttributeIndex(att)
-            if idx < 0:
-                self.__logger.info(f"Missing attribute {att}", 0)
-                return None
-            newD = cObj.getColumn(idx)
-            if tempD is None:
-                tempD = newD
-            else:
-                tempD = tuple(zip(tempD, newD))
-
-        # Unique values
-        rD = []
-        for tup in tempD:
-            if tup not in rD:
-                rD.append(tup)
-
-        return rD
-
-    def __ensure_pdbx_r_free_flag_int(self, sffile):
-        """If pdbx_r_free_flag is not an int, warn and truncate"""
-
-        item = "pdbx_r_free_flag"
-
-        for block_index in range(sffile.get_number_of_blocks()):
-            warn = False
-            blk = sffile.get_block_by_index(block_index)
-            blkname = blk.getName()
-
-            cObj = blk.getObj("refln")
-            if not cObj:
-                continue
-
-            if item not in cObj.getAttributeList():
-                continue
-
-            # Faster to get data once - instead of dereferencing item name each time
-            index = cObj.getIndex(item)
-            data = cObj.getColumn(index)
-
-            for idx in range(cObj.getRowCount()):
-                val = data[idx]
-                if val in [".", "?"]:
-                    continue
-
-                bad = False
-                try:
-                    _v = int(val)  # noqa: F841
-                except ValueError:
-                    bad = True
-
-                if bad:
-                    if not warn:
-                        self.__logger.pinfo(f"Warning: In {blkname}, {item} value {val} is not integral -- truncating", 0)
-                        warn = True
-                    try:
-                        newval = str(math.trunc(float(val)))
-                    except ValueError:
-                        newval = val
-                    cObj.setValue(newval, item, idx)
-
+    @needs_categories("diffrn_radiation")
     def __rename_diffrn_radiation(self, sffile):
         """If diffrn_radiation present and diffrn_radiation_wavelength, do a rename"""
 
@@ -1270,6 +1212,7 @@ class SfCorrect:
                 if frm in cObj.getAttributeList():
                     cObj.renameAttributes({frm: dest})
 
+    @profiled()
     def reassign_free(self, sffile, freer):
         """Reassign free R set"""
 
@@ -1294,25 +1237,48 @@ class SfCorrect:
                 self.__logger.pinfo(f"Warning: status not in {cat} in block {blkname} no changes made", 0)
                 continue
 
-            setflag = False
-            for idx in range(cObj.getRowCount()):
-                curstat = cObj.getValue("status", idx)
-                flag = cObj.getValue("pdbx_r_free_flag", idx)
+            # Whole columns at once - statuses other than "o" and "f" are kept
+            table = sffile.get_reflection_table(cat, block_index)
+            keep = table.get_code_mask("status", lambda v: v in ["h", "l", "x", "-", "<"])
+            free = table.get_code_mask("pdbx_r_free_flag", lambda v: v == freer)
+            reassign = ~keep
+            setfree = reassign & free
+
+            # New value per row: 0 "o", 1 "f", else the current status
+            codes, labels = table.get_code_column("status")
+            newcodes = np.where(reassign, setfree.astype(np.int64), codes.astype(np.int64) + 2)
+            newlabels = ["o", "f"] + labels
+            replaceColumn(cObj, "status", [newlabels[code] for code in newcodes.tolist()])
+            sffile.invalidate_reflection_tables(cObj)
+
+            if not setfree.any():
+                self.__logger.pinfo(f"Warning: test set {freer} not in block {blkname} - nothing flagged as test set", 0)
+                continue
 
-                if curstat in ["h", "l", "x", "-", "<"]:
-                    continue
+            self.__report_free_shells(blk, table, reassign, setfree)
 
-                if curstat == "?":
-                    newval = "x"
-                if flag == freer:
-                    newval = "f"
-                    setflag = True
-                else:
-                    newval = "o"
-                cObj.setValue(newval, "status", idx)
+    def __report_free_shells(self, blk, table, used, free):
+        """Reports the fraction of the free set per resolution shell, if the block has a cell"""
 
-            if not setflag:
-                self.__logger.pinfo(f"Warning: test set {freer} not in block {blkname} - nothing flagged as test set", 0)
+        cObj = blk.getObj("cell")
+        if not cObj or table.get_indices() is None:
+            return
+        try:
+            cell = [float(cObj.getValue(attr)) for attr in ["length_a", "length_b", "length_c", "angle_alpha", "angle_beta", "angle_gamma"]]
+            metric = ReciprocalMetric(reciprocal_cell(cell))
+        except (ValueError, TypeError, KeyError, ZeroDivisionError):
+            return
+
+        with np.errstate(all="ignore"):
+            shells = free_fraction_by_shell(table.get_resolution(metric), used & table.get_indices()[3], free)
+        if not shells:
+            return
+
+        self.__logger.pinfo(f"Free set by resolution shell in block {blk.getName()}:", 0)
+        self.__logger.pinfo("    d_max    d_min     nref    nfree  fraction", 0)
+        for dmax, dmin, nref, nfree in shells:
+            fraction = nfree / nref if nref else 0.0
+            self.__logger.pinfo(f"  {dmax:7.2f}  {dmin:7.2f}  {nref:7d}  {nfree:7d}  {fraction:8.4f}", 0)
 
     def set_cell_if_missing(self, sffile, pdbid, cell):
         """If cell is not present, then set"""
@@ -1371,6 +1337,7 @@ class SfCorrect:
 
         df = DictFilter()
         df.loadDataDictionary()
+        allowed = df.getAllowedCats()
 
         for block_index in range(sffile.get_number_of_blocks()):
             blk = sffile.get_block_by_index(block_index)
@@ -1380,7 +1347,6 @@ class SfCorrect:
             # a list that is changing is bad
             nlist = list(blk.getObjNameList())
 
-            allowed = df.getAllowedCats()
             for cat in nlist:
                 if cat not in allowed:
                     self.__logger.pinfo(f"Warning: Category '{cat}' not recognized in {blkname}.  Removing.", 0)
@@ -1404,15 +1370,56 @@ class SfCorrect:
                 if len(cObj.getAttributeList()) == 0:
                     blk.remove(cat)
 
-    def __instantiate_refln_status(self, sffile):
-        """Instantiate _refln.status if missing."""
+    @needs_categories("refln")
+    def __normalize_status_free(self, sffile):
+        """Adds _refln.status (o) if missing and truncates _refln.pdbx_r_free_flag values that are not integral,
+        touching the rows once."""
 
         cat = "refln"
-        for idx in range(sffile.get_number_of_blocks()):
-            blk = sffile.get_block_by_index(idx)
+        item = "pdbx_r_free_flag"
+
+        # Reported as the separate passes did - all additions, then the truncations
+        added = []
+        truncated = []
+        for block_index in range(sffile.get_number_of_blocks()):
+            blk = sffile.get_block_by_index(block_index)
 
             cObj = blk.getObj(cat)
-            if cObj:
-                if "status" not in cObj.getAttributeList():
-                    cObj.appendAttributeExtendRows("status", "o")
-                    self.__logger.pinfo(f"Adding status to {cat} in nblock={idx}", 0)
+            if not cObj:
+                continue
+
+            newAttrs = []
+            replacements = {}
+            if "status" not in cObj.getAttributeList():
+                newAttrs.append(("status", "o"))
+                added.append(f"Adding status to {cat} in nblock={block_index}")
+
+            if item in cObj.getAttributeList():
+                # Rules are applied to the distinct values of the column
+                codes, labels = sffile.get_reflection_table(cat, block_index).get_code_column(item)
+                mapping = {}
+                bad = []
+                for code, label in enumerate(labels):
+                    if label in [".", "?"]:
+                        continue
+                    try:
+                        _v = int(label)  # noqa: F841
+                    except ValueError:
+                        bad.append(code)
+                        try:
+                            mapping[label] = str(math.trunc(float(label)))
+                        except ValueError:
+                            pass
+                if bad:
+                    # First in the file
+                    val = labels[codes[np.flatnonzero(np.isin(codes, bad))[0]]]
+                    truncated.append(f"Warning: In {blk.getName()}, {item} value {val} is not integral -- truncating")
+                replacements[item] = mapping
+
+            replacements = {attr: mapping for attr, mapping in replacements.items() if mapping}
+            if newAttrs or replacements:
+                updateCategoryRows(cObj, newAttrs, replacements)
+                sffile.invalidate_reflection_tables(cObj)
+
+        for msg in added + truncated:
+            self.__logger.pinfo(msg, 0)
@@ -0,0 +1,61 @@
+import json
+import os
+
+from mmcif.io.IoAdapterCore import IoAdapterCore
+from sf_convert.command_line.batch import build_jobs, load_manifest, main
+
+
+class TestBatch:
+    def test_manifest(self, tmp_path):
+        """Tests reading JSON and CSV manifests"""
+        jpath = os.path.join(tmp_path, "jobs.json")
+        with open(jpath, "w") as fout:
+            json.dump({"defaults": {"o": "mmcif"}, "jobs": [{"sf": "a.mtz", "freer": 1}, {"sf": ["b.cns", "c.cns"], "o": "mtz", "id": "b/c"}]}, fout)
+
+        cpath = os.path.join(tmp_path, "jobs.csv")
+        with open(cpath, "w") as fout:
+            fout.write("sf,o,freer,label,valid\n")
+            fout.write("a.mtz,mmcif,1,,\n")
+            fout.write("b.cns c.cns,mtz,,FP=FP,yes\n")
+
+        entries = load_manifest(jpath)
+        assert entries == [{"o": "mmcif", "sf": "a.mtz", "freer": 1}, {"o": "mtz", "sf": ["b.cns", "c.cns"], "id": "b/c"}]
+        assert load_manifest(cpath) == [{"sf": ["a.mtz"], "o": "mmcif", "freer": "1"}, {"sf": ["b.cns", "c.cns"], "o": "mtz", "label": "FP=FP", "valid": True}]
+
+        jobs = build_jobs(entries, "/data", "/out")
+        assert [job["id"] for job in jobs] == ["00000_a.mtz", "b_c"]
+        assert jobs[0]["workdir"] == "/out/00000_a.mtz"
+        assert jobs[0]["argv"] == ["-o", "mmcif", "-sf", "/data/a.mtz", "-out", "/out/00000_a.mtz/a.mtz.mmcif", "-freer", "1", "-diags", "/out/00000_a.mtz/diags.txt"]
+        assert jobs[1]["argv"][:5] == ["-o", "mtz", "-sf", "/data/b.cns", "/data/c.cns"]
+
+    def test_batch(self, tmp_path, cns_5pny_data_path, cif_5pny_coordinate_path):
+        """Tests running conversions in a pool"""
+        manifest = os.path.join(tmp_path, "jobs.json")
+        jobs = [
+            {"id": "5pny", "i": "CNS", "o": "mmcif", "sf": cns_5pny_data_path, "pdb": cif_5pny_coordinate_path, "freer": 1},
+            {"id": "5pny_cns", "i": "CNS", "o": "cns", "sf": cns_5pny_data_path},
+            {"id": "missing", "o": "mmcif", "sf": "does_not_exist.mtz"},
+        ]
+        with open(manifest, "w") as fout:
+            json.dump(jobs, fout)
+
+        outdir = os.path.join(tmp_path, "out")
+        assert main(["-manifest", manifest, "-nproc", "2", "-outdir", outdir]) == 1
+
+        with open(os.path.join(outdir, "batch_report.json"), "r") as fin:
+            report = json.load(fin)
+        assert report["jobs"] == 3 and report["failed"] == 1
+        assert [(res["id"], res["status"]) for res in report["results"]] == [("5pny", "ok"), ("5pny_cns", "ok"), ("missing", "failed")]
+
+        # Each job has its own reports
+        for jobid in ["5pny", "5pny_cns"]:
+            workdir = os.path.join(outdir, jobid)
+            for fname in ["sf_information.cif", "SF_4_validate.cif", "diags.txt", "sf_convert.log"]:
+                assert os.path.exists(os.path.join(workdir, fname))
+
+        blocks = IoAdapterCore().readFile(os.path.join(outdir, "5pny", "5pny-sf.CNS.mmcif"))
+        assert blocks[0].getObj("refln").getRowCount() == 54110
+        assert blocks[0].getObj("cell").getValue("length_a", 0) == "55.418"
+
+        with open(os.path.join(outdir, "missing", "sf_convert.log"), "r") as fin:
+            assert "does_not_exist.mtz" in fin.read()
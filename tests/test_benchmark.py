@@ -0,0 +1,60 @@
+# pylint: disable=E1101
+import json
+import os
+
+import gemmi
+
+from run_benchmarks import STAGES, main, parse_nref
+from synthetic import synthetic_file
+from sf_convert.import_dir.import_cns import CnsReflectionReader
+from sf_convert.sffile.sf_file import StructureFactorFile
+
+
+class TestBenchmark:
+    def test_synthetic(self, tmp_path):
+        """Tests the files scaled from the fixtures"""
+        nref = 500
+
+        sffile = StructureFactorFile()
+        sffile.read_file(synthetic_file("mmcif", nref, str(tmp_path)))
+        refln = sffile.get_category_object("refln")
+        assert refln.getRowCount() == nref
+        hkl = set(zip(*[refln.getColumn(refln.getIndex(attr)) for attr in ["index_h", "index_k", "index_l"]]))
+        assert len(hkl) == nref
+        assert sffile.get_category_object("cell").getValue("length_a", 0) == "36.939"
+
+        mtz = gemmi.read_mtz_file(synthetic_file("mtz", nref, str(tmp_path)))
+        assert mtz.nreflections == nref
+        assert len(set(map(tuple, mtz.make_miller_array().tolist()))) == nref
+
+        path = synthetic_file("cns", nref, str(tmp_path))
+        reader = CnsReflectionReader()
+        reader.read_file(path)
+        assert reader.get_number_of_reflections() == nref
+        assert reader.get_column_names() == ["FOBS", "SIGMA"]
+        with open(path, "r") as fin:
+            assert fin.readline().split() == ["NREFlection=", str(nref)]
+
+        # Reused once generated
+        mtime = os.path.getmtime(path)
+        assert synthetic_file("cns", nref, str(tmp_path)) == path
+        assert os.path.getmtime(path) == mtime
+
+    def test_run(self, tmp_path):
+        """Tests the JSON report"""
+        assert parse_nref("native") is None
+        assert parse_nref("1M") == 1000000
+        assert parse_nref("2.5k") == 2500
+
+        out = os.path.join(tmp_path, "bench.json")
+        assert main(["--formats", "cns", "--nref", "native", "300", "--workdir", str(tmp_path), "--json", out]) == 0
+        with open(out, "r") as fin:
+            report = json.load(fin)
+
+        assert report["schema"] == 1
+        assert [res["nref"] for res in report["results"]] == ["native", 300]
+        for res in report["results"]:
+            assert list(res["stages"].keys()) == STAGES
+            for timing in res["stages"].values():
+                assert "error" not in timing
+                assert timing["best"] >= 0
@@ -1,9 +1,12 @@
 import os
 import difflib
 
+from mmcif.api.DataCategory import DataCategory
+from mmcif.api.PdbxContainers import DataContainer
 from sf_convert.sffile.sf_file import StructureFactorFile
+from sf_convert.export_dir import export_cns
 from sf_convert.export_dir.export_cns import ExportCns
-from sf_convert.utils.pinfo_file import PInfoLogger
+from sf_convert.utils.pinfo_file import PInfoLogger, PStreamLogger
 
 
 class TestCifToCnsConversion:
@@ -54,3 +57,59 @@ class TestCifToCnsConversion:
         assert len(differences) == 0, "Files are not the same"
 
         print("Test completed.")
+
+    def test_cif2cns_anomalous(self, tmp_path, monkeypatch):
+        """
+        Tests the records written for Friedel pairs, free set flags and excluded reflections.
+
+        Args:
+            tmp_path: The path to the temporary directory.
+            monkeypatch: Used to write in batches of one reflection.
+
+        Returns:
+            None
+        """
+        attrs = ["index_h", "index_k", "index_l", "status", "pdbx_F_plus", "pdbx_F_plus_sigma", "pdbx_F_minus", "pdbx_F_minus_sigma"]
+        rows = [
+            ["1", "0", "0", "o", "100.0", "4.0", "?", "?"],
+            ["0", "2", "0", "f", "?", "?", "400.0", "20.0"],
+            ["0", "0", "3", "x", "50.0", "5.0", "?", "?"],
+            ["2", "1", "-1", "o", "?", "?", "-9.0", "3.0"],
+        ]
+        block = DataContainer("r1abcsf")
+        block.append(DataCategory("refln", attrs, rows))
+        sffile = StructureFactorFile()
+        sffile.add_block(block)
+
+        expected = [
+            "NREFlection= 4",
+            "ANOMalous=FALSe { equiv. to HERMitian=TRUE}",
+            "DECLare NAME=FOBS            DOMAin=RECIprocal   TYPE=REAL END",
+            "DECLare NAME=SIGMA           DOMAin=RECIprocal   TYPE=REAL END",
+            "DECLare NAME=TEST            DOMAin=RECIprocal   TYPE=INTE END",
+            "DECLare NAME=F+           DOMAin=RECIprocal   TYPE=REAL END",
+            "DECLare NAME=SIGF+        DOMAin=RECIprocal   TYPE=REAL END",
+            "DECLare NAME=F-           DOMAin=RECIprocal   TYPE=REAL END",
+            "DECLare NAME=SIGF-        DOMAin=RECIprocal   TYPE=REAL END",
+            "INDE  1 0 0 FOBS= 100.00 SIGMA= 4.00 TEST= 0",
+            "F+= 100.00 SIGF+= 4.00",
+            "F-= 0.00 SIGF-= 0.00",
+            "INDE  0 2 0 FOBS= 400.00 SIGMA= 20.00 TEST= 1",
+            "F+= 0.00 SIGF+= 0.00",
+            "F-= 400.00 SIGF-= 20.00",
+            "INDE  2 1 -1 FOBS= -4.50 SIGMA= 1.50 TEST= 0",
+            "F+= 0.00 SIGF+= 0.00",
+            "F-= -9.00 SIGF-= 3.00",
+        ]
+
+        for batch_size in [export_cns.WRITE_BATCH_SIZE, 1]:
+            monkeypatch.setattr(export_cns, "WRITE_BATCH_SIZE", batch_size)
+            output_path = os.path.join(tmp_path, "output_%d.CNS" % batch_size)
+            converter = ExportCns(PStreamLogger())
+            converter.set_sf(sffile)
+            converter.write_file(output_path)
+
+            with open(output_path, "r") as file:
+                assert file.read() == "\n".join(expected) + "\n"
+
+        assert converter.get_F_I(1) == (0, 2, 0, 400.0, 20.0, 160000.0, 16000.0)
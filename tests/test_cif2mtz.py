@@ -1,4 +1,10 @@
+# pylint: disable=E1101
 import os
+
+import gemmi
+import numpy as np
+from mmcif.api.DataCategory import DataCategory
+from mmcif.api.PdbxContainers import DataContainer
 from sf_convert.export_dir.export_mtz import ExportMtz
 from sf_convert.sffile.sf_file import StructureFactorFile
 from sf_convert.utils.pinfo_file import PInfoLogger
@@ -35,3 +41,43 @@ class TestCifToMtzConversion:
         assert os.path.getsize(output_path) > 0
 
         print("Test completed.")
+
+    def test_cif2mtz_in_memory(self, tmp_path):
+        """
+        Tests conversion of an in-memory block, which is not written out before conversion.
+
+        Args:
+            tmp_path: The path to the temporary directory.
+
+        Returns:
+            None
+        """
+        output_path = os.path.join(tmp_path, "output.mtz")
+        logger = PInfoLogger("path_to_log1.log", "path_to_log2.log")
+
+        block = DataContainer("r1abcsf")
+        block.append(DataCategory("cell", ["length_a", "length_b", "length_c", "angle_alpha", "angle_beta", "angle_gamma"], [["40.1", "50.2", "60.3", "90", "95.5", "90"]]))
+        block.append(DataCategory("symmetry", ["space_group_name_H-M"], [["P 1 21 1"]]))
+        rows = [
+            ["1", "2", "3", "o", "100.5", "2.5"],
+            ["1", "2", "4", "f", "?", "."],
+            ["1", "2", "5", "x", "1.5(3)", "2"],
+        ]
+        block.append(DataCategory("refln", ["index_h", "index_k", "index_l", "status", "F_meas_au", "F_meas_sigma_au"], rows))
+        sffile = StructureFactorFile()
+        sffile.add_block(block)
+
+        converter = ExportMtz(logger)
+        converter.set_sf(sffile)
+        converter.write_file(output_path)
+
+        mtz = gemmi.read_mtz_file(output_path)
+        assert mtz.spacegroup.hm == "P 1 21 1"
+        assert mtz.title == "Converted from mmCIF block r1abcsf"
+        assert [col.label for col in mtz.columns] == ["H", "K", "L", "FREE", "FP", "SIGFP"]
+
+        data = mtz.array
+        assert data[0].tolist() == [1.0, 2.0, 3.0, 1.0, 100.5, 2.5]
+        assert data[1][3] == 0.0 and np.isnan(data[1][4]) and np.isnan(data[1][5])
+        # Unknown status, and a value that is quoted when the file is written, are missing
+        assert np.isnan(data[2][3]) and np.isnan(data[2][4])
@@ -1,4 +1,4 @@
-from sf_convert.import_dir.import_cns import ImportCns
+from sf_convert.import_dir.import_cns import CNSToCifConverter, CnsReflectionReader, ImportCns
 from sf_convert.export_dir.export_cif import ExportCif
 from sf_convert.utils.pinfo_file import PInfoLogger
 from TestHelper import comp_sfcif
@@ -39,3 +39,60 @@ class TestCnsToCifConversion:
         comp_sfcif(cns_cif_5pny_data_path, output_path)
 
         print("Test completed.")
+
+    def test_cns_reader(self, tmp_path):
+        """
+        Tests reading records that continue on following lines, in chunks.
+
+        Args:
+            tmp_path: The path to the temporary directory.
+
+        Returns:
+            None
+        """
+        cns_path = os.path.join(tmp_path, "test.cv")
+        with open(cns_path, "w") as fout:
+            fout.write(" NREFlection=     5\n")
+            fout.write(" ANOMalous=FALSe { equiv. to HERMitian=TRUE}\n")
+            fout.write(" DECLare NAME=FOBS            DOMAin=RECIprocal   TYPE=REAL END\n")
+            fout.write(" INDE     0    0    4 FOBS=    346.63 SIGMA=      5.71 TEST=         0\n")
+            fout.write(" INDE     0    0    6 FOBS=    276.44 SIGMA=      4.64 TEST=         1\n")
+            fout.write(" INDE     0    0    8 FOBS=    488.03\n")
+            fout.write("                    SIGMA=      8.02 TEST=         0 PHI=   1.0  0.0\n")
+            fout.write(" INDE     0    0   10 FOBS=    748.61 SIGMA=     12.26 TEST=         0 FOM=  0.5\n")
+            fout.write(" DECLare NAME=FOM             DOMAin=RECIprocal   TYPE=REAL END\n")
+            fout.write(" { FOM added later }\n")
+            fout.write(" GROUp  TYPE=HL\n")
+            fout.write("     OBJEct=FOM\n")
+            fout.write(" END\n")
+            fout.write(" INDE     0    0   12 FOBS=      8.99 SIGMA=       abc TEST=         1\n")
+
+        expected_hkl = [[0, 0, 4], [0, 0, 6], [0, 0, 8], [0, 0, 10], [0, 0, 12]]
+        for chunk_size in [2, 3, 100000]:
+            reader = CnsReflectionReader(chunk_size=chunk_size)
+            reader.read_file(cns_path)
+            assert reader.get_number_of_reflections() == 5
+            assert reader.get_indices().tolist() == expected_hkl
+            assert reader.get_column_names() == ["FOBS", "SIGMA", "PHI", "FOM"]
+            assert reader.get_column("SIGMA") == [5.71, 4.64, 8.02, 12.26, "abc"]
+            assert reader.get_column("FOM") == ["?", "?", "?", 0.5, "?"]
+            assert reader.get_status() == ["o", "f", "o", "o", "f"]
+
+        logger = PInfoLogger("path_to_log1.log", "path_to_log2.log")
+        converter = CNSToCifConverter(cns_path, "xxxx", logger, 0)
+        converter.import_file()
+        cObj = converter.get_sf().get_block_by_index(0).getObj("refln")
+        assert cObj.getAttributeList() == [
+            "crystal_id",
+            "wavelength_id",
+            "scale_group_code",
+            "index_h",
+            "index_k",
+            "index_l",
+            "status",
+            "F_meas_au",
+            "F_meas_sigma_au",
+            "fom",
+            "PHI",
+        ]
+        assert list(cObj.getRow(2)) == [1, 1, 1, 0, 0, 8, "o", 488.03, 8.02, "?", 1.0]
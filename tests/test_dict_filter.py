@@ -0,0 +1,24 @@
+import pytest
+
+from sf_convert.utils.dict_filter import DictFilter, load_allowed_attributes
+
+
+class TestDictFilter:
+    def test_cached(self):
+        """Tests the dictionary is read once and cannot be changed"""
+        df1 = DictFilter()
+        df1.loadDataDictionary()
+        df2 = DictFilter()
+
+        # Loaded on first use
+        assert df2.getAllowedAttrs("refln") is df1.getAllowedAttrs("refln")
+        assert load_allowed_attributes.cache_info().currsize == 1
+
+        attrs = df1.getAllowedAttrs("refln")
+        assert isinstance(attrs, frozenset)
+        assert "index_h" in attrs and "F_meas_au" in attrs and "not_an_item" not in attrs
+        assert "refln" in df1.getAllowedCats() and "atom_site" not in df1.getAllowedCats()
+        assert df1.getAllowedAttrs("pdbx_powder_data") is None
+
+        with pytest.raises(TypeError):
+            load_allowed_attributes()["refln"] = frozenset()
@@ -0,0 +1,39 @@
+import os
+
+from sf_convert.sffile.guess_sf_format import PREFIX_SIZE, guess_sf_format, sniff_sf_format
+
+
+class TestGuessSfFormat:
+    def test_fixtures(self, cns_data_path, cns_5pny_data_path, cns_cif_5pny_data_path, cif_5pny_coordinate_path, mtz_7yra_data_path):
+        """Tests the formats and confidence of the test files"""
+        assert sniff_sf_format(mtz_7yra_data_path) == ("MTZ", 1.0)
+        assert sniff_sf_format(cns_5pny_data_path) == ("CNS", 1.0)
+        assert sniff_sf_format(cns_cif_5pny_data_path) == ("mmCIF", 1.0)
+        assert sniff_sf_format(cif_5pny_coordinate_path) == ("CIF", 1.0)
+
+        # Few CNS records - less certain
+        fmt, confidence = sniff_sf_format(cns_data_path)
+        assert fmt == "CNS" and 0.0 < confidence < 1.0
+        assert guess_sf_format(cns_data_path) == "CNS"
+
+    def test_prefix(self, tmp_path):
+        """Tests only the start of a file is read once the format is known"""
+        path = os.path.join(tmp_path, "big.cif")
+        with open(path, "wb") as fout:
+            fout.write(b"data_test\r\nloop_\r\n_refln.index_h\r\n_refln.index_k\r\n_refln.index_l\r\n")
+            fout.write(b"1 2 3\r\n" * (PREFIX_SIZE // 4))
+            # Not read - or the file would not be text
+            fout.write(b"\xff\xfe\n")
+        assert sniff_sf_format(path) == ("mmCIF", 1.0)
+
+        # Everything is read until a format is found
+        path = os.path.join(tmp_path, "late.cif")
+        with open(path, "w") as fout:
+            fout.write("1 2 3\n" * PREFIX_SIZE)
+            fout.write("_reflns.d_resolution_high 1.0\n")
+        assert sniff_sf_format(path, 1024) == ("CIF", 1.0)
+
+        path = os.path.join(tmp_path, "binary.dat")
+        with open(path, "wb") as fout:
+            fout.write(b"\x00\xff" * 100)
+        assert sniff_sf_format(path) == ("Format not recognized", 0.0)
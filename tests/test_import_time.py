@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are slow to import
+HEAVY = ["gemmi", "numpy", "mmcif", "requests"]
+
+
+def loaded_modules(code):
+    """Returns the heavy modules loaded by running code in a new interpreter"""
+    script = f"import sys\n{code}\nimport json\nprint(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+class TestImportTime:
+    @pytest.mark.parametrize(
+        "code, expected",
+        [
+            ("import sf_convert.command_line.main", []),
+            ("import sf_convert.command_line.UtilExec", []),
+            ("import sf_convert.command_line.htmlFormExec", []),
+            ("from sf_convert.command_line.main import main\ntry:\n    main(['-h'])\nexcept SystemExit:\n    pass", []),
+            ("from sf_convert.import_dir.import_cns import ImportCns\nfrom sf_convert.export_dir.export_cif import ExportCif", ["numpy", "mmcif"]),
+            ("from sf_convert.utils.sf_correct import SfCorrect\nfrom sf_convert.utils.CheckSfFile import CheckSfFile", ["numpy", "mmcif"]),
+        ],
+    )
+    def test_lazy_imports(self, code, expected):
+        """Tests that the command line and the CNS to mmCIF path do not load modules they do not use"""
+        assert loaded_modules(code) == expected
@@ -1,3 +1,5 @@
+# pylint: disable=E1101
+import gemmi
 from sf_convert.import_dir.import_mtz import ImportMtz
 from sf_convert.utils.pinfo_file import PInfoLogger
 from TestHelper import comp_sfcif
@@ -188,3 +190,27 @@ class TestMtzToCifConversion:
             assert a in should_have
 
         print("Test completed.")
+
+    def test_mtz2cif_in_memory(self, mtz_7yra_data_path):
+        """
+        Tests that the converted MTZ file is read in memory with the same values as from a file.
+
+        Args:
+            mtz_7yra_data_path: The path to the MTZ file to be converted.
+
+        Returns:
+            None
+        """
+        logger = PInfoLogger("path_to_log1.log", "path_to_log2.log")
+        converter = ImportMtz(logger)
+        converter.import_files([mtz_7yra_data_path])
+        sffile = converter.get_sf()
+
+        b0 = sffile.get_block_by_index(0)
+        # Quoted values are unquoted
+        assert b0.getObj("symmetry").getValue("space_group_name_H-M", 0) == "P 1 21 1"
+        assert b0.getObj("cell").getValue("length_a", 0) == "32.4090"
+
+        cObj = b0.getObj("refln")
+        assert cObj.getRowCount() == gemmi.read_mtz_file(mtz_7yra_data_path).nreflections
+        assert cObj.getRow(0) == ["-18", "0", "2", "?", "534.4", "28.51", "534.4", "28.51", "534.4", "28.51", "22.84", "0.6252", "22.84", "0.6252", "22.84", "0.6252", "o"]
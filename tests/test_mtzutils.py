@@ -1,5 +1,7 @@
 import os
-from sf_convert.utils.MtzUtils import GetMtzInfo
+from sf_convert.import_dir.import_mtz import ImportMtz
+from sf_convert.utils.MtzUtils import GetMtzInfo, clear_mtz_cache, read_mtz_file
+from sf_convert.utils.pinfo_file import PStreamLogger
 
 
 class TestMtzUtils:
@@ -22,3 +24,32 @@ class TestMtzUtils:
             lines = fin.readlines()
 
         assert len(lines) > 20
+
+    def test_read_mtz_once(self, tmp_path, mtz_7yra_data_path):
+        """
+        Tests that an MTZ file is parsed once, and again after it changes
+
+        Returns:
+            None
+        """
+        mtz = read_mtz_file(mtz_7yra_data_path)
+        assert read_mtz_file(mtz_7yra_data_path) is mtz
+
+        # Multiple label sets share the same parsed file
+        converter = ImportMtz(PStreamLogger())
+        converter.set_labels("FP=FP, SIGFP=SIGFP : I=IMEAN, SIGI=SIGIMEAN")
+        converter.import_files([mtz_7yra_data_path])
+        assert converter.get_sf().get_number_of_blocks() == 2
+        assert read_mtz_file(mtz_7yra_data_path) is mtz
+
+        # A rewritten file is read again
+        outfile = os.path.join(tmp_path, "copy.mtz")
+        mtz.write_to_file(outfile)
+        copy = read_mtz_file(outfile)
+        assert read_mtz_file(outfile) is copy
+        os.utime(outfile, ns=(0, 0))
+        assert read_mtz_file(outfile) is not copy
+
+        # Parsed again once the cache is cleared
+        clear_mtz_cache()
+        assert read_mtz_file(mtz_7yra_data_path) is not mtz
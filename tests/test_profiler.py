@@ -0,0 +1,88 @@
+import json
+import os
+import pstats
+import sys
+
+import pytest
+
+from sf_convert.command_line.main import main
+from sf_convert.utils import profiler
+from sf_convert.utils.profiler import PROFILER, Profiler, profiled
+
+
+class TestProfiler:
+    def test_stages(self):
+        """Tests stages nest and cost nothing when disabled"""
+        prof = Profiler()
+        with prof.stage("outer"):
+            pass
+        assert prof.report()["stages"] == []
+
+        prof.enable()
+        with prof.stage("outer"):
+            with prof.stage("inner"):
+                pass
+            with prof.stage("inner"):
+                pass
+        prof.disable()
+
+        report = prof.report()
+        assert [(rec["stage"], rec["depth"]) for rec in report["stages"]] == [("outer", 0), ("outer/inner", 1), ("outer/inner", 1)]
+        for rec in report["stages"]:
+            assert rec["wall"] >= 0.0 and rec["cpu"] >= 0.0 and rec["maxrss_kb"] > 0
+        assert report["total"]["wall"] >= report["stages"][0]["wall"]
+
+        @profiled()
+        def __work(value):
+            return value * 2
+
+        assert __work(2) == 4
+        PROFILER.enable()
+        assert __work(3) == 6
+        PROFILER.disable()
+        assert [rec["stage"] for rec in PROFILER.report()["stages"]] == ["work"]
+
+        # A run without cProfile does not keep the statistics of an earlier one
+        prof.enable(cprofile=True)
+        prof.disable()
+        prof.enable()
+        prof.disable()
+        assert not prof.dump_stats(os.devnull)
+
+    def test_no_resource(self, monkeypatch):
+        """Tests peak RSS is reported as None where the resource module is missing"""
+        monkeypatch.setattr(profiler, "resource", None)
+        prof = Profiler()
+        prof.enable()
+        with prof.stage("work"):
+            pass
+        prof.disable()
+
+        report = prof.report()
+        assert report["stages"][0]["maxrss_kb"] is None and report["stages"][0]["maxrss_growth_kb"] is None
+        assert report["total"]["maxrss_kb"] is None
+
+    def test_main(self, tmp_path, monkeypatch, cns_5pny_data_path, cif_5pny_coordinate_path):
+        """Tests the -profile and -pstats options"""
+        monkeypatch.chdir(tmp_path)
+        main(["-i", "CNS", "-o", "mmcif", "-sf", cns_5pny_data_path, "-pdb", cif_5pny_coordinate_path, "-out", "out.cif", "-profile", "profile.json", "-pstats", "profile.prof"])
+
+        with open(os.path.join(tmp_path, "profile.json"), "r") as fin:
+            report = json.load(fin)
+        stages = [rec["stage"] for rec in report["stages"]]
+        for name in ["read_model", "import_cns", "import_cns/read", "export_mmcif", "sf_stat", "sf_stat/write_sf_4_validation"]:
+            assert name in stages
+        assert not PROFILER.enabled
+
+        stats = pstats.Stats(os.path.join(tmp_path, "profile.prof"))
+        assert stats.total_calls > 0
+
+    def test_main_exit(self, tmp_path, monkeypatch, cns_5pny_data_path):
+        """Tests profiling stops, and the profile is written, when the conversion exits early"""
+        monkeypatch.chdir(tmp_path)
+        with pytest.raises(SystemExit):
+            main(["-i", "CNS", "-o", "mmcif", "-sf", cns_5pny_data_path, "-freer", "-1", "-profile", "profile.json", "-pstats", "profile.prof"])
+
+        assert not PROFILER.enabled
+        assert sys.getprofile() is None
+        assert os.path.exists(os.path.join(tmp_path, "profile.json"))
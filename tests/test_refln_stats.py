@@ -0,0 +1,86 @@
+import numpy as np
+
+from mmcif.api.DataCategory import DataCategory
+from sf_convert.sffile.refln_table import ReflnTable
+from sf_convert.utils.reciprocal_metric import ReciprocalMetric
+from sf_convert.utils.refln_stats import ReflnStats, free_fraction_by_shell, running_min, sequential_sum
+
+
+class TestReflnStats:
+    @staticmethod
+    def test_helpers():
+        """Tests the reductions that mimic a Python loop"""
+        vals = np.array([0.1] * 10 + [1e16, 1.0, -1e16])
+        total = 0
+        for v in vals:
+            total += v
+        assert sequential_sum(vals) == total
+        assert sequential_sum(np.array([])) == 0
+
+        mn = running_min(np.array([0.0, -0.0, np.nan, 3.0]), 500000.0)
+        assert mn == 0.0 and not np.signbit(mn)
+        assert running_min(np.array([np.nan]), 500000.0) == 500000.0
+
+    @staticmethod
+    def test_resolution():
+        """Tests d-spacing from the reciprocal metric"""
+        # Cubic cell of 10 Angstrom
+        metric = ReciprocalMetric([0.1, 0.1, 0.1, 90.0, 90.0, 90.0])
+        res = metric.get_resolution(np.array([0, 1, 2]), np.array([0, 0, 0]), np.array([0, 0, 0]))
+        assert res[0] == 0
+        assert abs(res[1] - 10.0) < 1e-9
+        assert abs(res[2] - 5.0) < 1e-9
+
+        table = ReflnTable(DataCategory("refln", ["index_h", "index_k", "index_l"], [["1", "0", "0"], ["?", "0", "0"]]))
+        res = table.get_resolution(metric)
+        assert list(res) == [10.0, 0.0]
+        # Cached per cell
+        assert table.get_resolution(ReciprocalMetric([0.1, 0.1, 0.1, 90.0, 90.0, 90.0])) is res
+        assert table.get_resolution(ReciprocalMetric([0.2, 0.1, 0.1, 90.0, 90.0, 90.0])) is not res
+
+    @staticmethod
+    def test_stats():
+        """Tests statistics and first occurrence of problems"""
+        attrList = ["index_h", "index_k", "index_l", "status", "F_meas_au", "F_meas_sigma_au"]
+        rowlist = [
+            ["1", "0", "0", "o", "100.0", "10.0"],
+            ["0", "0", "0", "o", "50.0", "5.0"],
+            ["x", "1", "0", "o", "50.0", "5.0"],
+            ["0", "2", "0", "f", "-1.0", "1.0"],
+            ["0", "0", "3", "o", "?", "?"],
+            ["2", "0", "0", "o", "20.0", "."],
+        ]
+        table = ReflnTable(DataCategory("refln", attrList, rowlist))
+        columns = {"Fo_au": "F_meas_au", "sFo_au": "F_meas_sigma_au", "status": "status"}
+
+        stats = ReflnStats(table, columns)
+        v = stats.compute(ReciprocalMetric([0.1, 0.1, 0.1, 90.0, 90.0, 90.0]))
+
+        # The "?" reflection is skipped, the non integral one is reported
+        assert v["temp_nref"] == 4
+        assert v["max_H"] == 2 and v["min_H"] == 0
+        assert v["n1"] == 1
+        assert v["n5"] == 1
+        assert v["nf_Fo"] == 3
+        assert v["max_F"] == 100.0 and v["min_F"] == -1.0
+        assert v["n_obs"] == 2 and v["n_free"] == 1
+        assert v["max_R"] == 10.0 and v["hkl_max_row"] == 0
+        assert stats.get_events() == [(1, "wrong_indices"), (2, "invalid_miller"), (3, "negative_fo")]
+
+    @staticmethod
+    def test_free_shells():
+        """Tests counting the free set in resolution shells"""
+        resolution = np.array([10.0, 5.0, 0.0, 2.0, 2.0, 10.0])
+        used = np.array([True, True, True, True, True, False])
+        free = np.array([False, True, True, True, False, True])
+
+        shells = free_fraction_by_shell(resolution, used, free, 2)
+        assert [(nref, nfree) for _dmax, _dmin, nref, nfree in shells] == [(2, 1), (2, 1)]
+        assert abs(shells[0][0] - 10.0) < 1e-9 and abs(shells[1][1] - 2.0) < 1e-9
+        assert shells[0][1] == shells[1][0]
+
+        # Single resolution
+        assert free_fraction_by_shell(np.array([3.0, 3.0]), np.array([True, True]), np.array([True, False]), 3)[0][2:] == (2, 1)
+        shells = free_fraction_by_shell(resolution, ~used, free)
+        assert [(nref, nfree) for _dmax, _dmin, nref, nfree in shells] == [(1, 1)] + [(0, 0)] * 9
+        assert free_fraction_by_shell(np.zeros(2), np.ones(2, dtype=bool), np.ones(2, dtype=bool)) == []
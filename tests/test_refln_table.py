@@ -0,0 +1,96 @@
+import math
+
+import numpy as np
+from mmcif.api.DataCategory import DataCategory
+from mmcif.api.PdbxContainers import DataContainer
+from sf_convert.sffile.refln_table import ReflnTable, find_duplicate_rows, pack_hkl
+from sf_convert.sffile.sf_file import StructureFactorFile
+
+
+def make_refln():
+    attrList = ["index_h", "index_k", "index_l", "status", "F_meas_au", "F_meas_sigma_au"]
+    rowlist = [
+        ["1", "0", "0", "o", "10.5", "0.5"],
+        ["0", "1", "0", "f", "?", "?"],
+        ["0", "0", "1", "o", ".", "."],
+        ["1.5", "1", "1", "x", "****", "1"],
+    ]
+    return DataCategory("refln", attrList, rowlist)
+
+
+class TestReflnTable:
+    @staticmethod
+    def test_columns():
+        """Tests conversion of columns to arrays"""
+        table = ReflnTable(make_refln())
+
+        assert table.get_row_count() == 4
+        assert table.has_attribute("status")
+        assert not table.has_attribute("intensity_meas")
+        assert table.get_float_column("intensity_meas") is None
+
+        fo = table.get_float_column("F_meas_au")
+        assert fo[0] == 10.5
+        assert all(math.isnan(v) for v in fo[1:])
+        assert table.get_float_column("F_meas_au") is fo
+
+        h, k, l, valid = table.get_indices()  # noqa: E741
+        assert h.dtype.name == "int32"
+        assert list(k) == [0, 1, 0, 1]
+        assert list(l) == [0, 0, 1, 1]
+        assert list(valid) == [True, True, True, False]
+
+        codes, labels = table.get_code_column("status")
+        assert codes.dtype.name == "uint8"
+        assert [labels[c] for c in codes] == ["o", "f", "o", "x"]
+        assert list(table.get_value_mask("status", "o")) == [True, False, True, False]
+        # "?" and "." are kept apart
+        assert list(table.get_value_mask("F_meas_au", "?")) == [False, True, False, False]
+
+    @staticmethod
+    def test_sf_file_cache():
+        """Tests caching and invalidation of tables in StructureFactorFile"""
+        sf = StructureFactorFile()
+        block = DataContainer("r1abcsf")
+        block.append(make_refln())
+        sf.add_block(block)
+
+        table = sf.get_reflection_table()
+        assert table is not None
+        assert sf.get_reflection_table() is table
+        assert sf.get_reflection_table("diffrn_refln") is None
+        assert sf.get_reflection_table(block_index=1) is None
+
+        # In place edit through the API
+        sf.replace_value_in_category("refln", "status", "o", old_value="f", block_name="r1abcsf")
+        table2 = sf.get_reflection_table()
+        assert table2 is not table
+        assert list(table2.get_value_mask("status", "o")) == [True, True, True, False]
+
+        # Structural change is detected without explicit invalidation
+        block.getObj("refln").appendAttributeExtendRows("phase_calc")
+        table3 = sf.get_reflection_table()
+        assert table3 is not table2
+        assert table3.has_attribute("phase_calc")
+
+    @staticmethod
+    def test_duplicates():
+        """Tests finding repeated indices"""
+        h = np.array([1, 0, 1, 2, 1, 0], dtype=np.int32)
+        k = np.array([0, 1, 0, 2, 0, 1], dtype=np.int32)
+        l = np.array([0, 0, 0, -3, 0, 0], dtype=np.int32)  # noqa: E741
+        assert list(find_duplicate_rows(h, k, l)) == [2, 4, 5]
+
+        # Keys sort as the indices do
+        keys = pack_hkl(h, k, l)
+        assert list(np.argsort(keys, kind="stable")) == list(np.lexsort((l, k, h)))
+
+        # Indices too large to pack
+        big = h * 10000000
+        assert pack_hkl(big, k, l) is None
+        assert list(find_duplicate_rows(big, k, l)) == [2, 4, 5]
+
+        rows = [["1", "0", "0"], ["1", "0", "?"], ["01", "0", "0"], ["1", "0", "?"], ["2", "0", "0"]]
+        table = ReflnTable(DataCategory("refln", ["index_h", "index_k", "index_l"], rows))
+        assert list(table.get_duplicate_rows()) == [2, 3]
+        assert ReflnTable(DataCategory("refln", ["index_h", "index_k"], [["1", "0"]])).get_duplicate_rows() is None
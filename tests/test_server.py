@@ -0,0 +1,81 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+from mmcif.io.IoAdapterCore import IoAdapterCore
+from sf_convert.command_line.server import SfConvertRequestHandler, SfConvertUnixServer, send_request
+
+
+class TestServer:
+    def test_server(self, tmp_path, cns_5pny_data_path, cif_5pny_coordinate_path, cns_cif_5pny_data_path):
+        """Tests conversions through a server on a Unix domain socket"""
+        sock = os.path.join(tmp_path, "sf.sock")
+        workdir = os.path.join(tmp_path, "jobs")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "sf_convert.command_line.server", "-socket", sock, "-workdir", workdir], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+        try:
+            for _ in range(600):
+                if os.path.exists(sock) or proc.poll() is not None:
+                    break
+                time.sleep(0.1)
+            assert os.path.exists(sock)
+
+            code, reply = send_request(sock, "/status", timeout=60)
+            assert code == 200 and reply["status"] == "ok"
+
+            code, reply = send_request(sock, "/guess", {"sf": [cns_5pny_data_path, "does_not_exist.mtz"]}, timeout=60)
+            assert reply["formats"] == [[cns_5pny_data_path, "CNS"], ["does_not_exist.mtz", "Could not open file"]]
+
+            code, reply = send_request(sock, "/convert", {"i": "CNS", "o": "mmcif", "sf": cns_5pny_data_path, "pdb": cif_5pny_coordinate_path, "freer": 1}, timeout=120)
+            assert reply["status"] == "ok" and reply["exit_code"] == 0
+            assert os.path.dirname(reply["workdir"]) == workdir
+            assert "CNS" in reply["information"]
+            blocks = IoAdapterCore().readFile(reply["output"])
+            assert blocks[0].getObj("refln").getRowCount() == 54110
+            for fname in ["sf_information.cif", "SF_4_validate.cif"]:
+                assert os.path.exists(os.path.join(reply["workdir"], fname))
+
+            code, reply = send_request(sock, "/check", {"sf": cns_cif_5pny_data_path}, timeout=120)
+            assert reply["status"] == "ok" and os.path.exists(reply["sf_4_validate"])
+
+            code, reply = send_request(sock, "/convert", {"o": "mmcif", "sf": "does_not_exist.mtz"}, timeout=60)
+            assert reply["status"] == "failed"
+
+            code, reply = send_request(sock, "/convert", {"bogus": 1}, timeout=60)
+            assert reply["status"] == "failed"
+
+            code, reply = send_request(sock, "/unknown", {}, timeout=60)
+            assert code == 404
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+
+        assert not os.path.exists(sock)
+
+    def test_socket_path(self, tmp_path):
+        """Tests only a socket left by a server that stopped is replaced"""
+        path = os.path.join(tmp_path, "sf.sock")
+        with open(path, "w") as fout:
+            fout.write("not a socket")
+        with pytest.raises(OSError, match="not a socket"):
+            SfConvertUnixServer(path, SfConvertRequestHandler)
+        assert os.path.isfile(path)
+        os.remove(path)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as live:
+            live.bind(path)
+            live.listen(1)
+            with pytest.raises(OSError, match="already listening"):
+                SfConvertUnixServer(path, SfConvertRequestHandler)
+            assert os.path.exists(path)
+
+        # Stale socket - nothing listening
+        server = SfConvertUnixServer(path, SfConvertRequestHandler)
+        server.server_close()
+        assert not os.path.exists(path)
@@ -0,0 +1,146 @@
+from mmcif.api.DataCategory import DataCategory
+from mmcif.api.PdbxContainers import DataContainer
+from sf_convert.sffile.sf_file import StructureFactorFile
+from sf_convert.utils.pinfo_file import PStreamLogger
+from sf_convert.utils.profiler import PROFILER
+from sf_convert.utils.sf_correct import SfCorrect
+
+
+def make_sffile(cell=True):
+    attrList = ["index_h", "index_k", "index_l", "status", "pdbx_r_free_flag"]
+    rowlist = [
+        ["1", "0", "0", "o", "1"],
+        ["2", "0", "0", "o", "0"],
+        ["3", "0", "0", "?", "1"],
+        ["4", "0", "0", "x", "1"],
+        ["5", "0", "0", "f", "0"],
+        ["6", "0", "0", "<", "?"],
+        ["7", "0", "0", "o", "1"],
+    ]
+    block = DataContainer("r1abcsf")
+    block.append(DataCategory("refln", attrList, rowlist))
+    if cell:
+        block.append(DataCategory("cell", ["length_a", "length_b", "length_c", "angle_alpha", "angle_beta", "angle_gamma"], [["20", "20", "20", "90", "90", "90"]]))
+    sf = StructureFactorFile()
+    sf.add_block(block)
+    return sf
+
+
+class TestSfCorrect:
+    @staticmethod
+    def test_reassign_free():
+        """Tests the status is set from pdbx_r_free_flag, with the free set reported per shell"""
+        sf = make_sffile()
+        table = sf.get_reflection_table()
+        logger = PStreamLogger()
+        SfCorrect(logger).reassign_free(sf, 1)
+
+        cObj = sf.get_category_object("refln")
+        assert cObj.getColumn(cObj.getIndex("status")) == ["f", "o", "f", "x", "o", "<", "f"]
+        assert sf.get_reflection_table() is not table
+
+        err, info = logger.get_reports()
+        assert err == ""
+        lines = info.splitlines()
+        assert "Free set by resolution shell in block r1abcsf:" in lines
+        # Equal reciprocal volume from 20 A (h=1) to 2.86 A (h=7) - rows 4 and 6 are kept
+        shells = [line.split() for line in lines[lines.index("    d_max    d_min     nref    nfree  fraction") + 1 :]]
+        assert len(shells) == 10
+        assert sum(int(s[2]) for s in shells) == 5 and sum(int(s[3]) for s in shells) == 3
+        assert shells[0][:4] == ["20.00", "6.10", "3", "2"]
+        assert shells[3][2:4] == ["1", "0"] and shells[9][2:4] == ["1", "1"]
+
+    @staticmethod
+    def test_reassign_free_missing():
+        """Tests warnings when there is no test set, and no shells without a cell"""
+        sf = make_sffile(cell=False)
+        logger = PStreamLogger()
+        SfCorrect(logger).reassign_free(sf, 2)
+
+        cObj = sf.get_category_object("refln")
+        assert cObj.getColumn(cObj.getIndex("status")) == ["o", "o", "o", "x", "o", "<", "o"]
+        err, info = logger.get_reports()
+        assert "test set 2 not in block r1abcsf" in err
+        assert "Free set" not in info
+
+        logger = PStreamLogger()
+        SfCorrect(logger).reassign_free(sf, "1")
+        assert cObj.getColumn(cObj.getIndex("status")) == ["f", "o", "f", "x", "o", "<", "f"]
+        assert "Free set" not in logger.get_reports()[1]
+
+    @staticmethod
+    def test_handle_standard():
+        """Tests the corrections run in one pass over the rows, and rules without their categories are skipped"""
+        sf = make_sffile()
+        cObj = sf.get_category_object("refln")
+        cObj.setValue(".", "status", 1)
+        sfc = SfCorrect(PStreamLogger())
+        sfc.handle_standard(sf, "1abc")
+
+        cObj = sf.get_category_object("refln")
+        assert cObj.getAttributeList()[:3] == ["crystal_id", "wavelength_id", "scale_group_code"]
+        assert cObj.getColumn(cObj.getIndex("status")) == ["o", "x", "x", "x", "f", "<", "o"]
+        assert cObj.getColumn(cObj.getIndex("pdbx_r_free_flag"))[5] == "0"
+        assert sf.get_block_by_index(0).getObjNameList()[-1] == "refln"
+
+        timings = sfc.get_rule_timings()
+        assert timings["update_refln_rows"]["calls"] == 1 and timings["normalize_status_free"]["calls"] == 1
+        assert timings["remap_unmerged"]["calls"] == 1 and timings["remap_unmerged"]["wall"] >= 0.0
+        assert timings["handle_reflns"] == {"calls": 0, "skipped": 1, "wall": 0.0}
+
+        # Times come from the profiler
+        sfc = SfCorrect(PStreamLogger())
+        PROFILER.enable()
+        sfc.handle_standard(make_sffile(), "1abc")
+        PROFILER.disable()
+        walls = {rec["stage"].rsplit("/", 1)[-1]: rec["wall"] for rec in PROFILER.report()["stages"]}
+        assert sfc.get_rule_timings()["remap_unmerged"]["wall"] == walls["remap_unmerged"] > 0.0
+
+        # Legacy only corrections are not part of the pipeline
+        sfc = SfCorrect(PStreamLogger(), legacy=False)
+        sfc.handle_standard(make_sffile(), "1abc")
+        assert "remove_similar_refln_attr" not in sfc.get_rule_timings()
+
+    @staticmethod
+    def test_renamed_status_free():
+        """Tests empty status and pdbx_r_free_flag are only set in columns given with those names, not renamed ones"""
+        attrList = ["index_h", "index_k", "index_l", "F_meas_au", "F_status", "phenix_R_free_flags"]
+        rowlist = [["1", "0", "0", "1.0", "?", "?"], ["2", "0", "0", "2.0", ".", "1.5"], ["3", "0", "0", "3.0", "o", "0"]]
+        block = DataContainer("r1abcsf")
+        block.append(DataCategory("refln", attrList, rowlist))
+        sf = StructureFactorFile()
+        sf.add_block(block)
+
+        logger = PStreamLogger()
+        SfCorrect(logger).handle_standard(sf, "1abc")
+
+        cObj = sf.get_category_object("refln")
+        assert cObj.getAttributeList() == ["crystal_id", "wavelength_id", "scale_group_code", "index_h", "index_k", "index_l", "status", "pdbx_r_free_flag", "F_meas_au"]
+        assert [row[6:8] for row in cObj.data] == [["?", "?"], [".", "1"], ["o", "0"]]
+        assert logger.get_reports()[0] == "Warning: In r1abcsf, pdbx_r_free_flag value 1.5 is not integral -- truncating\n"
+
+    @staticmethod
+    def test_normalize_status_free():
+        """Tests status is added and pdbx_r_free_flag truncated, reported as before"""
+        sf = make_sffile()
+        block = DataContainer("r1abcAsf")
+        block.append(DataCategory("refln", ["index_h", "index_k", "index_l", "pdbx_r_free_flag"], [["1", "0", "0", "1.7"], ["2", "0", "0", "x"], ["3", "0", "0", "-2.5"]]))
+        sf.add_block(block)
+        cObj = sf.get_category_object("refln")
+        cObj.setValue("2.5", "pdbx_r_free_flag", 1)
+
+        logger = PStreamLogger()
+        SfCorrect(logger).handle_standard(sf, "1abc")
+
+        cObj = sf.get_category_object("refln", "r1abcsf")
+        assert cObj.getColumn(cObj.getIndex("pdbx_r_free_flag")) == ["1", "2", "1", "1", "0", "0", "1"]
+        cObj = sf.get_category_object("refln", "r1abcAsf")
+        assert cObj.getColumn(cObj.getIndex("pdbx_r_free_flag")) == ["1", "x", "-2"]
+        assert cObj.getColumn(cObj.getIndex("status")) == ["o", "o", "o"]
+
+        err, info = logger.get_reports()
+        assert "Adding status to refln in nblock=1" in info
+        assert err.splitlines() == [
+            "Warning: In r1abcsf, pdbx_r_free_flag value 2.5 is not integral -- truncating",
+            "Warning: In r1abcAsf, pdbx_r_free_flag value 1.7 is not integral -- truncating",
+        ]
@@ -0,0 +1,42 @@
+import os
+
+from mmcif.api.DataCategory import DataCategory
+from mmcif.api.PdbxContainers import DataContainer
+from sf_convert.sffile.sf_file import StructureFactorFile
+
+
+class TestSfFile:
+    @staticmethod
+    def test_reorder_categories(tmp_path, monkeypatch):
+        """Tests categories are reordered in place, and written in the new order"""
+        block = DataContainer("r1abcsf")
+        for name in ["refln", "symmetry", "audit", "cell"]:
+            block.append(DataCategory(name, ["entry_id", "id"], [["1abc", "1"]]))
+        block.setProp("test", "kept")
+        sf = StructureFactorFile()
+        sf.add_block(block)
+        refln = block.getObj("refln")
+
+        assert not sf.reorder_categories_in_block(["refln", "missing"])
+        assert sf.reorder_categories_in_block(["audit", "cell", "audit", "missing"], "r1abcsf")
+        assert sf.get_block_by_index(0) is block
+        assert block.getObjNameList() == ["audit", "cell", "refln", "symmetry"]
+        assert block.getObj("refln") is refln and block.getProp("test") == "kept"
+        assert not sf.reorder_categories_in_block(["audit"], "missing")
+
+        # Does not rely on the container handing out its own list of names
+        names = DataContainer.getObjNameList
+        monkeypatch.setattr(DataContainer, "getObjNameList", lambda self: list(names(self)))
+        assert sf.reorder_categories_in_block(["audit", "refln"])
+        assert names(block) == ["audit", "refln", "cell", "symmetry"]
+        monkeypatch.undo()
+
+        assert sf.reorder_category_attributes("cell", ["id"], "r1abcsf")
+        assert not sf.reorder_category_attributes("cell", ["id"], "r1abcsf")
+        assert not sf.reorder_category_attributes("missing", ["id"])
+
+        path = os.path.join(tmp_path, "out.cif")
+        sf.write_file(path)
+        with open(path, "r") as fin:
+            names = [line.split()[0] for line in fin if line.startswith("_")]
+        assert names == ["_audit.entry_id", "_audit.id", "_refln.entry_id", "_refln.id", "_cell.id", "_cell.entry_id", "_symmetry.entry_id", "_symmetry.id"]
@@ -0,0 +1,83 @@
+import io
+import os
+
+import pytest
+from mmcif.io.PdbxReader import PdbxReader
+from sf_convert.sffile.sf_stream import iter_sf_file, split_values
+
+SF_FILE = """data_r1abcsf
+_cell.entry_id   1abc
+_cell.length_a   10.0
+#
+loop_
+_refln.index_h
+_refln.index_k
+_refln.index_l
+_refln.status
+_refln.F_meas_au
+# Values may span lines
+1 0 0 o 10.5
+2 0 0 'f' ?
+3 0 0
+o .  4 0 0 "x y" 20.0  # comment
+5 0 0 o
+;text
+;
+#
+_symmetry.entry_id 1abc
+data_r1abcAsf
+loop_
+_refln.index_h
+_refln.index_k
+_refln.index_l
+loop_
+_audit.revision_id
+1_0
+"""
+
+
+class TestSfStream:
+    @staticmethod
+    def test_split():
+        """Tests values are split as the mmcif reader does"""
+        assert split_values("1 2 ?\n") == ["1", "2", "?"]
+        assert split_values("'a b' \"c' d\" x'y  # comment") == ["a b", "c' d", "x'y"]
+
+    @staticmethod
+    def test_stream(tmp_path):
+        """Tests the reflections come in chunks, and the other categories with their block"""
+        path = os.path.join(tmp_path, "r1abcsf.cif")
+        with open(path, "w") as fout:
+            fout.write(SF_FILE)
+
+        events = list(iter_sf_file(path, chunk_rows=2))
+        assert [event[0] for event in events] == ["chunk", "chunk", "chunk", "block", "block"]
+        assert [(event[1], event[2], event[3].get_row_count()) for event in events[:3]] == [("r1abcsf", 0, 2), ("r1abcsf", 2, 2), ("r1abcsf", 4, 1)]
+
+        table = events[0][3]
+        assert table.get_category_name() == "refln"
+        assert table.get_attribute_list() == ["index_h", "index_k", "index_l", "status", "F_meas_au"]
+        assert list(table.get_float_column("F_meas_au")[:1]) == [10.5]
+        assert list(table.get_indices()[0]) == [1, 2]
+        assert events[1][3].get_raw_column("status") == ["o", "x y"]
+        assert events[2][3].get_raw_column("F_meas_au") == ["text"]
+
+        # Everything else as the mmcif reader gives it
+        ref = []
+        PdbxReader(io.StringIO(SF_FILE[: SF_FILE.index("data_r1abcAsf")])).read(ref)
+        block = events[3][1]
+        assert block.getName() == "r1abcsf" and block.getObjNameList() == ["cell", "symmetry"]
+        for name in ["cell", "symmetry"]:
+            assert block.getObj(name).data == ref[0].getObj(name).data
+        # Loop without rows
+        assert events[4][1].getObjNameList() == ["audit"]
+
+    @staticmethod
+    def test_incomplete(tmp_path):
+        """Tests a loop that does not hold a whole number of rows"""
+        path = os.path.join(tmp_path, "bad.cif")
+        with open(path, "w") as fout:
+            fout.write("data_bad\nloop_\n_refln.index_h\n_refln.index_k\n1 2 3\n")
+
+        with pytest.raises(ValueError):
+            list(iter_sf_file(path))
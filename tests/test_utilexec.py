@@ -41,7 +41,7 @@ class TestCliUtil:
 
         parser = create_parser()
         args = parser.parse_args(["checkfmts", "--sf", cif_5pny_data_path])
-        assert len(vars(args)) == 4
+        assert len(vars(args)) == 7
         assert hasattr(args, "func")
         assert args.sf == [cif_5pny_data_path]
         assert args.json is False
@@ -52,7 +52,7 @@ class TestCliUtil:
 
         parser = create_parser()
         args = parser.parse_args(["checkfmts", "--sf", cif_5pny_data_path, "--json"])
-        assert len(vars(args)) == 4
+        assert len(vars(args)) == 7
         assert hasattr(args, "func")
         assert args.sf == [cif_5pny_data_path]
         assert args.json is True
@@ -63,7 +63,7 @@ class TestCliUtil:
 
         parser = create_parser()
         args = parser.parse_args(["checkfmts", "--sf", cif_5pny_data_path, "--text"])
-        assert len(vars(args)) == 4
+        assert len(vars(args)) == 7
         assert hasattr(args, "func")
         assert args.sf == [cif_5pny_data_path]
         assert args.json is False
@@ -91,3 +91,27 @@ class TestCliUtil:
         first = parse_out[0]
         assert first[0] == cif_5pny_data_path
         assert first[1] == "mmCIF"
+
+    def test_checkfmt_parallel(self, capsys, cns_5pny_data_path, mtz_7yra_data_path, cns_cif_5pny_data_path):
+        """ Tests checkfmt of several files at once, with confidence and timing"""
+
+        files = [cns_5pny_data_path, "does_not_exist.mtz", mtz_7yra_data_path, cns_cif_5pny_data_path]
+        parser = create_parser()
+        args = parser.parse_args(["checkfmts", "--sf"] + files + ["--confidence", "--timing", "--nproc", "3"])
+        ret = checkfmts(args)
+        assert ret == 0
+        parse_out = json.loads(capsys.readouterr().out)
+        expected = [[cns_5pny_data_path, "CNS", 1.0], ["does_not_exist.mtz", "Could not open file", 0.0],
+                    [mtz_7yra_data_path, "MTZ", 1.0], [cns_cif_5pny_data_path, "mmCIF", 1.0]]
+        assert [line[:3] for line in parse_out] == expected
+        assert all(len(line) == 4 and line[3] >= 0.0 for line in parse_out)
+
+        # Same as one at a time
+        args = parser.parse_args(["checkfmts", "--sf"] + files + ["--nproc", "1"])
+        checkfmts(args)
+        assert json.loads(capsys.readouterr().out) == [line[:2] for line in parse_out]
+
+        for nproc in ["0", "-1", "two"]:
+            with pytest.raises(SystemExit):
+                parser.parse_args(["checkfmts", "--sf"] + files + ["--nproc", nproc])
+        assert "is not a positive integer" in capsys.readouterr().err
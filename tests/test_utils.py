@@ -1,5 +1,5 @@
 from mmcif.api.DataCategory import DataCategory
-from sf_convert.utils.CifUtils import reorderCategoryAttr
+from sf_convert.utils.CifUtils import permuteCategoryAttr, reorderCategoryAttr, uniqueRowTuples, updateCategoryRows
 
 
 class TestUtils:
@@ -33,3 +33,44 @@ class TestUtils:
         assert dout.getAttributeList() == ["b", "a", "c", "d", "e"]
 
         assert dout.getValue("a", 2) == 3
+        assert dc.getAttributeList() == attrList
+
+    @staticmethod
+    def test_attribute_permute():
+        """Tests reordering of attributes in place"""
+        rowlist = [["1", "2", "3"], ["4", "5"]]
+        dc = DataCategory("something", ["a", "b", "c"], rowlist, copyInputData=False)
+        rows = list(dc.data)
+
+        assert not permuteCategoryAttr(dc, ["a", "fred"])
+        assert permuteCategoryAttr(dc, ["c", "fred", "a", "c"])
+        assert dc.getAttributeList() == ["c", "a", "b"]
+        assert dc.data == [["3", "1", "2"], [None, "4", "5"]]
+        assert all(new is old for new, old in zip(dc.data, rows))
+        assert dc.getValue("b", 0) == "2"
+        assert dc.getAttributeIndex("a") == 1
+
+    @staticmethod
+    def test_unique_rows():
+        """Tests the distinct tuples are in the order they first appear, with their first row"""
+        rowlist = [["b", 1, 10], ["a", 1, 11], ["b", 1, 12], ["a", 2, 13], ["a", 1, 14]]
+        dc = DataCategory("diffrn_refln", ["standard_code", "diffrn_id", "index_h"], rowlist)
+
+        assert uniqueRowTuples(dc, ["standard_code", "diffrn_id"]) == {("b", 1): 0, ("a", 1): 1, ("a", 2): 3}
+        assert list(uniqueRowTuples(dc, ["standard_code"])) == [("b",), ("a",)]
+        assert uniqueRowTuples(dc, ["standard_code", "scale_group_code"]) is None
+        assert uniqueRowTuples(DataCategory("empty", ["a"], []), ["a"]) == {}
+
+    @staticmethod
+    def test_update_rows():
+        """Tests appending attributes and replacing values in one pass"""
+        dc = DataCategory("refln", ["Crystal_id", "status", "pdbx_r_free_flag"], [["2", "?", "?"], ["2", ".", "1"], ["2", "o", "?"]])
+
+        replacements = {"status": {"?": "x", ".": "x"}, "pdbx_r_free_flag": {"?": "0"}, "missing": {"?": "0"}}
+        assert updateCategoryRows(dc, [("crystal_id", "1"), ("wavelength_id", "1")], replacements) == 4
+        # Attribute differing in case is renamed, not added
+        assert dc.getAttributeList() == ["crystal_id", "status", "pdbx_r_free_flag", "wavelength_id"]
+        assert dc.data == [["2", "x", "0", "1"], ["2", "x", "1", "1"], ["2", "o", "0", "1"]]
+
+        assert updateCategoryRows(dc, [("wavelength_id", "2")], replacements) == 0
+        assert dc.getAttributeCount() == 4
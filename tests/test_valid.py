@@ -1,8 +1,12 @@
 import os
 
+import pytest
+
+from mmcif.api.DataCategory import DataCategory
+from mmcif.api.PdbxContainers import DataContainer
 from sf_convert.sffile.sf_file import StructureFactorFile
 from sf_convert.utils.CheckSfFile import CheckSfFile
-from sf_convert.utils.pinfo_file import PInfoLogger
+from sf_convert.utils.pinfo_file import PInfoLogger, PStreamLogger
 from TestHelper import comp_sfcif
 
 
@@ -37,3 +41,60 @@ class TestValid:
         comp_sfcif(cif_SF_4_validate_data_path, output_path)
 
         print("Test completed.")
+
+    def test_sf_stat_fused(self, tmp_path):
+        """
+        Tests that sf_stat writes the same validation file as write_sf_4_validation.
+
+        Args:
+            tmp_path: The path to the temporary directory.
+
+        Returns:
+            None
+        """
+        block = DataContainer("r1abcsf")
+        block.append(DataCategory("cell", ["length_a", "length_b", "length_c", "angle_alpha", "angle_beta", "angle_gamma"], [["40.1", "50.2", "60.3", "90", "95.5", "90"]]))
+        rows = []
+        for idx in range(40):
+            rows.append([str(idx % 7), str(idx % 5), str(idx // 3), "f" if idx % 10 == 0 else "o", f"{100.0 + idx:.1f}", f"{1.0 + idx % 4:.1f}"])
+        rows[3][3] = "x"
+        rows[4][4] = "?"
+        block.append(DataCategory("refln", ["index_h", "index_k", "index_l", "status", "intensity_meas", "intensity_sigma"], rows))
+
+        sffile = StructureFactorFile()
+        sffile.add_block(block)
+
+        fused_path = os.path.join(tmp_path, "fused.cif")
+        sf_stat = CheckSfFile(sffile, PStreamLogger())
+        sf_stat.sf_stat("test", fused_path)
+
+        output_path = os.path.join(tmp_path, "output.cif")
+        sf_stat = CheckSfFile(sffile, PStreamLogger())
+        sf_stat.write_sf_4_validation(output_path)
+
+        with open(fused_path, "r", encoding="utf-8") as f1, open(output_path, "r", encoding="utf-8") as f2:
+            assert f1.read() == f2.read()
+
+    def test_fatal_reflections(self):
+        """
+        Tests that F squared without its sigma, or that is not a number, stops the check with the reflection.
+
+        Returns:
+            None
+        """
+        for attributes, bad_value, match in [
+            (["F_squared_meas", "F_meas_sigma"], None, r"F squared without its sigma for \(HKL=   1    0    0\) \(data block= r1abcsf\)"),
+            (["F_squared_meas", "F_squared_sigma"], "abc", r"not numbers \(abc, 2.0\) for \(HKL=  11    0    3\) \(data block= r1abcsf\)"),
+        ]:
+            block = DataContainer("r1abcsf")
+            block.append(DataCategory("cell", ["length_a", "length_b", "length_c", "angle_alpha", "angle_beta", "angle_gamma"], [["40.1", "50.2", "60.3", "90", "95.5", "90"]]))
+            rows = [[str(idx + 1), str(idx % 5), str(idx // 3), "o", f"{100.0 + idx:.1f}", "2.0"] for idx in range(40)]
+            if bad_value is not None:
+                rows[10][4] = bad_value
+            block.append(DataCategory("refln", ["index_h", "index_k", "index_l", "status"] + attributes, rows))
+
+            sffile = StructureFactorFile()
+            sffile.add_block(block)
+            sf_stat = CheckSfFile(sffile, PStreamLogger())
+            with pytest.raises(ValueError, match=match):
+                sf_stat.check_sf_all_blocks(1)